@@ -0,0 +1,326 @@
+"""
+End-to-end latency of the plugin against the scripted fake language server in benchmarks/fake_server.py.
+
+Run from the package root:
+
+    python -m benchmarks.bench_latency [SCENARIO ...] [--requests N] [--concurrency N] [--tcp]
+
+Each scenario (all of benchmarks/scenarios/ by default) starts a session through WindowManager and
+sessions.create_session, like a window does, then reports how long initialize took, the p50/p95/p99 latency and
+throughput of completion and hover requests, and how many diagnostics updates reached WindowDiagnostics per second.
+"""
+import argparse
+import glob
+import os
+import socket
+import sys
+import threading
+import time
+from plugin.core.diagnostics import WindowDiagnostics
+from plugin.core.events import Events, global_events
+from plugin.core.executor import startup_executor
+from plugin.core.futures import RequestError, CancelledError
+from plugin.core.protocol import Request
+from plugin.core.sessions import create_session
+from plugin.core.types import ClientConfig, ClientStates, LanguageConfig, Settings, config_supports_syntax
+from plugin.core.url import filename_to_uri
+from plugin.core.windows import WindowManager, WindowDocumentHandler
+
+try:
+    from typing import Any, Dict, List, Optional
+    assert Any and Dict and List and Optional
+except ImportError:
+    pass
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = os.path.join(PACKAGE_ROOT, "benchmarks", "scenarios")
+SYNTAX = "Packages/Python/Python.sublime-syntax"
+READY_TIMEOUT = 30
+
+
+class Region(object):
+    def __init__(self, a: int, b: int) -> None:
+        self.a = a
+        self.b = b
+
+
+class Sublime(object):
+    """The parts of the sublime module WindowManager uses."""
+    DIALOG_CANCEL = 0
+    DIALOG_YES = 1
+    Region = Region
+
+    def set_timeout_async(self, callback: 'Any', timeout_ms: int = 0) -> None:
+        timer = threading.Timer(timeout_ms / 1000.0, callback)
+        timer.daemon = True
+        timer.start()
+
+    def message_dialog(self, message: str) -> None:
+        print(message)
+
+    def ok_cancel_dialog(self, message: str, ok_title: str = "") -> int:
+        # restart servers that keep crashing, like a user would
+        return self.DIALOG_YES
+
+
+class ViewSettings(dict):
+    def set(self, key: str, value: 'Any') -> None:
+        self[key] = value
+
+    def erase(self, key: str) -> None:
+        self.pop(key, None)
+
+
+class View(object):
+    def __init__(self, file_name: str, window: 'Window') -> None:
+        self._file_name = file_name
+        self._window = window
+        self._settings = ViewSettings(syntax=SYNTAX)
+        with open(file_name, encoding="UTF-8") as file:
+            self._text = file.read()
+
+    def file_name(self) -> str:
+        return self._file_name
+
+    def window(self) -> 'Window':
+        return self._window
+
+    def buffer_id(self) -> int:
+        return 1
+
+    def substr(self, region: Region) -> str:
+        return self._text[region.a:region.b]
+
+    def settings(self) -> ViewSettings:
+        return self._settings
+
+    def size(self) -> int:
+        return len(self._text)
+
+    def set_status(self, key: str, status: str) -> None:
+        pass
+
+    def sel(self) -> 'List[Region]':
+        return [Region(0, 0)]
+
+    def score_selector(self, region: 'Any', scope: str) -> int:
+        return 1
+
+
+class Window(object):
+    def __init__(self, folder: str) -> None:
+        self._folder = folder
+        self.view = None  # type: Optional[View]
+
+    def id(self) -> int:
+        return 1
+
+    def is_valid(self) -> bool:
+        return True
+
+    def folders(self) -> 'List[str]':
+        return [self._folder]
+
+    def num_groups(self) -> int:
+        return 1
+
+    def active_group(self) -> int:
+        return 0
+
+    def active_view(self) -> 'Optional[View]':
+        return self.view
+
+    def active_view_in_group(self, group: int) -> 'Optional[View]':
+        return self.view
+
+    def views(self) -> 'List[View]':
+        return [self.view] if self.view else []
+
+    def find_open_file(self, path: str) -> 'Optional[View]':
+        return self.view if self.view and self.view.file_name() == path else None
+
+    def project_data(self) -> 'Optional[dict]':
+        return None
+
+    def extract_variables(self) -> 'Dict[str, str]':
+        return {"project_path": self._folder}
+
+    def status_message(self, message: str) -> None:
+        pass
+
+    def run_command(self, command: str, args: 'Dict[str, Any]') -> None:
+        pass
+
+
+class Configs(object):
+    def __init__(self, config: ClientConfig) -> None:
+        self.all = [config]
+
+    def is_supported(self, view: View) -> bool:
+        return True
+
+    def scope_configs(self, view: View, point: 'Optional[int]' = None) -> 'List[ClientConfig]':
+        return self.all
+
+    def syntax_configs(self, view: View) -> 'List[ClientConfig]':
+        return [config for config in self.all if config_supports_syntax(config, view.settings()["syntax"])]
+
+    def syntax_supported(self, view: View) -> bool:
+        return bool(self.syntax_configs(view))
+
+    def syntax_config_languages(self, view: View) -> 'Dict[str, LanguageConfig]':
+        return dict((config.name, config.languages[0]) for config in self.syntax_configs(view))
+
+    def update(self, configs: 'List[ClientConfig]') -> None:
+        pass
+
+    def disable(self, config_name: str) -> None:
+        pass
+
+
+class Handlers(object):
+    def on_start(self, config_name: str, window: Window) -> bool:
+        return True
+
+    def on_initialized(self, config_name: str, window: Window, client: 'Any') -> None:
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: 'List[float]', fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Run(object):
+    def __init__(self, scenario: str, use_tcp: bool) -> None:
+        self.scenario = scenario
+        args = [sys.executable, "-m", "benchmarks.fake_server", scenario]
+        port = None
+        if use_tcp:
+            port = free_port()
+            args += ["--tcp", str(port)]
+        language = LanguageConfig("python", ["source.python"], ["Python"])
+        self.config = ClientConfig("fake", args, port, languages=[language])
+        self.settings = Settings()
+        self.window = Window(PACKAGE_ROOT)
+        self.window.view = View(os.path.abspath(__file__), self.window)
+        self.diagnostics_updates = 0
+        self.sessions = set()  # type: set
+        documents = WindowDocumentHandler(Sublime(), self.settings, self.window, Events(), Configs(self.config))
+        self.manager = WindowManager(self.window, Configs(self.config), documents, WindowDiagnostics(),
+                                     self.start_session, Sublime(), Handlers(), start_async=startup_executor.submit)
+
+    def start_session(self, window: Window, project_path: str, config: ClientConfig, on_pre_initialize: 'Any',
+                      on_post_initialize: 'Any', on_post_exit: 'Any') -> 'Any':
+        return create_session(config, project_path, dict(os.environ), self.settings,
+                              on_pre_initialize=on_pre_initialize, on_post_initialize=on_post_initialize,
+                              on_post_exit=on_post_exit)
+
+    def wait_ready(self) -> 'Optional[Any]':
+        deadline = time.perf_counter() + READY_TIMEOUT
+        while time.perf_counter() < deadline:
+            session = self.manager.get_session(self.config.name)
+            # a crashed session stays READY until the window ends it, without a transport
+            if session and session.state == ClientStates.READY and session.client and session.client.transport:
+                self.sessions.add(session)
+                return session
+            time.sleep(0.001)
+        print("the fake server did not get ready in {}s".format(READY_TIMEOUT))
+        return None
+
+    def on_diagnostics(self, update: 'Any') -> None:
+        self.diagnostics_updates += 1
+
+    def measure(self, requests: int, concurrency: int) -> 'Dict[str, Any]':
+        global_events.subscribe("document.diagnostics", self.on_diagnostics)
+        start = time.perf_counter()
+        self.manager.start_active_views()
+        if not self.wait_ready():
+            raise Exception("the fake server did not start")
+        initialize = time.perf_counter() - start
+        results = {"initialize_s": initialize}  # type: Dict[str, Any]
+        for method in ("textDocument/completion", "textDocument/hover"):
+            results[method] = self.measure_requests(method, requests, concurrency)
+        time.sleep(0.2)  # let the last diagnostics arrive
+        results["diagnostics_updates"] = self.diagnostics_updates
+        results["diagnostics_per_s"] = self.diagnostics_updates / (time.perf_counter() - start)
+        results["crashes"] = len(self.sessions) - 1  # every crash restarts the session
+        self.manager.end_sessions()
+        return results
+
+    def measure_requests(self, method: str, count: int, concurrency: int) -> 'Dict[str, Any]':
+        uri = filename_to_uri(self.window.view.file_name()) if self.window.view else ""
+        params = {"textDocument": {"uri": uri}, "position": {"line": 0, "character": 0}}
+        latencies = []  # type: List[float]
+        failures = [0]
+        lock = threading.Lock()
+        remaining = [count]
+
+        def worker() -> None:
+            while True:
+                with lock:
+                    if not remaining[0]:
+                        return
+                    remaining[0] -= 1
+                session = self.wait_ready()
+                if not session:
+                    with lock:
+                        failures[0] += remaining[0] + 1
+                        remaining[0] = 0
+                    return
+                sent = time.perf_counter()
+                try:
+                    session.client.send_request(Request(method, params)).result(READY_TIMEOUT)
+                    with lock:
+                        latencies.append(time.perf_counter() - sent)
+                except (RequestError, CancelledError, TimeoutError):
+                    with lock:
+                        failures[0] += 1
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "p50_ms": 1000 * percentile(latencies, 0.50),
+            "p95_ms": 1000 * percentile(latencies, 0.95),
+            "p99_ms": 1000 * percentile(latencies, 0.99),
+            "per_s": len(latencies) / elapsed if elapsed else 0.0,
+            "failures": failures[0]
+        }
+
+
+def main(argv: 'List[str]') -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--tcp", action="store_true", help="talk to the server over TCP instead of stdio")
+    args = parser.parse_args(argv)
+    scenarios = args.scenarios or sorted(glob.glob(os.path.join(SCENARIOS, "*.json")))
+    for scenario in scenarios:
+        results = Run(os.path.abspath(scenario), args.tcp).measure(args.requests, args.concurrency)
+        print("{}: initialize {:.3f} s, {} diagnostics updates ({:.0f}/s), {} crashes".format(
+            os.path.basename(scenario), results["initialize_s"], results["diagnostics_updates"],
+            results["diagnostics_per_s"], results["crashes"]))
+        for method in ("textDocument/completion", "textDocument/hover"):
+            latency = results[method]
+            print("  {:<24} p50 {:>8.1f} ms  p95 {:>8.1f} ms  p99 {:>8.1f} ms  {:>8.1f} req/s  {} failed".format(
+                method, latency["p50_ms"], latency["p95_ms"], latency["p99_ms"], latency["per_s"],
+                latency["failures"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+"""
+Cost of routing incoming messages from a log-heavy server, with and without decoding each one in full first.
+
+Run from the package root:
+
+    python -m benchmarks.bench_routing
+
+The stream mixes window/logMessage notifications, which have a handler, with $/progress and telemetry/event
+notifications and late results of cancelled completion requests, which nothing looks at.
+"""
+import json
+import sys
+import time
+from plugin.core.dispatch import Dispatcher
+from plugin.core.rpc import Client
+from plugin.core.transports import Transport
+from plugin.core.types import Settings
+
+try:
+    from typing import Any, Callable, Dict, List
+    assert Any and Callable and Dict and List
+except ImportError:
+    pass
+
+ROUNDS = 5000
+
+
+class NullTransport(Transport):
+    def __init__(self) -> None:
+        pass
+
+    def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
+        pass
+
+    def send(self, message: str, priority: int = 1, uri: 'Any' = None, replaceable: bool = False) -> None:
+        pass
+
+
+class InlineDispatcher(Dispatcher):
+    # handle messages on the measuring thread, decoding included
+    def dispatch(self, priority: int, callback: 'Callable[[], None]') -> None:
+        callback()
+
+
+def build_messages() -> 'List[str]':
+    items = [{"label": "item{}".format(i), "kind": 6, "detail": "x" * 40} for i in range(200)]
+    return [
+        json.dumps({"jsonrpc": "2.0", "method": "window/logMessage",
+                    "params": {"type": 4, "message": "indexing " + "y" * 200}}),
+        json.dumps({"jsonrpc": "2.0", "method": "$/progress",
+                    "params": {"token": "index", "value": {"kind": "report", "percentage": 50}}}),
+        json.dumps({"jsonrpc": "2.0", "method": "telemetry/event",
+                    "params": {"name": "timing", "data": [{"step": i, "ms": i * 2} for i in range(50)]}}),
+        json.dumps({"jsonrpc": "2.0", "id": 1000000, "result": {"isIncomplete": False, "items": items}}),
+    ]
+
+
+def route_decoded(client: Client, messages: 'List[str]') -> None:
+    # what receive_payload did before: decode first, then look for a handler
+    handlers = client._notification_handlers
+    for message in messages:
+        payload = json.loads(message)
+        if "method" in payload:
+            handler = handlers.get(payload["method"])
+            if handler:
+                handler(payload.get("params"))
+        elif int(payload["id"]) in client._response_handlers:
+            pass
+
+
+def route_lazily(client: Client, messages: 'List[str]') -> None:
+    for message in messages:
+        client.receive_payload(message)
+
+
+def measure(route: 'Callable[[Client, List[str]], None]', client: Client, messages: 'List[str]') -> float:
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        route(client, messages)
+    return time.perf_counter() - start
+
+
+def main(argv: 'List[str]') -> None:
+    client = Client(NullTransport(), Settings(), InlineDispatcher())
+    client.on_notification("window/logMessage", lambda params: None)
+    messages = build_messages()
+    count = ROUNDS * len(messages)
+    size = ROUNDS * sum(len(message) for message in messages)
+    for name, route in (("decode everything", route_decoded), ("routing pre-pass", route_lazily)):
+        elapsed = measure(route, client, messages)
+        print("{:<18} {:>8} msgs  {:>7.1f} MB  {:>7.3f} s  {:>10.0f} msgs/s".format(
+            name, count, size / (1024 * 1024), elapsed, count / elapsed))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,106 @@
+"""
+Cold import time of the plugin's core modules, measured with plugin.core.profiling in fresh interpreters.
+
+Run from the package root:
+
+    python -m benchmarks.bench_startup [--runs N] [--save FILE] [--baseline FILE]
+
+Every run imports all of plugin.core that loads without Sublime Text in a new process and records how long each
+module took on its own. Reports the median of the runs: the total, and the slowest modules. --save writes the
+medians as JSON, --baseline compares with medians saved earlier (benchmarks/startup_baseline.json is committed).
+Run python -m compileall plugin first, or the first run also measures compiling every module.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+try:
+    from typing import Any, Dict, List
+    assert Any and Dict and List
+except ImportError:
+    pass
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the ones that import sublime are left out, they need the editor
+MODULES = [
+    "plugin.core.capabilities", "plugin.core.completion", "plugin.core.configurations", "plugin.core.deadlines",
+    "plugin.core.diagnostics", "plugin.core.dispatch", "plugin.core.edit", "plugin.core.envelope",
+    "plugin.core.events", "plugin.core.executor", "plugin.core.futures", "plugin.core.handlers",
+    "plugin.core.logging", "plugin.core.metrics", "plugin.core.pool", "plugin.core.popups", "plugin.core.process",
+    "plugin.core.protocol", "plugin.core.reactor", "plugin.core.recording", "plugin.core.resources",
+    "plugin.core.rpc", "plugin.core.sessions", "plugin.core.signature_help", "plugin.core.transports",
+    "plugin.core.types", "plugin.core.url", "plugin.core.windows", "plugin.core.workspace"
+]
+
+CHILD = """
+import json, sys
+from plugin.core.profiling import startup_profile
+with startup_profile.timing_imports():
+    for name in sys.argv[1:]:
+        __import__(name)
+json.dump(startup_profile.to_dict(), sys.stdout)
+"""
+
+
+def run_once() -> 'Dict[str, Any]':
+    output = subprocess.check_output([sys.executable, "-c", CHILD] + MODULES, cwd=PACKAGE_ROOT)
+    return json.loads(output.decode("UTF-8"))
+
+
+def medians(runs: 'List[Dict[str, Any]]') -> 'Dict[str, Any]':
+    names = set()  # type: set
+    for run in runs:
+        names.update(run["imports"])
+    return {
+        "total_ms": 1000 * statistics.median(run["total"] for run in runs),
+        "modules_ms": dict((name, 1000 * statistics.median(run["imports"].get(name, 0.0) for run in runs))
+                           for name in names)
+    }
+
+
+def report(result: 'Dict[str, Any]', baseline: 'Any', limit: int) -> None:
+    if baseline:
+        print("total {:>8.1f} ms  (baseline {:.1f} ms, {:+.1f} ms)".format(
+            result["total_ms"], baseline["total_ms"], result["total_ms"] - baseline["total_ms"]))
+    else:
+        print("total {:>8.1f} ms".format(result["total_ms"]))
+    modules = result["modules_ms"]
+    if baseline:
+        dropped = [name for name in baseline["modules_ms"] if name not in modules]
+        print("{} modules no longer imported, which took {:.1f} ms".format(
+            len(dropped), sum(baseline["modules_ms"][name] for name in dropped)))
+    names = sorted(modules, key=lambda name: modules[name], reverse=True)[:limit]
+    print()
+    for name in names:
+        line = "{:>10.2f} ms  {}".format(modules.get(name, 0.0), name)
+        if baseline:
+            before = baseline["modules_ms"].get(name)
+            line += "  (baseline {})".format("{:.2f} ms".format(before) if before is not None else "-")
+        print(line)
+
+
+def main(argv: 'List[str]') -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--top", type=int, default=20, help="how many of the slowest modules to list")
+    parser.add_argument("--save", help="write the medians to this JSON file")
+    parser.add_argument("--baseline", help="compare with medians saved with --save")
+    args = parser.parse_args(argv)
+    result = medians([run_once() for i in range(args.runs)])
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="UTF-8") as file:
+            baseline = json.load(file)
+    report(result, baseline, args.top)
+    if args.save:
+        with open(args.save, "w", encoding="UTF-8") as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
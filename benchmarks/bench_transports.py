@@ -0,0 +1,110 @@
+"""
+Throughput of the Content-Length frame parser at message sizes from 100 B to 50 MB.
+
+Run from the package root:
+
+    python -m benchmarks.bench_transports [--legacy]
+
+Reads are capped at 64 KB, which is what a pipe hands out per read(2) on Linux. With --legacy, the
+concatenating parser that TCPTransport.read_socket used before FrameParser is measured too.
+"""
+import io
+import sys
+import time
+from plugin.core.transports import FrameParser
+
+try:
+    from typing import Callable, List
+    assert Callable and List
+except ImportError:
+    pass
+
+PIPE_READ_SIZE = 64 * 1024
+MESSAGE_SIZES = [100, 1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+BYTES_PER_RUN = 100 * 1024 * 1024
+
+
+def frame(content: bytes) -> bytes:
+    return b"Content-Length: " + str(len(content)).encode("ascii") + b"\r\n\r\n" + content
+
+
+def build_stream(message_size: int) -> bytes:
+    content = b'{"jsonrpc": "2.0", "id": 1, "result": "' + b"x" * max(message_size - 42, 0) + b'"}'
+    count = max(BYTES_PER_RUN // message_size, 1)
+    return frame(content) * count
+
+
+def pipe_reader(data: bytes) -> 'Callable[[memoryview], int]':
+    stream = io.BytesIO(data)
+
+    def readinto(view: memoryview) -> int:
+        return stream.readinto(view[:PIPE_READ_SIZE])
+
+    return readinto
+
+
+def run_frame_parser(data: bytes) -> int:
+    parser = FrameParser()
+    readinto = pipe_reader(data)
+    count = 0
+    while parser.fill(readinto):
+        for message in parser.messages():
+            count += 1
+    return count
+
+
+def run_legacy_parser(data: bytes) -> int:
+    stream = io.BytesIO(data)
+    remaining_data = b""
+    content_length = 0
+    in_content = False
+    count = 0
+    while True:
+        received_data = stream.read(4096)
+        if not received_data:
+            return count
+        data = remaining_data + received_data
+        remaining_data = b""
+        while data:
+            if not in_content:
+                headers, sep, rest = data.partition(b"\r\n\r\n")
+                if not sep:
+                    remaining_data = data
+                    break
+                content_length = int(headers[len(b"Content-Length: "):])
+                in_content = True
+                data = rest
+            if len(data) >= content_length:
+                data[:content_length].decode("UTF-8")
+                count += 1
+                data = data[content_length:]
+                in_content = False
+            else:
+                remaining_data = data
+                break
+
+
+def measure(parse: 'Callable[[bytes], int]', message_size: int) -> str:
+    data = build_stream(message_size)
+    start = time.perf_counter()
+    count = parse(data)
+    elapsed = time.perf_counter() - start
+    return "{:>10} B  {:>7} msgs  {:>9.1f} MB/s  {:>10.0f} msgs/s".format(
+        message_size, count, len(data) / elapsed / (1024 * 1024), count / elapsed)
+
+
+def main(argv: 'List[str]') -> None:
+    print("FrameParser")
+    for size in MESSAGE_SIZES:
+        print(measure(run_frame_parser, size))
+    if "--legacy" in argv:
+        print("legacy concatenating parser")
+        for size in MESSAGE_SIZES:
+            if size > 1024 * 1024:
+                print("{:>10} B  skipped (quadratic)".format(size))
+            else:
+                print(measure(run_legacy_parser, size))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
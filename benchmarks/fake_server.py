@@ -0,0 +1,231 @@
+"""
+A stand-in language server, scripted by a scenario file, to measure the plugin against without a real server.
+
+Run from the package root:
+
+    python -m benchmarks.fake_server SCENARIO [--tcp PORT]
+
+It talks over stdin/stdout, or with --tcp accepts one connection on localhost:PORT. A scenario is a JSON object,
+every key is optional:
+
+    {
+      "seed": 1,
+      "initialize": {"delay_ms": 0, "capabilities": {...}},
+      "latency_ms": {"*": DISTRIBUTION, "textDocument/hover": DISTRIBUTION},
+      "completion": {"sample": "tests/pyls_completion_sample.json", "repeat": 1},
+      "diagnostics": {"on": ["textDocument/didOpen"], "files": 1, "per_file": 10},
+      "crash": {"probability": 0.0, "after_requests": 0}
+    }
+
+A DISTRIBUTION is {"fixed": MS}, {"uniform": [MIN, MAX]}, {"lognormal": [MEDIAN, SIGMA]} or
+{"exponential": MEAN}. Completion samples are the "items" (or the list) of a recorded completion response, repeated
+to make huge lists. Diagnostics are published for the changed document plus files - 1 other ones. Crashes exit the
+process without answering, either at random per request or after a number of requests.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import socket
+import sys
+import threading
+
+try:
+    from typing import Any, BinaryIO, Callable, Dict, List, Optional
+    assert Any and BinaryIO and Callable and Dict and List and Optional
+except ImportError:
+    pass
+
+CONTENT_LENGTH = re.compile(rb"Content-Length:\s*(\d+)", re.IGNORECASE)
+REQUEST_CANCELLED = -32800
+DEFAULT_CAPABILITIES = {
+    "textDocumentSync": 1,
+    "hoverProvider": True,
+    "completionProvider": {"triggerCharacters": ["."]},
+    "signatureHelpProvider": {"triggerCharacters": ["("]},
+    "definitionProvider": True,
+    "referencesProvider": True,
+    "documentHighlightProvider": True,
+    "documentSymbolProvider": True
+}
+
+
+def load_scenario(path: str) -> 'Dict[str, Any]':
+    with open(path, encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def sample_delay(distribution: 'Optional[Dict[str, Any]]', rng: random.Random) -> float:
+    """A delay in seconds drawn from a latency distribution given in milliseconds."""
+    if not distribution:
+        return 0.0
+    if "fixed" in distribution:
+        ms = distribution["fixed"]
+    elif "uniform" in distribution:
+        low, high = distribution["uniform"]
+        ms = rng.uniform(low, high)
+    elif "lognormal" in distribution:
+        median, sigma = distribution["lognormal"]
+        ms = rng.lognormvariate(math.log(median), sigma)
+    elif "exponential" in distribution:
+        ms = rng.expovariate(1.0 / distribution["exponential"])
+    else:
+        raise ValueError("unknown latency distribution: {}".format(distribution))
+    return max(ms, 0) / 1000.0
+
+
+def load_completion_items(completion: 'Dict[str, Any]', base_directory: str) -> 'List[Any]':
+    sample = completion.get("sample")
+    if not sample:
+        return [{"label": "item{}".format(i), "kind": 6} for i in range(completion.get("count", 10))]
+    with open(os.path.join(base_directory, sample), encoding="UTF-8") as file:
+        loaded = json.load(file)
+    items = loaded.get("items", []) if isinstance(loaded, dict) else loaded
+    return items * completion.get("repeat", 1)
+
+
+class FakeServer(object):
+    def __init__(self, scenario: 'Dict[str, Any]', write: 'Callable[[bytes], None]',
+                 base_directory: str = ".") -> None:
+        self.scenario = scenario
+        self._write = write
+        self._write_lock = threading.Lock()
+        self._rng = random.Random(scenario.get("seed"))
+        self._completion_items = load_completion_items(scenario.get("completion", {}), base_directory)
+        self._cancelled = set()  # type: set
+        self._requests = 0
+        self.exited = threading.Event()
+
+    def send(self, payload: 'Dict[str, Any]') -> None:
+        body = json.dumps(payload).encode("UTF-8")
+        with self._write_lock:
+            self._write(b"Content-Length: " + str(len(body)).encode("ascii") + b"\r\n\r\n" + body)
+
+    def handle(self, payload: 'Dict[str, Any]') -> None:
+        method = payload.get("method")
+        if method is None:
+            return  # a response to a request of ours
+        if "id" not in payload:
+            self.handle_notification(method, payload.get("params") or {})
+            return
+        self._requests += 1
+        self._maybe_crash()
+        request_id = payload["id"]
+        if method == "initialize":
+            initialize = self.scenario.get("initialize", {})
+            delay = initialize.get("delay_ms", 0) / 1000.0
+            result = {"capabilities": initialize.get("capabilities", DEFAULT_CAPABILITIES)}  # type: Any
+        else:
+            latencies = self.scenario.get("latency_ms", {})
+            delay = sample_delay(latencies.get(method, latencies.get("*")), self._rng)
+            result = self.result_for(method, payload.get("params") or {})
+        if delay:
+            timer = threading.Timer(delay, lambda: self.respond(request_id, result))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.respond(request_id, result)
+
+    def respond(self, request_id: 'Any', result: 'Any') -> None:
+        if request_id in self._cancelled:
+            self._cancelled.discard(request_id)
+            self.send({"jsonrpc": "2.0", "id": request_id,
+                       "error": {"code": REQUEST_CANCELLED, "message": "cancelled"}})
+        else:
+            self.send({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def result_for(self, method: str, params: 'Dict[str, Any]') -> 'Any':
+        if method == "textDocument/completion":
+            return {"isIncomplete": False, "items": self._completion_items}
+        if method == "textDocument/hover":
+            return {"contents": {"kind": "markdown", "value": "**fake** hover"}}
+        if method == "textDocument/signatureHelp":
+            return {"signatures": [{"label": "fake(a, b)", "parameters": [{"label": "a"}, {"label": "b"}]}],
+                    "activeSignature": 0, "activeParameter": 0}
+        return None
+
+    def handle_notification(self, method: str, params: 'Dict[str, Any]') -> None:
+        if method == "exit":
+            self.exited.set()
+        elif method == "$/cancelRequest":
+            self._cancelled.add(params.get("id"))
+        diagnostics = self.scenario.get("diagnostics")
+        if diagnostics and method in diagnostics.get("on", ["textDocument/didOpen", "textDocument/didChange"]):
+            self.publish_diagnostics(params.get("textDocument", {}).get("uri", "file:///fake.py"), diagnostics)
+
+    def publish_diagnostics(self, uri: str, diagnostics: 'Dict[str, Any]') -> None:
+        per_file = diagnostics.get("per_file", 10)
+        uris = [uri] + ["file:///fake/storm{}.py".format(i) for i in range(diagnostics.get("files", 1) - 1)]
+        for target in uris:
+            self.send({"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics", "params": {
+                "uri": target,
+                "diagnostics": [{
+                    "range": {"start": {"line": line, "character": 0}, "end": {"line": line, "character": 5}},
+                    "severity": 1 + line % 4,
+                    "source": "fake",
+                    "message": "fake problem {}".format(line)
+                } for line in range(per_file)]
+            }})
+
+    def _maybe_crash(self) -> None:
+        crash = self.scenario.get("crash", {})
+        after = crash.get("after_requests")
+        if (after and self._requests > after) or self._rng.random() < crash.get("probability", 0):
+            sys.stderr.write("fake server crashing on purpose\n")
+            sys.stderr.flush()
+            os._exit(1)
+
+
+def serve(server: FakeServer, read: 'Callable[[int], bytes]') -> None:
+    """Reads framed messages with read until EOF or exit, and hands them to server."""
+    buffer = b""
+    while not server.exited.is_set():
+        chunk = read(65536)
+        if not chunk:
+            return
+        buffer += chunk
+        while True:
+            separator = buffer.find(b"\r\n\r\n")
+            if separator < 0:
+                break
+            match = CONTENT_LENGTH.search(buffer, 0, separator)
+            length = int(match.group(1)) if match else 0
+            end = separator + 4 + length
+            if len(buffer) < end:
+                break
+            body, buffer = buffer[separator + 4:end], buffer[end:]
+            server.handle(json.loads(body.decode("UTF-8")))
+
+
+def main(argv: 'List[str]') -> None:
+    parser = argparse.ArgumentParser(description="A scripted stand-in language server.")
+    parser.add_argument("scenario")
+    parser.add_argument("--tcp", type=int, help="accept a connection on this port instead of using stdio")
+    args = parser.parse_args(argv)
+    scenario = load_scenario(args.scenario)
+    base_directory = os.getcwd()
+    if args.tcp:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("localhost", args.tcp))
+        listener.listen(1)
+        connection, _address = listener.accept()
+        server = FakeServer(scenario, connection.sendall, base_directory)
+        serve(server, connection.recv)
+        connection.close()
+    else:
+        stdin = sys.stdin.buffer
+        stdout = sys.stdout.buffer
+
+        def write(data: bytes) -> None:
+            stdout.write(data)
+            stdout.flush()
+
+        server = FakeServer(scenario, write, base_directory)
+        serve(server, getattr(stdin, "raw", stdin).read)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,104 @@
+"""
+Replays a recorded language server session (see the "rpc_recording_dir" setting) into a Client, without the server,
+and reports how long the plugin took to handle it. Diagnostics go to a WindowDiagnostics, like they do in a window.
+
+Run from the package root:
+
+    python -m benchmarks.replay RECORDING [--speed N] [--profile]
+    python -m benchmarks.replay --burst FILE [--files N] [--per-file N]
+
+--speed replays at N times the recorded pace, 0 (the default) as fast as possible. Nothing sends the recorded
+requests again, so responses are replayed without waiting for them. --profile prints the functions
+that took the most time. --burst writes a recording of a diagnostics burst to FILE, to replay afterwards.
+"""
+import argparse
+import cProfile
+import json
+import pstats
+import sys
+import time
+from plugin.core.diagnostics import WindowDiagnostics
+from plugin.core.recording import Recorder, ReplayTransport, INBOUND
+from plugin.core.rpc import Client
+from plugin.core.types import Settings
+
+try:
+    from typing import Any, Dict, List
+    assert Any and Dict and List
+except ImportError:
+    pass
+
+
+def write_diagnostics_burst(path: str, files: int, per_file: int) -> None:
+    recorder = Recorder(path, "burst")
+    for file_index in range(files):
+        diagnostics = [{
+            "range": {"start": {"line": line, "character": 0}, "end": {"line": line, "character": 10}},
+            "severity": 1 + line % 4,
+            "source": "burst",
+            "message": "problem {} in file {}".format(line, file_index)
+        } for line in range(per_file)]
+        notification = {"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics",
+                        "params": {"uri": "file:///project/src/file{}.py".format(file_index),
+                                   "diagnostics": diagnostics}}
+        recorder.record(INBOUND, json.dumps(notification))
+    recorder.close()
+    print("wrote {} diagnostics in {} files to {}".format(files * per_file, files, path))
+
+
+def replay(path: str, speed: float) -> 'Dict[str, Any]':
+    """Replays the recording at path, returning how long it took in seconds and how many diagnostics updates it made."""
+    transport = ReplayTransport(path, speed, await_requests=False, paused=True)
+    client = Client(transport, Settings())
+    diagnostics = WindowDiagnostics()
+    updates = [0]
+
+    def on_updated(file_path: str, client_name: str) -> None:
+        updates[0] += 1
+
+    diagnostics.set_on_updated(on_updated)
+    client.on_notification("textDocument/publishDiagnostics",
+                           lambda params: diagnostics.handle_client_diagnostics("replay", params))
+    done = []  # type: List[float]
+    # the replay ends by closing the transport, which the client reports like a crash
+    client.set_crash_handler(lambda: done.append(time.perf_counter()))
+    start = time.perf_counter()
+    transport.play()
+    transport.finished.wait()
+    while not done:
+        time.sleep(0.001)
+    return {"seconds": done[0] - start, "updates": updates[0], "dispatcher": client.dispatcher.stats()}
+
+
+def print_replay(path: str, speed: float) -> None:
+    result = replay(path, speed)
+    print("replayed {} in {:.3f} s, {} diagnostics updates, dispatcher {}".format(
+        path, result["seconds"], result["updates"], result["dispatcher"]))
+
+
+def main(argv: 'List[str]') -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", nargs="?")
+    parser.add_argument("--speed", type=float, default=0)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--burst")
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--per-file", type=int, default=100)
+    args = parser.parse_args(argv)
+    if args.burst:
+        write_diagnostics_burst(args.burst, args.files, args.per_file)
+        return
+    if not args.recording:
+        parser.error("a recording to replay is required")
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        print_replay(args.recording, args.speed)
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        print_replay(args.recording, args.speed)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
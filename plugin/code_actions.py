@@ -17,7 +17,11 @@ from .core.registry import session_for_view
 from .core.settings import settings
 
 
-def send_code_action_request(view: sublime.View, on_response_recieved: 'Callable') -> None:
+def send_code_action_request(view: sublime.View, on_response_recieved: 'Callable',
+                             supersede: bool = False) -> None:
+    """
+    With supersede, a request still in flight for this view is cancelled, for requests made as the cursor moves.
+    """
     session = session_for_view(view, 'codeActionProvider')
     if not session:
         # the server doesn't support code actions, just return
@@ -37,9 +41,11 @@ def send_code_action_request(view: sublime.View, on_response_recieved: 'Callable
                 "diagnostics": list(diagnostic.to_lsp() for diagnostic in point_diagnostics)
             }
         }
+        request = Request.codeAction(params)
         session.client.send_request(
-            Request.codeAction(params),
-            lambda response: on_response_recieved(response))
+            request,
+            lambda response: on_response_recieved(response),
+            supersession_key=(request.method, view.id()) if supersede else None)
 
 
 class LspCodeActionBulbListener(sublime_plugin.ViewEventListener):
@@ -65,7 +71,7 @@ class LspCodeActionBulbListener(sublime_plugin.ViewEventListener):
 
     def fire_request(self, current_point: int) -> None:
         if current_point == self._stored_point:
-            send_code_action_request(self.view, self.handle_response)
+            send_code_action_request(self.view, self.handle_response, supersede=True)
 
     def handle_response(self, response: 'Any') -> None:
         if settings.show_code_actions_bulb:
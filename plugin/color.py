@@ -11,6 +11,7 @@ from .core.protocol import Request
 from .core.url import filename_to_uri
 from .core.registry import session_for_view, sessions_for_view, client_from_session, configs_for_scope
 from .core.settings import settings, client_configs
+from .core.types import ClientStates
 from .core.views import range_to_region
 from .core.protocol import Range
 from .core.configurations import is_supported_syntax
@@ -46,12 +47,15 @@ class LspColorListener(sublime_plugin.ViewEventListener):
         configs = configs_for_scope(self.view)
         if not configs:
             self.initialized = True  # no server enabled, re-open file to activate feature.
-        sessions = list(sessions_for_view(self.view))
+        sessions = list(sessions_for_view(self.view, include_starting=True))
         if sessions:
             self.initialized = True
-            if any(session.has_capability('colorProvider') for session in sessions):
-                self.enabled = True
+            self.enabled = any(session.has_capability('colorProvider') for session in sessions)
+            if self.enabled:
                 self.send_color_request()
+            if any(session.state == ClientStates.STARTING for session in sessions):
+                # enabled by the capabilities the server had last time, check them again once it is ready
+                sublime.set_timeout_async(lambda: self.initialize(is_retry=True), 1000)
         elif not is_retry:
             # session may be starting, try again once in a second.
             sublime.set_timeout_async(lambda: self.initialize(is_retry=True), 1000)
@@ -4,6 +4,8 @@ import sublime_plugin
 try:
     from typing import Any, List, Dict, Tuple, Callable, Optional, Union
     assert Any and List and Dict and Tuple and Callable and Optional and Union
+    from .core.futures import Future
+    assert Future
 except ImportError:
     pass
 
@@ -12,7 +14,7 @@ from .core.events import global_events
 from .core.settings import settings, client_configs
 from .core.logging import debug
 from .core.completion import parse_completion_response, format_completion
-from .core.registry import session_for_view, client_from_session
+from .core.registry import session_for_view, client_from_session, early_session_for_view
 from .core.configurations import is_supported_syntax
 from .core.documents import get_document_position, is_at_word
 from .core.sessions import Session
@@ -23,7 +25,6 @@ class CompletionState(object):
     IDLE = 0
     REQUESTING = 1
     APPLYING = 2
-    CANCELLING = 3
 
 
 last_text_command = None
@@ -53,8 +54,8 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         self.auto_complete_selector = view.settings().get("auto_complete_selector", "") or ""  # type: str
         self.resolve = False
         self.state = CompletionState.IDLE
+        self.request = None  # type: Optional[Future]
         self.completions = []  # type: List[Any]
-        self.next_request = None  # type: Optional[Tuple[str, List[int]]]
         self.last_prefix = ""
         self.last_location = -1
         self.committing = False
@@ -70,8 +71,10 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         return is_supported_syntax(syntax, client_configs.all) if syntax else False
 
     def initialize(self) -> None:
-        self.initialized = True
-        session = session_for_view(self.view, 'completionProvider')
+        session, starting = early_session_for_view(self.view, 'completionProvider')
+        # wired up again once the servers of the view are ready
+        self.initialized = not starting
+        self.enabled = False
         if session:
             completionProvider = session.get_capability('completionProvider') or dict()  # type: dict
             # A language server may have an empty dict as CompletionOptions. In that case,
@@ -158,7 +161,7 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         # cancel current completion if the previous input is an space
         prev_char = self.view.substr(self.view.sel()[0].begin() - 1)
         if self.state == CompletionState.REQUESTING and prev_char.isspace():
-            self.state = CompletionState.CANCELLING
+            self.cancel_request()
 
         if self.committing:
             self.committing = False
@@ -221,9 +224,12 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
                     self.do_request(prefix, locations)
                     self.completions = []
 
-            elif self.state in (CompletionState.REQUESTING, CompletionState.CANCELLING):
-                self.next_request = (prefix, locations)
-                self.state = CompletionState.CANCELLING
+            elif self.state == CompletionState.REQUESTING:
+                # the request in flight is superseded by this one (or by nothing, if none is sent now).
+                self.cancel_request()
+                self.last_prefix = prefix
+                self.last_location = locations[0]
+                self.do_request(prefix, locations)
 
             elif self.state == CompletionState.APPLYING:
                 self.state = CompletionState.IDLE
@@ -240,7 +246,6 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
         self.committing = command_name in ('commit_completion', 'insert_best_completion', 'auto_complete')
 
     def do_request(self, prefix: str, locations: 'List[int]') -> None:
-        self.next_request = None
         view = self.view
 
         # don't store client so we can handle restarts
@@ -252,12 +257,21 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
             global_events.publish("view.on_purge_changes", self.view)
             document_position = get_document_position(view, locations[0])
             if document_position:
-                client.send_request(
-                    Request.complete(document_position),
+                request = Request.complete(document_position)
+                self.request = client.send_request(
+                    request,
                     self.handle_response,
-                    self.handle_error)
+                    self.handle_error,
+                    supersession_key=(request.method, view.id()))
                 self.state = CompletionState.REQUESTING
 
+    def cancel_request(self) -> None:
+        """Cancels the request in flight, its response will not arrive."""
+        if self.request:
+            self.request.cancel()
+            self.request = None
+        self.state = CompletionState.IDLE
+
     def do_resolve(self, item: dict) -> None:
         view = self.view
 
@@ -280,6 +294,7 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
             sublime.status_message('Applied additional edits for completion')
 
     def handle_response(self, response: 'Optional[Union[Dict,List]]') -> None:
+        self.request = None
         if self.state == CompletionState.REQUESTING:
 
             last_col = self.last_location
@@ -303,16 +318,12 @@ class CompletionHandler(sublime_plugin.ViewEventListener):
             self.state = CompletionState.APPLYING
             self.view.run_command("hide_auto_complete")
             self.run_auto_complete()
-        elif self.state == CompletionState.CANCELLING:
-            self.state = CompletionState.IDLE
-            if self.next_request:
-                prefix, locations = self.next_request
-                self.do_request(prefix, locations)
         else:
             debug('Got unexpected response while in state {}'.format(self.state))
 
     def handle_error(self, error: dict) -> None:
         sublime.status_message('Completion error: ' + str(error.get('message')))
+        self.request = None
         self.state = CompletionState.IDLE
 
     def run_auto_complete(self) -> None:
@@ -1,4 +1,3 @@
-import mdpopups
 import sublime
 import sublime_plugin
 import webbrowser
@@ -181,6 +180,7 @@ class LspSetupLanguageServerCommand(sublime_plugin.WindowCommand):
                 title = "# No Language Server support"
                 content = unsupported_syntax_template.format(syntax_name)
 
+            import mdpopups  # here rather than at startup, which it would slow down
             mdpopups.show_popup(
                 view,
                 "\n".join([title, content]),
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import threading
+from .logging import debug, exception_log
+from .types import ClientConfig
+
+try:
+    from typing import Any, Dict, Optional
+    assert Any and Dict and Optional
+except ImportError:
+    pass
+
+
+class CapabilityCache(object):
+    """
+    The capabilities each server sent in its last initialize result, kept in a JSON file, so features can be wired up
+    for views opened while the server starts. An entry only applies to the same command with the same executable,
+    judged by its path and modification time, so upgrading a server drops its entry.
+
+    Without a path (the "cache_capabilities" setting off), nothing is remembered.
+    """
+
+    def __init__(self) -> None:
+        self._path = None  # type: Optional[str]
+        self._entries = None  # type: Optional[Dict[str, Any]]
+        self._lock = threading.Lock()
+
+    def set_path(self, path: 'Optional[str]') -> None:
+        with self._lock:
+            self._path = path
+            self._entries = None
+
+    def get(self, config: ClientConfig) -> 'Optional[Dict[str, Any]]':
+        identity = executable_identity(config)
+        if not identity:
+            return None
+        with self._lock:
+            entry = self._load().get(config.name)
+        if entry and entry.get("identity") == identity:
+            return entry.get("capabilities")
+        return None
+
+    def put(self, config: ClientConfig, capabilities: 'Dict[str, Any]') -> None:
+        """Remembers capabilities for config, writing the file only when they changed."""
+        identity = executable_identity(config)
+        if not identity:
+            return
+        entry = {"identity": identity, "capabilities": capabilities}
+        with self._lock:
+            entries = self._load()
+            if not self._path or entries.get(config.name) == entry:
+                return
+            entries[config.name] = entry
+            try:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                temporary = self._path + ".tmp"
+                with open(temporary, "w", encoding="UTF-8") as file:
+                    json.dump(entries, file, sort_keys=True)
+                os.replace(temporary, self._path)
+            except OSError as err:
+                exception_log("Failure writing capabilities to " + self._path, err)
+
+    def _load(self) -> 'Dict[str, Any]':
+        if self._entries is None:
+            self._entries = {}
+            if self._path and os.path.exists(self._path):
+                try:
+                    with open(self._path, encoding="UTF-8") as file:
+                        loaded = json.load(file)
+                    if isinstance(loaded, dict):
+                        self._entries = loaded
+                except (OSError, ValueError) as err:
+                    debug("ignoring capability cache", self._path, ":", err)
+        return self._entries
+
+
+def executable_identity(config: ClientConfig) -> 'Optional[Dict[str, Any]]':
+    """The command of config with the path and modification time of its executable, None if it cannot be found."""
+    if not config.binary_args:
+        return None
+    executable = shutil.which(config.binary_args[0])
+    if not executable:
+        return None
+    try:
+        mtime = os.path.getmtime(executable)
+    except OSError:
+        return None
+    return {"command": config.binary_args, "executable": os.path.realpath(executable), "mtime": mtime}
+
+
+capability_cache = CapabilityCache()
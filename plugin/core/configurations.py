@@ -82,6 +82,10 @@ def apply_window_settings(client_config: 'ClientConfig', window: 'sublime.Window
             client_settings,
             client_env,
             overrides.get("tcp_host", client_config.tcp_host),
+            overrides.get("unix_socket", client_config.unix_socket),
+            overrides.get("pool_size", client_config.pool_size),
+            overrides.get("pool_idle_timeout", client_config.pool_idle_timeout),
+            overrides.get("resource_limits", client_config.resource_limits),
         )
 
     return client_config
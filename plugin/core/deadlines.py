@@ -0,0 +1,94 @@
+import heapq
+import threading
+from time import monotonic
+from .logging import exception_log
+
+try:
+    from typing import Callable, List, Optional, Tuple
+    assert Callable and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+class Deadline(object):
+    def __init__(self, when: float, callback: 'Callable[[], None]') -> None:
+        self.when = when
+        self.callback = callback  # type: Optional[Callable[[], None]]
+
+    def cancel(self) -> None:
+        self.callback = None
+
+    def cancelled(self) -> bool:
+        return self.callback is None
+
+
+class Deadlines(object):
+    """
+    Calls back once deadlines pass, on one thread shared by every deadline.
+
+    Deadlines are kept in a heap. Cancelling one only marks it, it is dropped when it reaches the top of the heap,
+    or when cancelled deadlines make up most of the heap.
+    """
+
+    def __init__(self) -> None:
+        self._heap = []  # type: List[Tuple[float, int, Deadline]]
+        self._count = 0
+        self._cancelled = 0
+        self._condition = threading.Condition()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def schedule(self, delay: float, callback: 'Callable[[], None]') -> Deadline:
+        deadline = Deadline(monotonic() + delay, callback)
+        with self._condition:
+            self._count += 1
+            heapq.heappush(self._heap, (deadline.when, self._count, deadline))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="LSP deadlines")
+                self._thread.daemon = True
+                self._thread.start()
+            elif self._heap[0][2] is deadline:
+                self._condition.notify()
+        return deadline
+
+    def cancel(self, deadline: Deadline) -> None:
+        with self._condition:
+            if deadline.cancelled():
+                return
+            deadline.cancel()
+            self._cancelled += 1
+            if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled()]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._cancelled
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    when, _count, deadline = self._heap[0]
+                    if deadline.cancelled():
+                        heapq.heappop(self._heap)
+                        self._cancelled -= 1
+                        continue
+                    delay = when - monotonic()
+                    if delay > 0:
+                        self._condition.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    callback = deadline.callback
+                    deadline.cancel()
+                    break
+            try:
+                if callback:
+                    callback()
+            except Exception as err:
+                exception_log("Error in deadline callback", err)
+
+
+deadlines = Deadlines()
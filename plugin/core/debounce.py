@@ -0,0 +1,101 @@
+import threading
+from time import monotonic
+
+try:
+    from typing import Any, Dict, Optional
+    assert Any and Dict and Optional
+    from .metrics import ServerMetrics
+    assert ServerMetrics
+except ImportError:
+    pass
+
+
+# how much the latest measurement counts in the running averages
+SMOOTHING = 0.3
+
+# edits closer together than this many seconds are taken as one burst of typing
+TYPING_GAP = 1.0
+
+# seconds waited per character of the document, as the larger it is the longer it takes to send (without incremental
+# sync) and to parse again: half a millisecond per thousand
+SIZE_COST = 0.0000005
+
+
+def _average(average: 'Optional[float]', value: float) -> float:
+    return value if average is None else average + SMOOTHING * (value - average)
+
+
+class DocumentTiming(object):
+    def __init__(self) -> None:
+        self.edited_at = None  # type: Optional[float]
+        self.typing_interval = None  # type: Optional[float]
+        self.sent_at = None  # type: Optional[float]
+        self.delay = 0.0
+
+
+class ChangeDebounce(object):
+    """
+    How long a session waits after an edit before sending didChange, for each document. Never less than the minimum
+    delay plus a little for each character of the document, and no more than the maximum. Within that:
+
+    - while typing, a bit longer than the usual gap between edits, so a burst goes out as one change;
+    - half as long as the server took to publish diagnostics after a change, as it would only be busier otherwise.
+    """
+
+    def __init__(self) -> None:
+        self.diagnostics_turnaround = None  # type: Optional[float]
+        self._documents = {}  # type: Dict[str, DocumentTiming]
+        self._metrics = None  # type: Optional[ServerMetrics]
+        self._lock = threading.Lock()
+
+    def set_metrics(self, metrics: 'ServerMetrics') -> None:
+        self._metrics = metrics
+
+    def edited(self, uri: str, size: int, min_delay: float, max_delay: float,
+               now: 'Optional[float]' = None) -> float:
+        """Counts an edit of uri, a document of size characters, and returns the seconds to wait before sending it."""
+        now = monotonic() if now is None else now
+        with self._lock:
+            document = self._documents.setdefault(uri, DocumentTiming())
+            if document.edited_at is not None and now - document.edited_at < TYPING_GAP:
+                document.typing_interval = _average(document.typing_interval, now - document.edited_at)
+            else:
+                document.typing_interval = None
+            document.edited_at = now
+            delay = min_delay + size * SIZE_COST
+            if document.typing_interval is not None:
+                delay = max(delay, 1.5 * document.typing_interval)
+            if self.diagnostics_turnaround is not None:
+                delay = max(delay, self.diagnostics_turnaround / 2)
+            document.delay = max(min_delay, min(delay, max_delay))
+        if self._metrics:
+            self._metrics.observe_change_delay(document.delay)
+        return document.delay
+
+    def sent(self, uri: str, now: 'Optional[float]' = None) -> None:
+        with self._lock:
+            self._documents.setdefault(uri, DocumentTiming()).sent_at = monotonic() if now is None else now
+
+    def diagnostics_received(self, uri: str, now: 'Optional[float]' = None) -> None:
+        """Measures how long the server took to publish diagnostics for uri after the change last sent."""
+        now = monotonic() if now is None else now
+        with self._lock:
+            document = self._documents.get(uri)
+            if not document or document.sent_at is None:
+                return  # not after a change, or the first publish after it
+            self.diagnostics_turnaround = _average(self.diagnostics_turnaround, now - document.sent_at)
+            document.sent_at = None
+            turnaround = self.diagnostics_turnaround
+        if self._metrics:
+            self._metrics.observe_diagnostics_turnaround(turnaround)
+
+    def forget(self, uri: str) -> None:
+        with self._lock:
+            self._documents.pop(uri, None)
+
+    def to_dict(self) -> 'Dict[str, Any]':
+        with self._lock:
+            return {
+                "diagnostics_turnaround": self.diagnostics_turnaround,
+                "delays": dict((uri, document.delay) for uri, document in self._documents.items())
+            }
@@ -0,0 +1,85 @@
+import heapq
+import threading
+from time import monotonic
+from .logging import exception_log
+
+try:
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+    assert Any and Callable and Dict and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+DISPATCH_INTERACTIVE = 0  # responses to requests the user is waiting on
+DISPATCH_NORMAL = 1
+DISPATCH_BACKGROUND = 2  # e.g. diagnostics and log messages
+DISPATCH_LAST = 3  # after everything dispatched before it
+
+
+class Dispatcher(object):
+    """
+    Runs the handlers of incoming messages on a thread of its own, so the transport can keep reading while they run.
+    Handlers run one at a time, the most urgent first and in the order they were dispatched otherwise.
+    """
+
+    def __init__(self, name: str = "LSP dispatch") -> None:
+        self._name = name
+        self._queue = []  # type: List[Tuple[int, int, float, Callable[[], None]]]
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._closed = False
+        self.dispatched = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def dispatch(self, priority: int, callback: 'Callable[[], None]') -> None:
+        with self._condition:
+            if self._closed:
+                return
+            self._sequence += 1
+            heapq.heappush(self._queue, (priority, self._sequence, monotonic(), callback))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def close(self) -> None:
+        """Handles what was dispatched so far, then stops."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> 'Dict[str, Any]':
+        """Queue depth and how long handlers waited to run, in seconds."""
+        with self._condition:
+            return {
+                "depth": len(self._queue),
+                "max_depth": self.max_depth,
+                "dispatched": self.dispatched,
+                "mean_wait": self.total_wait / self.dispatched if self.dispatched else 0.0,
+                "max_wait": self.max_wait
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                _priority, _sequence, dispatched_at, callback = heapq.heappop(self._queue)
+                wait = monotonic() - dispatched_at
+                self.dispatched += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                callback()
+            except Exception as err:
+                exception_log("Error handling server payload", err)
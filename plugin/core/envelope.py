@@ -0,0 +1,98 @@
+import json
+import json.decoder
+import re
+
+try:
+    from typing import Any, Callable, Dict, Optional, Tuple
+    assert Any and Callable and Dict and Optional and Tuple
+except ImportError:
+    pass
+
+
+ROUTING_MEMBERS = ("jsonrpc", "id", "method")
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+# the string scanner of the json module (the C one where there is one), which its stubs do not export
+scanstring = getattr(json.decoder, "scanstring")  # type: Callable[[str, int], Tuple[str, int]]
+
+
+class Envelope(object):
+    """
+    The members of an incoming JSON-RPC message needed to route it. The whole message is only decoded once payload
+    is asked for, by whoever handles it.
+    """
+
+    def __init__(self, message: str, id: 'Any', method: 'Optional[str]',
+                 payload: 'Optional[Dict[str, Any]]' = None) -> None:
+        self.id = id
+        self.method = method
+        self._message = message  # type: Optional[str]
+        self._payload = payload
+
+    @property
+    def payload(self) -> 'Dict[str, Any]':
+        if self._payload is None:
+            assert self._message is not None
+            self._payload = json.loads(self._message)
+            self._message = None
+        return self._payload
+
+    def is_decoded(self) -> bool:
+        return self._payload is not None
+
+
+def peek_envelope(message: str) -> Envelope:
+    """
+    Reads the id and method of a message without decoding params, result or error, which servers send after them.
+    Falls back to decoding the whole message when they come later. Raises ValueError if the message is not JSON.
+    """
+    try:
+        envelope = _scan_routing_members(message)
+    except (ValueError, IndexError):
+        envelope = None
+    if envelope is None:
+        payload = json.loads(message)
+        if not isinstance(payload, dict):
+            raise ValueError("not a JSON object")
+        envelope = Envelope(message, payload.get("id"), payload.get("method"), payload)
+    return envelope
+
+
+def _scan_routing_members(message: str) -> 'Optional[Envelope]':
+    position = _skip_whitespace(message, 0)
+    if message[position] != '{':
+        return None
+    members = {}  # type: Dict[str, Any]
+    position += 1
+    while True:
+        position = _skip_whitespace(message, position)
+        if message[position] != '"':
+            return None
+        key, position = scanstring(message, position + 1)
+        position = _skip_whitespace(message, position)
+        if message[position] != ':':
+            return None
+        position = _skip_whitespace(message, position + 1)
+        if key not in ROUTING_MEMBERS:
+            break
+        members[key], position = _decoder.raw_decode(message, position)
+        position = _skip_whitespace(message, position)
+        if message[position] != ',':
+            # the message ended before params, result or error
+            return None
+        position += 1
+    if key in ("result", "error"):
+        # a response, its id is all that matters
+        if members.get("id") is None:
+            return None
+        return Envelope(message, members["id"], None)
+    if key == "params" and "method" in members:
+        # the id of a request may still follow, it is only needed once a handler takes the message
+        return Envelope(message, members.get("id"), members["method"])
+    return None
+
+
+def _skip_whitespace(message: str, position: int) -> int:
+    match = WHITESPACE.match(message, position)
+    return match.end() if match else position
@@ -22,7 +22,8 @@ class Events:
 
     def publish(self, key: str, *args: 'Any') -> None:
         if key in self._listener_dict:
-            for listener in self._listener_dict[key]:
+            # a copy, as listeners may unsubscribe
+            for listener in list(self._listener_dict[key]):
                 listener(*args)
 
     def reset(self) -> None:
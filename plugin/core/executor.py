@@ -0,0 +1,46 @@
+import queue
+import threading
+from .logging import exception_log
+
+try:
+    from typing import Callable, List
+    assert Callable and List
+except ImportError:
+    pass
+
+
+class Executor(object):
+    """
+    Runs tasks on a few background threads, started on the first task. Used to start language servers, which
+    spawns processes and connects sockets, without holding up the thread that asked for them, and to start the
+    servers of a window side by side.
+    """
+
+    def __init__(self, max_workers: int, name: str) -> None:
+        self.max_workers = max_workers
+        self._name = name
+        self._queue = queue.Queue()  # type: queue.Queue
+        self._threads = []  # type: List[threading.Thread]
+        self._lock = threading.Lock()
+
+    def submit(self, task: 'Callable[[], None]') -> None:
+        self._queue.put(task)
+        with self._lock:
+            if not self._threads:
+                for index in range(self.max_workers):
+                    thread = threading.Thread(target=self._run, name="{} {}".format(self._name, index + 1))
+                    thread.daemon = True
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            task = self._queue.get()
+            try:
+                task()
+            except Exception as ex:
+                exception_log("error in background task", ex)
+
+
+# enough to start the servers of a typical project at once
+startup_executor = Executor(4, "LSP startup")
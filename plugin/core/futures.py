@@ -0,0 +1,253 @@
+import threading
+from .logging import exception_log
+from .protocol import ErrorCode
+
+try:
+    from typing import Any, Callable, Dict, Iterable, List, Optional
+    assert Any and Callable and Dict and Iterable and List and Optional
+except ImportError:
+    pass
+
+
+PENDING = 0
+RESOLVED = 1
+FAILED = 2
+CANCELLED = 3
+
+
+class RequestError(Exception):
+    """Raised by Future.result for a request the server answered with an error."""
+
+    def __init__(self, error: 'Optional[Dict[str, Any]]') -> None:
+        self.error = error or {}
+        super().__init__(self.error.get("message", "request failed"))
+
+    @property
+    def code(self) -> 'Optional[int]':
+        return self.error.get("code")
+
+
+class CancelledError(Exception):
+    pass
+
+
+class Future(object):
+    """
+    The eventual result of a request.
+
+    Done callbacks run on the thread that completes the future (for a response, the dispatcher thread of its client),
+    or right away when added to a future that is already done.
+    """
+
+    def __init__(self, on_cancel: 'Optional[Callable[[], Any]]' = None) -> None:
+        self._condition = threading.Condition()
+        self._state = PENDING
+        self._result = None  # type: Any
+        self._error = None  # type: Optional[Dict[str, Any]]
+        self._callbacks = []  # type: List[Callable[[Future], None]]
+        self._on_cancel = on_cancel
+
+    def done(self) -> bool:
+        return self._state != PENDING
+
+    def cancelled(self) -> bool:
+        return self._state == CANCELLED
+
+    def has_callbacks(self) -> bool:
+        return bool(self._callbacks)
+
+    def result(self, timeout: 'Optional[float]' = None) -> 'Any':
+        """
+        Waits up to timeout seconds (forever if None) and returns the result.
+        Raises TimeoutError, CancelledError or, for an error response, RequestError.
+        """
+        with self._condition:
+            if not self._condition.wait_for(self.done, timeout):
+                raise TimeoutError()
+        if self._state == CANCELLED:
+            raise CancelledError()
+        if self._state == FAILED:
+            raise RequestError(self._error)
+        return self._result
+
+    def error(self) -> 'Optional[Dict[str, Any]]':
+        """The error response of a failed future, None otherwise."""
+        return self._error
+
+    def add_done_callback(self, callback: 'Callable[[Future], None]') -> None:
+        with self._condition:
+            if self._state == PENDING:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def then(self, callback: 'Callable[[Any], Any]') -> 'Future':
+        """
+        Returns a future for callback applied to the result. If callback returns a Future, the returned future
+        follows that one, so requests can be chained. Errors and cancellation are passed along, cancelling the
+        returned future cancels this one and the future callback returned.
+        """
+        inner = []  # type: List[Future]
+        chained = Future(on_cancel=lambda: _cancel_all([self] + inner))
+
+        def on_done(future: Future) -> None:
+            if future._state == RESOLVED:
+                try:
+                    value = callback(future._result)
+                except Exception as err:
+                    exception_log("Error in future callback", err)
+                    chained.set_error({"code": ErrorCode.InternalError, "message": str(err)})
+                    return
+                if isinstance(value, Future):
+                    inner.append(value)
+                    if chained.cancelled():
+                        # cancelled while callback ran
+                        value.cancel()
+                    value.add_done_callback(chained._copy_state)
+                else:
+                    chained.set_result(value)
+            else:
+                chained._copy_state(future)
+
+        self.add_done_callback(on_done)
+        return chained
+
+    def set_result(self, result: 'Any') -> bool:
+        return self._complete(RESOLVED, result, None)
+
+    def set_error(self, error: 'Optional[Dict[str, Any]]') -> bool:
+        return self._complete(FAILED, None, error)
+
+    def cancel(self) -> bool:
+        """Cancels a pending future and returns True, or returns False if it was done already."""
+        if not self._complete(CANCELLED, None, None):
+            return False
+        if self._on_cancel:
+            self._on_cancel()
+        return True
+
+    def _copy_state(self, other: 'Future') -> None:
+        if other._state == CANCELLED:
+            self.cancel()
+        else:
+            self._complete(other._state, other._result, other._error)
+
+    def _complete(self, state: int, result: 'Any', error: 'Optional[Dict[str, Any]]') -> bool:
+        with self._condition:
+            if self._state != PENDING:
+                return False
+            self._state = state
+            self._result = result
+            self._error = error
+            callbacks = self._callbacks
+            self._callbacks = []
+            self._condition.notify_all()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as err:
+                exception_log("Error in future callback", err)
+        return True
+
+
+def resolved(result: 'Any') -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def failed(error: 'Optional[Dict[str, Any]]') -> Future:
+    future = Future()
+    future.set_error(error)
+    return future
+
+
+def gather(futures: 'Iterable[Future]') -> Future:
+    """
+    A future for the list of results, in order. Fails with the first error, cancelling the others.
+    """
+    pending = list(futures)
+    combined = Future(on_cancel=lambda: _cancel_all(pending))
+    if not pending:
+        combined.set_result([])
+        return combined
+    remaining = [len(pending)]
+    lock = threading.Lock()
+
+    def on_done(future: Future) -> None:
+        if future._state != RESOLVED:
+            if combined.done():
+                return
+            combined._copy_state(future)
+            _cancel_all(pending)
+            return
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            combined.set_result([f._result for f in pending])
+
+    for future in pending:
+        future.add_done_callback(on_done)
+    return combined
+
+
+def first_completed(futures: 'Iterable[Future]', cancel_others: bool = False) -> Future:
+    """
+    A future for whichever of futures is done first, be it resolved, failed or cancelled.
+    Its result is that future itself. Raises ValueError without futures, as none would ever be done.
+    """
+    pending = list(futures)
+    if not pending:
+        raise ValueError("first_completed needs at least one future")
+    combined = Future(on_cancel=lambda: _cancel_all(pending))
+
+    def on_done(future: Future) -> None:
+        if combined.set_result(future) and cancel_others:
+            _cancel_all(pending)
+
+    for future in pending:
+        future.add_done_callback(on_done)
+    return combined
+
+
+def _cancel_all(futures: 'List[Future]') -> None:
+    for future in futures:
+        future.cancel()
+
+
+def wrap_future(future: Future, loop: 'Optional[Any]' = None) -> 'Any':
+    """
+    Bridges a Future into an asyncio future on loop (the current event loop by default), so it can be awaited.
+    Only available with asyncio, so not on Python 3.3.
+    """
+    # imported here, as it takes longer to import than the rest of the plugin core and few callers need it
+    try:
+        import asyncio
+    except ImportError:
+        # Sublime Text 3 bundles Python 3.3, which predates asyncio.
+        raise RuntimeError("asyncio is not available")
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    bridged = loop.create_future()
+
+    def copy_state(source: Future) -> None:
+        if bridged.cancelled():
+            return
+        if source.cancelled():
+            bridged.cancel()
+        elif source._state == FAILED:
+            bridged.set_exception(RequestError(source._error))
+        else:
+            bridged.set_result(source._result)
+
+    def on_bridged_done(target: 'Any') -> None:
+        if target.cancelled():
+            future.cancel()
+
+    def on_done(source: Future) -> None:
+        loop.call_soon_threadsafe(copy_state, source)
+
+    bridged.add_done_callback(on_bridged_done)
+    future.add_done_callback(on_done)
+    return bridged
@@ -1,14 +1,19 @@
+import json
+import threading
+import time
 import traceback
+from collections import deque
 
 MYPY = False
 if MYPY:
-    from typing import Any
-    assert Any
+    from typing import Any, Deque, Dict, List, Optional, Tuple
+    assert Any and Deque and Dict and List and Optional and Tuple
 
 
 log_debug = False
 log_exceptions = True
 log_server = True
+payload_limit = 2000  # characters of a logged payload, 0 for no limit
 
 
 def set_debug_logging(logging_enabled: bool) -> None:
@@ -26,12 +31,32 @@ def set_server_logging(logging_enabled: bool) -> None:
     log_server = logging_enabled
 
 
+def set_payload_limit(limit: int) -> None:
+    global payload_limit
+    payload_limit = limit
+
+
+def set_log_buffer_size(size: int) -> None:
+    log_buffer.set_capacity(size)
+
+
 def debug(*args: 'Any') -> None:
     """Print args to the console if the "debug" setting is True."""
     if log_debug:
         printf(*args)
 
 
+def trace(server_name: str, *args: 'Any') -> None:
+    """
+    Like debug, and also keeps args in the log buffer of the server. Nothing is formatted unless it gets printed or
+    dumped, so pass the parts of a message as args instead of building a string.
+    """
+    if log_debug:
+        printf(*args)
+    if log_buffer.capacity:
+        log_buffer.append(server_name, args)
+
+
 def exception_log(message: str, ex: Exception) -> None:
     if log_exceptions:
         print(message)
@@ -42,8 +67,101 @@ def exception_log(message: str, ex: Exception) -> None:
 def server_log(server_name: str, *args: 'Any') -> None:
     if log_server:
         printf(*args, prefix=server_name)
+    if log_buffer.capacity:
+        log_buffer.append(server_name, args)
 
 
 def printf(*args: 'Any', prefix: str = 'LSP') -> None:
     """Print args to the console, prefixed by the plugin name."""
     print(prefix + ":", *args)
+
+
+class Payload(object):
+    """A JSON payload to log, serialized and cut to payload_limit characters only when it is printed."""
+
+    __slots__ = ('value', '_text')
+
+    def __init__(self, value: 'Any') -> None:
+        self.value = value
+        self._text = None  # type: Optional[str]
+
+    def __str__(self) -> str:
+        if self._text is None:
+            try:
+                text = json.dumps(self.value)
+            except (TypeError, ValueError):
+                text = repr(self.value)
+            if payload_limit and len(text) > payload_limit:
+                text = "{}... ({} more characters)".format(text[:payload_limit], len(text) - payload_limit)
+            self._text = text
+        return self._text
+
+
+class LogRecord(object):
+    __slots__ = ('created', 'server_name', 'args')
+
+    def __init__(self, created: float, server_name: str, args: 'Tuple[Any, ...]') -> None:
+        self.created = created
+        self.server_name = server_name
+        self.args = args
+
+    def message(self) -> str:
+        return " ".join(str(arg) for arg in self.args)
+
+    def format(self) -> str:
+        return "{}.{:03d} {}: {}".format(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created)),
+                                         int(self.created % 1 * 1000), self.server_name, self.message())
+
+
+class LogBuffer(object):
+    """The last capacity log records of every server, to dump when something went wrong."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._records = {}  # type: Dict[str, Deque[LogRecord]]
+        self._lock = threading.Lock()
+
+    def set_capacity(self, capacity: int) -> None:
+        with self._lock:
+            self.capacity = capacity
+            if capacity:
+                self._records = dict((name, deque(records, capacity)) for name, records in self._records.items())
+            else:
+                self._records = {}
+
+    def append(self, server_name: str, args: 'Tuple[Any, ...]') -> None:
+        # payloads are kept as they are, and only serialized (and cut) when the buffer is read
+        record = LogRecord(time.time(), server_name, args)
+        records = self._records.get(server_name)
+        if records is None:
+            with self._lock:
+                records = self._records.setdefault(server_name, deque(maxlen=self.capacity))
+        records.append(record)
+
+    def server_names(self) -> 'List[str]':
+        return sorted(self._records)
+
+    def records(self, server_name: 'Optional[str]' = None) -> 'List[LogRecord]':
+        """The records of one server, or of all of them, oldest first."""
+        with self._lock:
+            if server_name is not None:
+                return list(self._records.get(server_name, ()))
+            merged = [record for records in self._records.values() for record in list(records)]
+        merged.sort(key=lambda record: record.created)
+        return merged
+
+    def dump(self, path: str, server_name: 'Optional[str]' = None) -> int:
+        """Writes the records to path, returns how many were written."""
+        records = self.records(server_name)
+        with open(path, "w", encoding="UTF-8") as file:
+            for record in records:
+                file.write(record.format())
+                file.write("\n")
+        return len(records)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records = {}
+
+
+log_buffer = LogBuffer(0)
@@ -7,33 +7,52 @@ try:
 except ImportError:
     pass
 
+import os
 import sublime
 
 from .settings import (
     settings, load_settings, unload_settings
 )
-from .logging import set_debug_logging, set_server_logging
+from .logging import debug, set_debug_logging, set_server_logging, set_payload_limit, set_log_buffer_size
 from .events import global_events
 from .registry import windows, load_handlers, unload_sessions
 from .panels import destroy_output_panels
+from .metrics import start_metrics_dump, stop_metrics_dump
+from .pool import process_pools
+from .resources import resource_monitor
+from .capabilities import capability_cache
+from .profiling import startup_profile
 
 
 def startup() -> None:
-    load_settings()
-    set_debug_logging(settings.log_debug)
-    set_server_logging(settings.log_server)
+    with startup_profile.phase("load settings"):
+        load_settings()
+        set_debug_logging(settings.log_debug)
+        set_server_logging(settings.log_server)
+        set_payload_limit(settings.log_payloads_limit)
+        set_log_buffer_size(settings.log_buffer_size)
+        resource_monitor.set_interval(settings.resource_monitor_interval)
+        if settings.cache_capabilities:
+            capability_cache.set_path(os.path.join(sublime.cache_path(), "LSP", "capabilities.json"))
     load_handlers()
-    global_events.subscribe("view.on_load_async", on_view_activated)
-    global_events.subscribe("view.on_activated_async", on_view_activated)
-    if settings.show_status_messages:
-        sublime.status_message("LSP initialized")
-    start_active_window()
+    with startup_profile.phase("start active window"):
+        if settings.rpc_metrics:
+            start_metrics_dump(settings.rpc_metrics_file, settings.rpc_metrics_interval)
+        global_events.subscribe("view.on_load_async", on_view_activated)
+        global_events.subscribe("view.on_activated_async", on_view_activated)
+        if settings.show_status_messages:
+            sublime.status_message("LSP initialized")
+        start_active_window()
+    debug("startup took {:.0f} ms, {:.0f} ms of it importing modules".format(
+        1000 * startup_profile.total_seconds(), 1000 * startup_profile.import_seconds()))
 
 
 def shutdown() -> None:
     # Also needs to handle package being disabled or removed
     # https://github.com/tomv564/LSP/issues/375
     unload_settings()
+    stop_metrics_dump()
+    process_pools.close()
 
     for window in sublime.windows():
         unload_sessions(window)  # unloads view state from document sync and diagnostics
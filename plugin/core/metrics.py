@@ -0,0 +1,389 @@
+import json
+import os
+import threading
+import weakref
+from .deadlines import deadlines
+from .logging import debug, exception_log
+
+try:
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+    assert Any and Callable and Dict and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+# upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# the response to a server request, which carries no method
+RESPONSE_METHOD = "(response)"
+
+# columns of the report, each can be sorted on
+REPORT_COLUMNS = ("requests", "in_flight", "errors", "timeouts", "cancelled", "mean_ms", "max_ms", "p95_ms",
+                  "bytes_out", "bytes_in", "notifications_out", "notifications_in")
+
+
+class MethodMetrics(object):
+    """Counters and a latency histogram for one method of one server."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.responses = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.notifications_out = 0
+        self.notifications_in = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # the last one counts everything slower
+
+    def observe_latency(self, seconds: float) -> None:
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def latency_quantile(self, quantile: float) -> float:
+        """The upper bound of the bucket holding the quantile, the slowest latency for the last bucket."""
+        count = sum(self.buckets)
+        if not count:
+            return 0.0
+        rank = quantile * count
+        seen = 0
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(bound, self.latency_max)
+        return self.latency_max
+
+    def to_dict(self) -> 'Dict[str, Any]':
+        observed = sum(self.buckets)
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "notifications_out": self.notifications_out,
+            "notifications_in": self.notifications_in,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "mean_ms": 1000 * self.latency_sum / observed if observed else 0.0,
+            "max_ms": 1000 * self.latency_max,
+            "p95_ms": 1000 * self.latency_quantile(0.95),
+            "latency_buckets": dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], self.buckets))
+        }
+
+
+class ServerMetrics(object):
+    """
+    What the clients of one language server sent and received, by method. Sizes are the UTF-8 encoded bytes of the
+    JSON payload, as in its Content-Length header. The reader and the dispatcher thread both count, under the lock.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.methods = {}  # type: Dict[str, MethodMetrics]
+        self.hibernations = 0
+        self.restarts = 0
+        self.hibernated_seconds = 0.0
+        self.crashes = 0
+        self.change_delay = 0.0
+        self.diagnostics_turnaround = 0.0
+        self._lock = threading.Lock()
+        self._queues = weakref.WeakSet()  # type: Any
+
+    def method(self, method: str) -> MethodMetrics:
+        with self._lock:
+            return self._method(method)
+
+    def _method(self, method: str) -> MethodMetrics:
+        metrics = self.methods.get(method)
+        if metrics is None:
+            metrics = self.methods[method] = MethodMetrics()
+        return metrics
+
+    def method_items(self) -> 'List[Tuple[str, MethodMetrics]]':
+        """The methods seen so far, by name. A copy, other threads may add to them meanwhile."""
+        with self._lock:
+            return sorted(self.methods.items())
+
+    def watch_queue(self, dispatcher: 'Any') -> None:
+        """Reports the queue depth of a client's Dispatcher for as long as it lives."""
+        self._queues.add(dispatcher)
+
+    def queue_depth(self) -> int:
+        return sum(dispatcher.depth() for dispatcher in list(self._queues))
+
+    def message_sent(self, method: 'Optional[str]', size: int, is_notification: bool) -> None:
+        with self._lock:
+            metrics = self._method(method or RESPONSE_METHOD)
+            metrics.bytes_out += size
+            if is_notification:
+                metrics.notifications_out += 1
+
+    def request_sent(self, method: str) -> None:
+        with self._lock:
+            metrics = self._method(method)
+            metrics.requests += 1
+            metrics.in_flight += 1
+
+    def request_finished(self, method: str) -> None:
+        with self._lock:
+            self._method(method).in_flight -= 1
+
+    def response_received(self, method: str, size: int, latency: float) -> None:
+        with self._lock:
+            metrics = self._method(method)
+            metrics.responses += 1
+            metrics.bytes_in += size
+            metrics.observe_latency(latency)
+
+    def request_failed(self, method: str) -> None:
+        with self._lock:
+            self._method(method).errors += 1
+
+    def request_timed_out(self, method: str) -> None:
+        with self._lock:
+            self._method(method).timeouts += 1
+
+    def request_cancelled(self, method: str) -> None:
+        with self._lock:
+            self._method(method).cancelled += 1
+
+    def notification_received(self, method: str, size: int) -> None:
+        """Counts a notification, or a request, from the server."""
+        with self._lock:
+            metrics = self._method(method)
+            metrics.notifications_in += 1
+            metrics.bytes_in += size
+
+    def session_hibernated(self) -> None:
+        with self._lock:
+            self.hibernations += 1
+
+    def session_restarted(self, hibernated_seconds: float) -> None:
+        """Counts a restart after hibernation, and how long the server was down."""
+        with self._lock:
+            self.restarts += 1
+            self.hibernated_seconds += hibernated_seconds
+
+    def session_crashed(self) -> None:
+        with self._lock:
+            self.crashes += 1
+
+    def observe_change_delay(self, seconds: float) -> None:
+        """The wait before sending didChange chosen for the latest edit."""
+        self.change_delay = seconds
+
+    def observe_diagnostics_turnaround(self, seconds: float) -> None:
+        """The running average of the time from didChange to publishDiagnostics."""
+        self.diagnostics_turnaround = seconds
+
+    def to_dict(self) -> 'Dict[str, Any]':
+        return {
+            "queue_depth": self.queue_depth(),
+            "hibernations": self.hibernations,
+            "restarts": self.restarts,
+            "hibernated_seconds": self.hibernated_seconds,
+            "crashes": self.crashes,
+            "change_delay": self.change_delay,
+            "diagnostics_turnaround": self.diagnostics_turnaround,
+            "methods": dict((method, metrics.to_dict()) for method, metrics in self.method_items())
+        }
+
+
+class MetricsRegistry(object):
+    def __init__(self) -> None:
+        self.servers = {}  # type: Dict[str, ServerMetrics]
+        self._lock = threading.Lock()
+
+    def server(self, name: str) -> ServerMetrics:
+        with self._lock:
+            metrics = self.servers.get(name)
+            if metrics is None:
+                metrics = self.servers[name] = ServerMetrics(name)
+            return metrics
+
+    def to_json(self) -> str:
+        return json.dumps(dict((name, server.to_dict()) for name, server in sorted(self.servers.items())),
+                          indent=2, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = []  # type: List[str]
+        counters = (
+            ("requests", "requests sent"),
+            ("responses", "responses received"),
+            ("errors", "error responses"),
+            ("timeouts", "requests that timed out"),
+            ("cancelled", "requests cancelled"),
+            ("notifications_out", "notifications sent"),
+            ("notifications_in", "notifications and requests received"),
+            ("bytes_out", "payload bytes sent"),
+            ("bytes_in", "payload bytes received")
+        )
+        rows = [(name, method, metrics) for name, server in sorted(self.servers.items())
+                for method, metrics in server.method_items()]
+        for counter, help_text in counters:
+            metric = "lsp_rpc_{}_total".format(counter)
+            lines.append("# HELP {} {}".format(metric, help_text))
+            lines.append("# TYPE {} counter".format(metric))
+            for name, method, metrics in rows:
+                lines.append('{}{{server="{}",method="{}"}} {}'.format(
+                    metric, _label(name), _label(method), getattr(metrics, counter)))
+        lines.append("# HELP lsp_rpc_in_flight requests awaiting a response")
+        lines.append("# TYPE lsp_rpc_in_flight gauge")
+        for name, method, metrics in rows:
+            lines.append('lsp_rpc_in_flight{{server="{}",method="{}"}} {}'.format(
+                _label(name), _label(method), metrics.in_flight))
+        lines.append("# HELP lsp_rpc_queue_depth messages waiting for their handler")
+        lines.append("# TYPE lsp_rpc_queue_depth gauge")
+        for name, server in sorted(self.servers.items()):
+            lines.append('lsp_rpc_queue_depth{{server="{}"}} {}'.format(_label(name), server.queue_depth()))
+        sessions = (
+            ("hibernations", "lsp_session_hibernations_total", "sessions ended for being idle"),
+            ("restarts", "lsp_session_restarts_total", "sessions started again after hibernating"),
+            ("hibernated_seconds", "lsp_session_hibernated_seconds_total", "time spent hibernating until a restart"),
+            ("crashes", "lsp_session_crashes_total", "sessions ended by their server crashing")
+        )
+        for attribute, metric, help_text in sessions:
+            lines.append("# HELP {} {}".format(metric, help_text))
+            lines.append("# TYPE {} counter".format(metric))
+            for name, server in sorted(self.servers.items()):
+                lines.append('{}{{server="{}"}} {}'.format(metric, _label(name), getattr(server, attribute)))
+        gauges = (
+            ("change_delay", "lsp_did_change_delay_seconds", "wait before sending didChange after the latest edit"),
+            ("diagnostics_turnaround", "lsp_diagnostics_turnaround_seconds",
+             "average time from didChange to publishDiagnostics")
+        )
+        for attribute, metric, help_text in gauges:
+            lines.append("# HELP {} {}".format(metric, help_text))
+            lines.append("# TYPE {} gauge".format(metric))
+            for name, server in sorted(self.servers.items()):
+                lines.append('{}{{server="{}"}} {}'.format(metric, _label(name), getattr(server, attribute)))
+        lines.append("# HELP lsp_rpc_latency_seconds time from request to response")
+        lines.append("# TYPE lsp_rpc_latency_seconds histogram")
+        for name, method, metrics in rows:
+            if not metrics.responses:
+                continue
+            labels = 'server="{}",method="{}"'.format(_label(name), _label(method))
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                cumulative += count
+                lines.append('lsp_rpc_latency_seconds_bucket{{{},le="{}"}} {}'.format(labels, bound, cumulative))
+            lines.append('lsp_rpc_latency_seconds_bucket{{{},le="+Inf"}} {}'.format(labels, sum(metrics.buckets)))
+            lines.append('lsp_rpc_latency_seconds_sum{{{}}} {}'.format(labels, metrics.latency_sum))
+            lines.append('lsp_rpc_latency_seconds_count{{{}}} {}'.format(labels, sum(metrics.buckets)))
+        return "\n".join(lines) + "\n"
+
+    def format_report(self, sort_by: str = "requests") -> str:
+        """A table of every server and method, the highest values of the sort_by column first."""
+        if sort_by not in REPORT_COLUMNS:
+            sort_by = "requests"
+        header = ["server", "method"] + list(REPORT_COLUMNS)
+        rows = []  # type: List[Tuple[Any, List[str]]]
+        for name, server in sorted(self.servers.items()):
+            for method, metrics in server.method_items():
+                values = metrics.to_dict()
+                cells = [name, method] + [_format_cell(values[column]) for column in REPORT_COLUMNS]
+                rows.append((values[sort_by], cells))
+        rows.sort(key=lambda row: row[0], reverse=True)
+        table = [header] + [cells for _value, cells in rows]
+        widths = [max(len(row[index]) for row in table) for index in range(len(header))]
+        lines = ["  ".join(cell.ljust(width) if index < 2 else cell.rjust(width)
+                           for index, (cell, width) in enumerate(zip(row, widths))) for row in table]
+        depths = ["{}: {}".format(name, server.queue_depth()) for name, server in sorted(self.servers.items())]
+        lines.append("")
+        lines.append("queue depth  " + (", ".join(depths) or "-"))
+        hibernation = ["{}: {} ended idle, {} restarted after {:.0f}s".format(
+            name, server.hibernations, server.restarts, server.hibernated_seconds)
+            for name, server in sorted(self.servers.items()) if server.hibernations]
+        if hibernation:
+            lines.append("hibernation  " + ", ".join(hibernation))
+        crashes = ["{}: {}".format(name, server.crashes) for name, server in sorted(self.servers.items())
+                   if server.crashes]
+        if crashes:
+            lines.append("crashes      " + ", ".join(crashes))
+        debounce = ["{}: {:.0f} ms, diagnostics after {:.0f} ms".format(
+            name, 1000 * server.change_delay, 1000 * server.diagnostics_turnaround)
+            for name, server in sorted(self.servers.items()) if server.change_delay]
+        if debounce:
+            lines.append("did change   " + ", ".join(debounce))
+        return "\n".join(lines) + "\n"
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_cell(value: 'Any') -> str:
+    if isinstance(value, float):
+        return "{:.1f}".format(value)
+    return str(value)
+
+
+class MetricsDump(object):
+    """Writes the metrics to a file every interval seconds, as Prometheus text if it ends in .prom, JSON otherwise."""
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float) -> None:
+        self._registry = registry
+        self._path = path
+        self._interval = interval
+        self._deadline = None  # type: Any
+
+    def start(self) -> None:
+        self._deadline = deadlines.schedule(self._interval, self._run)
+
+    def stop(self) -> None:
+        if self._deadline:
+            deadlines.cancel(self._deadline)
+            self._deadline = None
+
+    def write(self) -> None:
+        if self._path.endswith(".prom"):
+            content = self._registry.to_prometheus()
+        else:
+            content = self._registry.to_json()
+        temporary = self._path + ".tmp"
+        with open(temporary, "w", encoding="UTF-8") as file:
+            file.write(content)
+        os.replace(temporary, self._path)
+
+    def _run(self) -> None:
+        if not self._deadline:
+            return
+        try:
+            self.write()
+        except OSError as err:
+            exception_log("Failure writing metrics to " + self._path, err)
+        if self._deadline:
+            self._deadline = deadlines.schedule(self._interval, self._run)
+
+
+metrics = MetricsRegistry()
+_dump = None  # type: Optional[MetricsDump]
+
+
+def start_metrics_dump(path: str, interval: float) -> None:
+    global _dump
+    stop_metrics_dump()
+    if path:
+        debug("writing metrics to", path, "every", interval, "seconds")
+        _dump = MetricsDump(metrics, os.path.expanduser(path), interval)
+        _dump.start()
+
+
+def stop_metrics_dump() -> None:
+    global _dump
+    if _dump:
+        _dump.stop()
+        _dump = None
@@ -0,0 +1,154 @@
+import threading
+from functools import partial
+from .deadlines import deadlines
+from .logging import debug, exception_log
+from .process import start_server
+from .types import ClientConfig
+
+try:
+    import subprocess
+    from typing import Any, Callable, Dict, Hashable, List, Optional
+    assert subprocess and Any and Callable and Dict and Hashable and List and Optional
+    from .deadlines import Deadline
+    assert Deadline
+except ImportError:
+    pass
+
+
+class WarmProcess(object):
+    def __init__(self, process: 'subprocess.Popen') -> None:
+        self.process = process
+        self.expiry = None  # type: Optional[Deadline]
+
+
+class ProcessPool(object):
+    """
+    Server processes spawned ahead of time, so a session can start by sending initialize to one of them instead of
+    waiting for a process to spawn. Taking a process spawns a replacement in the background, a process nobody took
+    within idle_timeout seconds is terminated and not replaced until the next take.
+    """
+
+    def __init__(self, spawn: 'Callable[[], Optional[subprocess.Popen]]', size: int, idle_timeout: float) -> None:
+        self._spawn = spawn
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = []  # type: List[WarmProcess]
+        self._spawning = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def take(self) -> 'Optional[subprocess.Popen]':
+        """A live idle process, if there is one. Starts filling the pool back up either way."""
+        taken = None
+        with self._lock:
+            while self._idle and not taken:
+                warm = self._idle.pop(0)
+                if warm.expiry:
+                    deadlines.cancel(warm.expiry)
+                if warm.process.poll() is None:
+                    taken = warm.process
+        self.fill()
+        return taken
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def fill(self) -> None:
+        with self._lock:
+            missing = self.size - len(self._idle) - self._spawning
+            if self._closed or missing <= 0:
+                return
+            self._spawning += missing
+        thread = threading.Thread(target=self._spawn_processes, args=(missing,), name="LSP process pool")
+        thread.daemon = True
+        thread.start()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for warm in idle:
+            self._terminate(warm)
+
+    def _spawn_processes(self, count: int) -> None:
+        for _ in range(count):
+            process = None
+            try:
+                process = self._spawn()
+            except Exception as err:
+                exception_log("Failure spawning a pooled server process", err)
+            with self._lock:
+                self._spawning -= 1
+                if process and not self._closed:
+                    warm = WarmProcess(process)
+                    warm.expiry = deadlines.schedule(self.idle_timeout, partial(self._expire, warm))
+                    self._idle.append(warm)
+                    continue
+            if process:
+                _terminate_process(process)
+
+    def _expire(self, warm: WarmProcess) -> None:
+        with self._lock:
+            if warm not in self._idle:
+                return
+            self._idle.remove(warm)
+        debug("terminating idle pooled process", warm.process.pid)
+        self._terminate(warm)
+
+    def _terminate(self, warm: WarmProcess) -> None:
+        if warm.expiry:
+            deadlines.cancel(warm.expiry)
+        _terminate_process(warm.process)
+
+
+def _terminate_process(process: 'subprocess.Popen') -> None:
+    try:
+        process.terminate()
+        process.wait(1)
+    except Exception:
+        try:
+            process.kill()
+        except Exception:
+            pass
+
+
+class ProcessPools(object):
+    """
+    A pool for every way of starting a server: its command, environment and whether stderr is kept. Warm processes
+    are spawned in the working directory of the session that first needed them, the root of a session is only
+    passed in initialize.
+    """
+
+    def __init__(self) -> None:
+        self._pools = {}  # type: Dict[Hashable, ProcessPool]
+        self._lock = threading.Lock()
+
+    def take(self, config: ClientConfig, working_dir: str, env: 'Dict[str, str]',
+             attach_stderr: bool) -> 'Optional[subprocess.Popen]':
+        """A warm process for config, None if none is ready (or config has no pool)."""
+        if config.pool_size <= 0:
+            return None
+        key = (config.name, tuple(config.binary_args), tuple(sorted(env.items())), attach_stderr)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                args = list(config.binary_args)
+                pool = ProcessPool(lambda: start_server(args, working_dir, env, attach_stderr),
+                                   config.pool_size, config.pool_idle_timeout)
+                self._pools[key] = pool
+            pool.size = config.pool_size
+            pool.idle_timeout = config.pool_idle_timeout
+        process = pool.take()
+        if process:
+            debug("took pooled process", process.pid, "for", config.name)
+        return process
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+process_pools = ProcessPools()
@@ -1,4 +1,5 @@
 from .logging import debug, exception_log, server_log
+from .reactor import Reactor, set_non_blocking
 import subprocess
 import os
 import shutil
@@ -81,3 +82,33 @@ def log_stream(process: 'subprocess.Popen', stream: 'IO[Any]') -> None:
             return
 
     debug("LSP stream logger stopped.")
+
+
+def attach_reactor_logger(reactor: 'Reactor', stream: 'IO[Any]') -> None:
+    """
+    Logs the lines written to stream from the reactor thread, instead of a thread of its own. Closes stream once it
+    ends.
+    """
+    fd = stream.fileno()
+    set_non_blocking(fd)
+    pending = [b""]
+
+    def on_readable() -> None:
+        try:
+            content = os.read(fd, 4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as err:
+            exception_log("Failure reading stream", err)
+            content = b""
+        if not content:
+            reactor.watch(fd, None, None)
+            stream.close()
+            debug("LSP stream logger stopped.")
+            return
+        lines = (pending[0] + content).split(b"\n")
+        pending[0] = lines.pop()
+        for line in lines:
+            server_log(line.decode("UTF-8", "replace").strip())
+
+    reactor.call_soon(lambda: reactor.watch(fd, on_readable, None))
@@ -0,0 +1,114 @@
+import builtins
+import sys
+import threading
+from contextlib import contextmanager
+from importlib.util import resolve_name
+from time import perf_counter
+
+try:
+    from typing import Any, Dict, Iterator, List, Optional, Tuple
+    assert Any and Dict and Iterator and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+class ImportTiming(object):
+    def __init__(self, name: str, own: float, total: float) -> None:
+        self.name = name
+        self.own = own  # without the modules it imported for the first time
+        self.total = total
+
+
+class StartupProfile(object):
+    """
+    How long loading the plugin took: the first import of each module while timing_imports() is active, and the
+    phases of startup. Only the thread that entered timing_imports() is timed. Parent packages, and modules imported
+    with "from package import module", count towards the module that imported them.
+    """
+
+    def __init__(self) -> None:
+        self.imports = []  # type: List[ImportTiming]
+        self.phases = []  # type: List[Tuple[str, float]]
+        self._children = []  # type: List[float]
+        self._thread = None  # type: Optional[int]
+        self._import = builtins.__import__
+
+    @contextmanager
+    def timing_imports(self) -> 'Iterator[None]':
+        """Starts over, as the plugin is loaded again when it is upgraded or turned off and on."""
+        self.imports = []
+        self.phases = []
+        self._thread = threading.get_ident()
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import  # type: ignore
+        try:
+            yield
+        finally:
+            builtins.__import__ = self._import
+            self._thread = None
+
+    @contextmanager
+    def phase(self, name: str) -> 'Iterator[None]':
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, perf_counter() - start))
+
+    def import_seconds(self) -> float:
+        return sum(timing.own for timing in self.imports)
+
+    def total_seconds(self) -> float:
+        return self.import_seconds() + sum(seconds for _name, seconds in self.phases)
+
+    def to_dict(self) -> 'Dict[str, Any]':
+        return {
+            "imports": dict((timing.name, timing.own) for timing in self.imports),
+            "phases": dict(self.phases),
+            "total": self.total_seconds()
+        }
+
+    def format_report(self, limit: int = 30) -> str:
+        if not self.imports and not self.phases:
+            return "Nothing was profiled.\n"
+        lines = ["startup took {:.1f} ms, {:.1f} ms of it importing {} modules".format(
+            1000 * self.total_seconds(), 1000 * self.import_seconds(), len(self.imports)), ""]
+        lines.append("{:>10}  {:>10}  phase".format("ms", ""))
+        for name, seconds in self.phases:
+            lines.append("{:>10.1f}  {:>10}  {}".format(1000 * seconds, "", name))
+        lines.append("")
+        lines.append("{:>10}  {:>10}  module (the slowest {})".format("own ms", "total ms", limit))
+        for timing in sorted(self.imports, key=lambda timing: timing.own, reverse=True)[:limit]:
+            lines.append("{:>10.1f}  {:>10.1f}  {}".format(1000 * timing.own, 1000 * timing.total, timing.name))
+        return "\n".join(lines) + "\n"
+
+    def _timed_import(self, name: str, globals: 'Optional[Dict[str, Any]]' = None, locals: 'Any' = None,
+                      fromlist: 'Any' = (), level: int = 0) -> 'Any':
+        module_name = _absolute_name(name, globals, level)
+        if threading.get_ident() != self._thread or not module_name or module_name in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+        self._children.append(0.0)
+        start = perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            total = perf_counter() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += total
+            self.imports.append(ImportTiming(module_name, total - children, total))
+
+
+def _absolute_name(name: str, globals: 'Optional[Dict[str, Any]]', level: int) -> 'Optional[str]':
+    if not level:
+        return name
+    package = (globals or {}).get("__package__")
+    if not package:
+        return None
+    try:
+        return resolve_name("." * level + name, package)
+    except ValueError:
+        return None
+
+
+startup_profile = StartupProfile()
@@ -10,6 +10,19 @@ TextDocumentSyncKindFull = 1
 TextDocumentSyncKindIncremental = 2
 
 
+class ErrorCode(object):
+    ParseError = -32700
+    InvalidRequest = -32600
+    MethodNotFound = -32601
+    InvalidParams = -32602
+    InternalError = -32603
+    ServerNotInitialized = -32002
+    UnknownErrorCode = -32001
+    RequestCancelled = -32800
+    # reported by the client itself when no response arrived in time
+    RequestTimedOut = -32090
+
+
 class DiagnosticSeverity(object):
     Error = 1
     Warning = 2
@@ -240,6 +253,10 @@ class Notification:
     def exit(cls) -> 'Notification':
         return Notification("exit")
 
+    @classmethod
+    def cancelRequest(cls, request_id: int) -> 'Notification':
+        return Notification("$/cancelRequest", {"id": request_id})
+
     def __repr__(self) -> str:
         return self.method + " " + str(self.params)
 
@@ -313,7 +330,7 @@ class ContentChange(object):
             'text': self.text,
         }  # type: Dict[str, Any]
         if self.range:
-            change['range'] = self.range.to_lsp(),
+            change['range'] = self.range.to_lsp()
         if self.range_length:
             change['rangeLength'] = self.range_length
         return change
@@ -0,0 +1,150 @@
+import os
+import heapq
+import threading
+from time import monotonic
+from collections import deque
+from .logging import debug, exception_log
+
+try:
+    import selectors
+except ImportError:
+    # Sublime Text 3 bundles Python 3.3, which predates the selectors module.
+    selectors = None  # type: ignore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore
+
+try:
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+    assert Any and Callable and Dict and List and Optional and Tuple
+except ImportError:
+    pass
+
+
+def is_reactor_supported() -> bool:
+    # select() only accepts sockets on Windows, the pipes to a language server cannot be watched there.
+    return selectors is not None and fcntl is not None and os.name != "nt"
+
+
+def set_non_blocking(fd: int) -> None:
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+class Reactor(object):
+    """
+    Runs the reads and writes of any number of non-blocking pipes and sockets on a single thread.
+
+    Watches are changed on the reactor thread only, other threads hand work over with call_soon.
+    """
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._calls = deque()  # type: deque
+        self._timers = []  # type: List[Tuple[float, int, Callable[[], None]]]
+        self._timer_count = 0
+        self._watches = {}  # type: Dict[int, Tuple[Optional[Callable[[], None]], Optional[Callable[[], None]]]]
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        set_non_blocking(self._wakeup_read)
+        set_non_blocking(self._wakeup_write)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def call_soon(self, callback: 'Callable[[], None]') -> None:
+        """Runs callback on the reactor thread. Safe to call from any thread."""
+        with self._lock:
+            self._calls.append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="LSP reactor")
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup()
+
+    def call_later(self, delay: float, callback: 'Callable[[], None]') -> None:
+        """Runs callback on the reactor thread after delay seconds. Safe to call from any thread."""
+        deadline = monotonic() + delay
+
+        def schedule() -> None:
+            self._timer_count += 1
+            heapq.heappush(self._timers, (deadline, self._timer_count, callback))
+
+        self.call_soon(schedule)
+
+    def watch(self, fd: int,
+              on_readable: 'Optional[Callable[[], None]]',
+              on_writable: 'Optional[Callable[[], None]]') -> None:
+        """Sets what to call when fd becomes readable or writable, None for neither. Reactor thread only."""
+        events = 0
+        if on_readable:
+            events |= selectors.EVENT_READ
+        if on_writable:
+            events |= selectors.EVENT_WRITE
+        if fd in self._watches:
+            if events:
+                self._selector.modify(fd, events)
+            else:
+                self._selector.unregister(fd)
+                del self._watches[fd]
+        elif events:
+            self._selector.register(fd, events)
+        if events:
+            self._watches[fd] = (on_readable, on_writable)
+
+    def _wakeup(self) -> None:
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except BlockingIOError:
+            pass  # the pipe is full, the reactor has plenty of wake-ups pending already.
+
+    def _run(self) -> None:
+        while True:
+            timeout = None  # type: Optional[float]
+            if self._timers:
+                timeout = max(self._timers[0][0] - monotonic(), 0)
+            for key, events in self._selector.select(timeout):
+                if key.fd == self._wakeup_read:
+                    self._drain_wakeups()
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._invoke(self._watches.get(key.fd, (None, None))[0])
+                if events & selectors.EVENT_WRITE:
+                    self._invoke(self._watches.get(key.fd, (None, None))[1])
+            now = monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                self._invoke(heapq.heappop(self._timers)[2])
+            while True:
+                with self._lock:
+                    if not self._calls:
+                        break
+                    callback = self._calls.popleft()
+                self._invoke(callback)
+
+    def _drain_wakeups(self) -> None:
+        try:
+            while os.read(self._wakeup_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _invoke(self, callback: 'Optional[Callable[[], None]]') -> None:
+        if callback:
+            try:
+                callback()
+            except Exception as err:
+                exception_log("Error in reactor callback", err)
+
+
+_shared_reactor = None  # type: Optional[Reactor]
+_shared_reactor_lock = threading.Lock()
+
+
+def shared_reactor() -> Reactor:
+    global _shared_reactor
+    with _shared_reactor_lock:
+        if _shared_reactor is None:
+            debug("starting shared I/O reactor")
+            _shared_reactor = Reactor()
+        return _shared_reactor
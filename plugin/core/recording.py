@@ -0,0 +1,161 @@
+import gzip
+import json
+import os
+import threading
+import time
+from time import monotonic
+from .logging import debug, exception_log
+from .transports import Transport, PRIORITY_NORMAL
+
+try:
+    from typing import Any, Callable, Dict, Iterator, List, Optional
+    assert Any and Callable and Dict and Iterator and List and Optional
+except ImportError:
+    pass
+
+
+RECORDING_VERSION = 1
+INBOUND = "in"
+OUTBOUND = "out"
+FLUSH_EVERY = 1000  # records, so a recording cut short by a crash loses little
+
+
+class Recorder(object):
+    """
+    Writes every message a Client sends and receives to a gzip-compressed JSON lines file.
+
+    The first line describes the recording, every other line is one message:
+    {"t": seconds since the recording started, "server": name, "dir": "in" or "out", "message": the JSON-RPC text}
+    """
+
+    def __init__(self, path: str, server: str) -> None:
+        self.path = path
+        self.server = server
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="UTF-8")  # type: Any
+        self._start = monotonic()
+        self._count = 0
+        self._write({"version": RECORDING_VERSION, "server": server, "started": time.time()})
+
+    def record(self, direction: str, message: str) -> None:
+        with self._lock:
+            if not self._file:
+                return
+            self._write({"t": monotonic() - self._start, "server": self.server, "dir": direction, "message": message})
+            self._count += 1
+            if self._count % FLUSH_EVERY == 0:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+                debug("recorded", self._count, "messages of", self.server, "to", self.path)
+
+    def _write(self, record: 'Dict[str, Any]') -> None:
+        self._file.write(json.dumps(record))
+        self._file.write("\n")
+
+
+def start_recording(directory: str, server: str) -> 'Optional[Recorder]':
+    """Starts a recording in directory, named after the server and the time."""
+    directory = os.path.expanduser(directory)
+    name = "{}-{}.jsonl.gz".format("".join(c if c.isalnum() else "_" for c in server), time.strftime("%Y%m%d-%H%M%S"))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        return Recorder(os.path.join(directory, name), server)
+    except OSError as err:
+        exception_log("Failure starting a recording in " + directory, err)
+        return None
+
+
+def read_recording(path: str) -> 'Iterator[Dict[str, Any]]':
+    """Yields the message records of a recording, skipping its header."""
+    with gzip.open(path, "rt", encoding="UTF-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if "dir" in record:
+                yield record
+
+
+class ReplayTransport(Transport):
+    """
+    Plays the messages a server sent in a recording back to a Client, at the recorded pace divided by speed (as fast
+    as possible if speed is 0). What the Client sends is kept in sent instead.
+
+    With await_requests, a response is held back until the Client has sent the request it answers (or until
+    REQUEST_WAIT seconds passed), so replaying a session that sends the same requests gives the same results
+    however fast it runs. A paused transport waits for play() before replaying anything, so the handlers can be
+    registered on the Client first.
+    """
+
+    REQUEST_WAIT = 5.0
+
+    def __init__(self, path: str, speed: float = 1.0, await_requests: bool = True, paused: bool = False) -> None:
+        self.path = path
+        self.speed = speed
+        self.await_requests = await_requests
+        self.sent = []  # type: List[str]
+        self.finished = threading.Event()
+        self._playing = threading.Event()
+        if not paused:
+            self._playing.set()
+        self._condition = threading.Condition()
+        self._last_request_id = 0
+        self._closed = False
+
+    def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
+        self.on_receive = on_receive
+        self.on_closed = on_closed
+        thread = threading.Thread(target=self._replay, name="LSP replay")
+        thread.daemon = True
+        thread.start()
+
+    def send(self, message: str, priority: int = PRIORITY_NORMAL, uri: 'Optional[str]' = None,
+             replaceable: bool = False) -> None:
+        with self._condition:
+            self.sent.append(message)
+            request_id = json.loads(message).get("id") if self.await_requests else None
+            if isinstance(request_id, int) and request_id > self._last_request_id:
+                self._last_request_id = request_id
+                self._condition.notify_all()
+
+    def play(self) -> None:
+        self._playing.set()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._playing.set()
+
+    def _replay(self) -> None:
+        self._playing.wait()
+        started = monotonic()
+        try:
+            for record in read_recording(self.path):
+                if self._closed:
+                    break
+                if record["dir"] != INBOUND:
+                    continue
+                if self.speed:
+                    delay = started + record["t"] / self.speed - monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                if self.await_requests:
+                    self._await_request(record["message"])
+                self.on_receive(record["message"])
+        except (OSError, ValueError) as err:
+            exception_log("Failure replaying " + self.path, err)
+        self.finished.set()
+        self.on_closed()
+
+    def _await_request(self, message: str) -> None:
+        payload = json.loads(message)
+        request_id = payload.get("id")
+        if "method" in payload or not isinstance(request_id, int):
+            return
+        with self._condition:
+            self._condition.wait_for(lambda: self._closed or self._last_request_id >= request_id,
+                                     self.REQUEST_WAIT)
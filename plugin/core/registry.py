@@ -8,15 +8,18 @@ from .clients import (
     start_window_config
 )
 from .types import ClientStates, ClientConfig, WindowLike
-from .handlers import LanguageHandler
+from .handlers import LanguageHandler, instantiate
 from .logging import debug
 from .sessions import Session
 from .clients import Client
 from .settings import settings, client_configs
+from .executor import startup_executor
+from .profiling import startup_profile
 
 try:
-    from typing import Optional, List, Callable, Dict, Any, Iterable
+    from typing import Optional, List, Callable, Dict, Any, Iterable, Tuple
     assert Optional and List and Callable and Dict and Any and ClientConfig and Client and Session and Iterable
+    assert Tuple
 except ImportError:
     pass
 
@@ -39,9 +42,15 @@ class LanguageHandlerDispatcher(object):
 
 
 def load_handlers() -> None:
-    for handler in LanguageHandler.instantiate_all():
-        register_language_handler(handler)
-    client_configs.update_configs()
+    # Handlers are created here, not when first needed: the syntaxes of a handler are in the config of its instance,
+    # and the view listeners decide whether they apply to the views open at startup from those once. Startup only
+    # defers imports, each handler is timed as a phase of its own to show the slow ones (they come from other
+    # packages and some do work when created).
+    for handler_class in LanguageHandler.__subclasses__():
+        with startup_profile.phase("handler " + handler_class.__name__):
+            register_language_handler(instantiate(handler_class))
+    with startup_profile.phase("update configs"):
+        client_configs.update_configs()
 
 
 def register_language_handler(handler: LanguageHandler) -> None:
@@ -65,8 +74,9 @@ def client_from_session(session: 'Optional[Session]') -> 'Optional[Client]':
         return None
 
 
-def sessions_for_view(view: sublime.View, point: 'Optional[int]' = None) -> 'Iterable[Session]':
-    return _sessions_for_view_and_window(view, view.window(), point)
+def sessions_for_view(view: sublime.View, point: 'Optional[int]' = None,
+                      include_starting: bool = False) -> 'Iterable[Session]':
+    return _sessions_for_view_and_window(view, view.window(), point, include_starting)
 
 
 def session_for_view(view: sublime.View,
@@ -76,8 +86,20 @@ def session_for_view(view: sublime.View,
                  if session.has_capability(capability)), None)
 
 
+def early_session_for_view(view: sublime.View, capability: str) -> 'Tuple[Optional[Session], bool]':
+    """
+    The session of view with capability, counting starting sessions with the capabilities their server had last
+    time (see capabilities.CapabilityCache), and whether a session of view is still starting. Listeners wiring up a
+    feature once should do so again when one was, the answer may change once it is ready.
+    """
+    sessions = list(sessions_for_view(view, include_starting=True))
+    starting = any(session.state == ClientStates.STARTING for session in sessions)
+    return next((session for session in sessions if session.has_capability(capability)), None), starting
+
+
 def _sessions_for_view_and_window(view: sublime.View, window: 'Optional[sublime.Window]',
-                                  point: 'Optional[int]' = None) -> 'Iterable[Session]':
+                                  point: 'Optional[int]' = None,
+                                  include_starting: bool = False) -> 'Iterable[Session]':
     if not window:
         debug("no window for view", view.file_name())
         return []
@@ -85,7 +107,8 @@ def _sessions_for_view_and_window(view: sublime.View, window: 'Optional[sublime.
     manager = windows.lookup(window)
     scope_configs = manager._configs.scope_configs(view, point)
     sessions = (manager.get_session(config.name) for config in scope_configs)
-    ready_sessions = (session for session in sessions if session and session.state == ClientStates.READY)
+    states = (ClientStates.READY, ClientStates.STARTING) if include_starting else (ClientStates.READY,)
+    ready_sessions = (session for session in sessions if session and session.state in states)
     return ready_sessions
 
 
@@ -98,7 +121,8 @@ configs = ConfigManager(client_configs.all)
 client_configs.set_listener(configs.update)
 documents = DocumentHandlerFactory(sublime, settings)
 handlers_dispatcher = LanguageHandlerDispatcher()
-windows = WindowRegistry(configs, documents, start_window_config, sublime, handlers_dispatcher)
+windows = WindowRegistry(configs, documents, start_window_config, sublime, handlers_dispatcher, settings,
+                         startup_executor.submit)
 
 
 def configs_for_scope(view: 'Any', point: 'Optional[int]' = None) -> 'Iterable[ClientConfig]':
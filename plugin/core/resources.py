@@ -0,0 +1,298 @@
+import os
+import threading
+from time import monotonic
+from .deadlines import deadlines
+from .logging import debug
+
+try:
+    import subprocess
+    from typing import Any, Callable, Dict, List, Optional, Tuple
+    assert subprocess and Any and Callable and Dict and List and Optional and Tuple
+    from .deadlines import Deadline
+    assert Deadline
+except ImportError:
+    pass
+
+
+PROC = "/proc"
+CLOCK_TICKS = float(os.sysconf("SC_CLK_TCK")) if hasattr(os, "sysconf") else 100.0
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# the limits a client config can set in "resource_limits", each on the Sample attribute of the same name
+LIMITS = ("cpu_percent", "rss_mb", "threads")
+
+# consecutive samples over a limit before acting on it, so a short spike is let through
+LIMIT_SAMPLES = 2
+
+# seconds a process over its limits gets to exit after the callback (which should end its session) before it is
+# terminated, as a runaway server may not answer shutdown
+TERMINATE_GRACE = 30
+
+
+def is_supported() -> bool:
+    return os.path.isdir(os.path.join(PROC, "self"))
+
+
+class ProcessStat(object):
+    """The fields of /proc/<pid>/stat the monitor uses."""
+
+    __slots__ = ('pid', 'ppid', 'cpu_ticks', 'threads', 'rss_pages')
+
+    def __init__(self, pid: int, ppid: int, cpu_ticks: int, threads: int, rss_pages: int) -> None:
+        self.pid = pid
+        self.ppid = ppid
+        self.cpu_ticks = cpu_ticks
+        self.threads = threads
+        self.rss_pages = rss_pages
+
+
+def parse_stat(content: str) -> ProcessStat:
+    # the command name in parentheses may hold spaces and parentheses itself, the other fields follow the last one
+    pid = int(content[:content.index(" ")])
+    fields = content[content.rindex(")") + 2:].split()
+    # fields[0] is field 3 (state) of proc(5)
+    return ProcessStat(pid, int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[17]), int(fields[21]))
+
+
+def read_stat(pid: int) -> 'Optional[ProcessStat]':
+    try:
+        with open(os.path.join(PROC, str(pid), "stat"), encoding="UTF-8") as file:
+            return parse_stat(file.read())
+    except (OSError, ValueError, IndexError):
+        return None  # exited, or not ours to read
+
+
+def children_are_listed() -> bool:
+    """Whether /proc lists the children of each thread (CONFIG_PROC_CHILDREN), so a tree is read without a scan."""
+    task = os.path.join(PROC, "self", "task")
+    try:
+        return os.path.exists(os.path.join(task, os.listdir(task)[0], "children"))
+    except (OSError, IndexError):
+        return False
+
+
+def read_children(pid: int) -> 'List[int]':
+    task = os.path.join(PROC, str(pid), "task")
+    children = []  # type: List[int]
+    try:
+        threads = os.listdir(task)
+    except OSError:
+        return children  # exited
+    for thread in threads:
+        try:
+            with open(os.path.join(task, thread, "children"), encoding="UTF-8") as file:
+                children.extend(int(child) for child in file.read().split())
+        except (OSError, ValueError):
+            pass  # the thread exited
+    return children
+
+
+def read_tree_stats(pids: 'List[int]') -> 'Dict[int, ProcessStat]':
+    """The stats of pids and of the processes they started, and the ones they started, from the lists of children."""
+    stats = {}  # type: Dict[int, ProcessStat]
+    pending = list(pids)
+    while pending:
+        pid = pending.pop()
+        if pid in stats:
+            continue
+        stat = read_stat(pid)
+        if stat:
+            stats[pid] = stat
+            pending.extend(read_children(pid))
+    return stats
+
+
+def read_all_stats() -> 'Dict[int, ProcessStat]':
+    """The stats of every process, for kernels that do not list children."""
+    stats = {}  # type: Dict[int, ProcessStat]
+    try:
+        names = os.listdir(PROC)
+    except OSError:
+        return stats
+    for name in names:
+        if name.isdigit():
+            stat = read_stat(int(name))
+            if stat:
+                stats[stat.pid] = stat
+    return stats
+
+
+def descendants(pid: int, stats: 'Dict[int, ProcessStat]') -> 'List[int]':
+    """pid and the processes it started, and the ones they started, that are still running."""
+    children = {}  # type: Dict[int, List[int]]
+    for stat in stats.values():
+        children.setdefault(stat.ppid, []).append(stat.pid)
+    found = []  # type: List[int]
+    pending = [pid] if pid in stats else []
+    while pending:
+        current = pending.pop()
+        found.append(current)
+        pending.extend(children.get(current, []))
+    return found
+
+
+class Sample(object):
+    """What a server process and its descendants use."""
+
+    def __init__(self, rss_mb: float, cpu_seconds: float, cpu_percent: float, threads: int, processes: int) -> None:
+        self.rss_mb = rss_mb
+        self.cpu_seconds = cpu_seconds
+        self.cpu_percent = cpu_percent
+        self.threads = threads
+        self.processes = processes
+
+    def to_dict(self) -> 'Dict[str, Any]':
+        return {
+            "rss_mb": self.rss_mb,
+            "cpu_seconds": self.cpu_seconds,
+            "cpu_percent": self.cpu_percent,
+            "threads": self.threads,
+            "processes": self.processes
+        }
+
+
+class WatchedProcess(object):
+    def __init__(self, name: str, process: 'subprocess.Popen', limits: 'Dict[str, float]',
+                 on_exceeded: 'Optional[Callable[[str], None]]') -> None:
+        self.name = name
+        self.process = process
+        self.limits = limits
+        self.on_exceeded = on_exceeded
+        self.sample = None  # type: Optional[Sample]
+        self.peak_rss_mb = 0.0
+        self.over_limit = 0
+        self.exceeded_at = None  # type: Optional[float]
+        self._last_cpu = None  # type: Optional[Tuple[float, float]]
+
+    def update(self, stats: 'Dict[int, ProcessStat]', now: float) -> 'Optional[str]':
+        """Samples the process, returns a description of the limit it exceeded if it should be acted on."""
+        pids = descendants(self.process.pid, stats)
+        if not pids:
+            return None
+        cpu_seconds = sum(stats[pid].cpu_ticks for pid in pids) / CLOCK_TICKS
+        cpu_percent = 0.0
+        if self._last_cpu:
+            elapsed = now - self._last_cpu[0]
+            if elapsed > 0:
+                cpu_percent = 100 * (cpu_seconds - self._last_cpu[1]) / elapsed
+        self._last_cpu = (now, cpu_seconds)
+        self.sample = Sample(sum(stats[pid].rss_pages for pid in pids) * PAGE_SIZE / 1048576.0, cpu_seconds,
+                             cpu_percent, sum(stats[pid].threads for pid in pids), len(pids))
+        self.peak_rss_mb = max(self.peak_rss_mb, self.sample.rss_mb)
+        exceeded = self.exceeded_limit()
+        if not exceeded:
+            self.over_limit = 0
+            return None
+        self.over_limit += 1
+        return exceeded if self.over_limit == LIMIT_SAMPLES else None
+
+    def exceeded_limit(self) -> 'Optional[str]':
+        if not self.sample:
+            return None
+        for limit in LIMITS:
+            bound = self.limits.get(limit)
+            value = getattr(self.sample, limit)
+            if bound and value > bound:
+                return "{} {:.0f} over the limit of {}".format(limit, value, bound)
+        return None
+
+
+class ResourceMonitor(object):
+    """
+    Samples the memory, CPU time and threads of every watched server process (and its descendants) from /proc every
+    interval seconds, and calls back once a process stays over one of its limits (if it has any) for LIMIT_SAMPLES
+    samples. Where the kernel lists the children of a process, only the watched processes and their descendants are
+    read, all of /proc otherwise.
+    """
+
+    def __init__(self) -> None:
+        self.interval = 10.0
+        self._watched = []  # type: List[WatchedProcess]
+        self._lock = threading.Lock()
+        self._deadline = None  # type: Optional[Deadline]
+        self._children_listed = None  # type: Optional[bool]
+
+    def watch(self, name: str, process: 'subprocess.Popen', limits: 'Dict[str, float]',
+              on_exceeded: 'Optional[Callable[[str], None]]' = None) -> None:
+        if not self.interval or not is_supported():
+            return
+        unknown = set(limits) - set(LIMITS)
+        if unknown:
+            debug("unknown resource limits of", name, ":", ", ".join(sorted(unknown)))
+        with self._lock:
+            self._watched.append(WatchedProcess(name, process, limits, on_exceeded))
+            if not self._deadline:
+                self._deadline = deadlines.schedule(self.interval, self._run)
+
+    def set_interval(self, interval: float) -> None:
+        self.interval = interval
+
+    def watched(self) -> 'List[WatchedProcess]':
+        with self._lock:
+            return list(self._watched)
+
+    def sample(self) -> None:
+        """Samples every watched process now, and calls back for those over their limits."""
+        if self._children_listed is None:
+            self._children_listed = children_are_listed()
+        if self._children_listed:
+            stats = read_tree_stats([watched.process.pid for watched in self.watched()])
+        else:
+            stats = read_all_stats()
+        now = monotonic()
+        exceeded = []  # type: List[Tuple[WatchedProcess, str]]
+        with self._lock:
+            self._watched = [watched for watched in self._watched if watched.process.poll() is None]
+            for watched in self._watched:
+                if watched.exceeded_at is not None:
+                    if now - watched.exceeded_at >= TERMINATE_GRACE:
+                        debug(watched.name, "process", watched.process.pid, "did not exit, terminating it")
+                        _terminate_process(watched.process)
+                    continue
+                reason = watched.update(stats, now)
+                if reason:
+                    watched.exceeded_at = now
+                    exceeded.append((watched, reason))
+        for watched, reason in exceeded:
+            debug(watched.name, "process", watched.process.pid, reason)
+            if watched.on_exceeded:
+                watched.on_exceeded(reason)
+
+    def format_report(self) -> str:
+        if not is_supported():
+            return "Resource monitoring needs /proc, which this platform does not have.\n"
+        header = ["server", "pid", "processes", "rss_mb", "peak_rss_mb", "cpu_seconds", "cpu_percent", "threads",
+                  "limits"]
+        table = [header]
+        for watched in self.watched():
+            sample = watched.sample
+            if not sample:
+                continue
+            limits = ", ".join("{} {}".format(limit, bound) for limit, bound in sorted(watched.limits.items()))
+            table.append([watched.name, str(watched.process.pid), str(sample.processes),
+                          "{:.1f}".format(sample.rss_mb), "{:.1f}".format(watched.peak_rss_mb),
+                          "{:.1f}".format(sample.cpu_seconds), "{:.1f}".format(sample.cpu_percent),
+                          str(sample.threads), limits or "-"])
+        if len(table) == 1:
+            return "No language server process has been sampled yet.\n"
+        widths = [max(len(row[index]) for row in table) for index in range(len(header))]
+        return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+                         for row in table) + "\n"
+
+    def _run(self) -> None:
+        self.sample()
+        with self._lock:
+            if self._watched and self.interval:
+                self._deadline = deadlines.schedule(self.interval, self._run)
+            else:
+                self._deadline = None
+
+
+def _terminate_process(process: 'subprocess.Popen') -> None:
+    try:
+        process.terminate()
+    except ProcessLookupError:
+        pass  # exited already
+
+
+resource_monitor = ResourceMonitor()
@@ -1,25 +1,41 @@
 import json
-import socket
-import time
-from .transports import TCPTransport, StdioTransport, Transport
-from .process import attach_logger
+from .transports import (StdioTransport, Transport, reactor_stdio_transport, start_tcp_transport,
+                         PRIORITY_INTERACTIVE, PRIORITY_NORMAL)
+from .process import attach_logger, attach_reactor_logger
+from .reactor import Reactor, is_reactor_supported, shared_reactor
 try:
     import subprocess
-    from typing import Any, List, Dict, Tuple, Callable, Optional, Union
+    from typing import Any, List, Dict, Tuple, Callable, Optional, Union, Hashable
     # from mypy_extensions import TypedDict
-    assert Any and List and Dict and Tuple and Callable and Optional and Union and subprocess
+    assert Any and List and Dict and Tuple and Callable and Optional and Union and Hashable and subprocess
+    from .deadlines import Deadline
+    assert Deadline
 except ImportError:
     pass
 
-from .logging import debug, exception_log
-from .protocol import Request, Notification, Response
+from .logging import debug, exception_log, trace, Payload
+from .protocol import Request, Notification, Response, ErrorCode
+from .futures import Future, RequestError, failed
+from .deadlines import deadlines
+from .envelope import Envelope, peek_envelope
+from .metrics import ServerMetrics
+from .recording import Recorder, INBOUND, OUTBOUND
+from .dispatch import Dispatcher, DISPATCH_INTERACTIVE, DISPATCH_NORMAL, DISPATCH_LAST
 from .types import Settings
-from threading import Condition
 from threading import Lock
+from time import monotonic
 
-TCP_CONNECT_TIMEOUT = 5
 DEFAULT_SYNC_REQUEST_TIMEOUT = 1.0
 
+# requests the user is waiting on as they type or move the caret, sent ahead of other traffic
+INTERACTIVE_METHODS = set([
+    "textDocument/completion",
+    "textDocument/hover",
+    "textDocument/signatureHelp",
+    "textDocument/documentHighlight",
+    "textDocument/codeAction"
+])
+
 # RequestDict = TypedDict('RequestDict', {'id': 'Union[str,int]', 'method': str, 'params': 'Optional[Any]'})
 
 
@@ -28,35 +44,59 @@ def format_request(payload: 'Dict[str, Any]') -> str:
     return json.dumps(payload, sort_keys=False)
 
 
+def is_full_text_change(params: 'Dict[str, Any]') -> bool:
+    changes = params.get("contentChanges") or []
+    return bool(changes) and all("range" not in change for change in changes)
+
+
+def outbound_routing(payload: 'Dict[str, Any]') -> 'Tuple[int, Optional[str], bool]':
+    """
+    How the transport should queue a payload: its priority, the document it is about and whether it can be replaced
+    by a later message about the same document.
+    """
+    method = payload.get("method")
+    params = payload.get("params")
+    if not method or not isinstance(params, dict):
+        return PRIORITY_NORMAL, None, False
+    uri = params.get("textDocument", {}).get("uri")
+    if method in INTERACTIVE_METHODS:
+        return PRIORITY_INTERACTIVE, uri, False
+    if method == "textDocument/didChange":
+        return PRIORITY_NORMAL, uri, is_full_text_change(params)
+    return PRIORITY_NORMAL, uri, False
+
+
 def attach_tcp_client(tcp_port: int, process: 'subprocess.Popen', settings: Settings) -> 'Optional[Client]':
-    if settings.log_stderr:
+    if settings.log_stderr and process.stdout:
         attach_logger(process, process.stdout)
 
-    host = "localhost"
-    start_time = time.time()
-    debug('connecting to {}:{}'.format(host, tcp_port))
+    try:
+        transport = start_tcp_transport(tcp_port, None, transport_reactor(settings), process)
+    except ConnectionError:
+        try_terminate_process(process)
+        raise
+    client = Client(transport, settings)
+    client.set_transport_failure_handler(lambda: try_terminate_process(process))
+    return client
 
-    while time.time() - start_time < TCP_CONNECT_TIMEOUT:
-        try:
-            sock = socket.create_connection((host, tcp_port))
-            transport = TCPTransport(sock)
 
-            client = Client(transport, settings)
-            client.set_transport_failure_handler(lambda: try_terminate_process(process))
-            return client
-        except ConnectionRefusedError:
-            pass
-
-    process.kill()
-    raise Exception("Timeout connecting to socket")
+def transport_reactor(settings: Settings) -> 'Optional[Reactor]':
+    """The shared reactor if transports should run on it, None to give each transport threads of its own."""
+    if settings.transport_reactor and is_reactor_supported():
+        return shared_reactor()
+    return None
 
 
 def attach_stdio_client(process: 'subprocess.Popen', settings: Settings) -> 'Client':
-    transport = StdioTransport(process)
+    reactor = transport_reactor(settings)
+    transport = reactor_stdio_transport(process, reactor) if reactor else StdioTransport(process)
 
     # TODO: process owner can take care of this outside client?
-    if settings.log_stderr:
-        attach_logger(process, process.stderr)
+    if settings.log_stderr and process.stderr:
+        if reactor:
+            attach_reactor_logger(reactor, process.stderr)
+        else:
+            attach_logger(process, process.stderr)
     client = Client(transport, settings)
     client.set_transport_failure_handler(lambda: try_terminate_process(process))
     return client
@@ -69,69 +109,180 @@ def try_terminate_process(process: 'subprocess.Popen') -> None:
         pass  # process can be terminated already
 
 
+class PendingRequest(object):
+    """Bookkeeping for a request that has been sent and not yet answered."""
+
+    def __init__(self, method: str, handler: 'Optional[Callable]', error_handler: 'Optional[Callable]',
+                 future: Future, supersession_key: 'Optional[Hashable]' = None) -> None:
+        self.method = method
+        self.handler = handler
+        self.error_handler = error_handler
+        self.future = future
+        self.supersession_key = supersession_key
+        self.deadline = None  # type: Optional[Deadline]
+        self.sent_at = 0.0
+
+
 class Client(object):
-    def __init__(self, transport: Transport, settings: Settings) -> None:
+    def __init__(self, transport: Transport, settings: Settings, dispatcher: 'Optional[Dispatcher]' = None) -> None:
         self.transport = transport  # type: Optional[Transport]
-        self.transport.start(self.receive_payload, self.on_transport_closed)
+        self.dispatcher = dispatcher or Dispatcher()
         self.request_id = 0
-        self._response_handlers = {}  # type: Dict[int, Tuple[Optional[Callable], Optional[Callable[[Any], None]]]]
+        self._request_id_lock = Lock()
+        self._response_handlers = {}  # type: Dict[int, PendingRequest]
+        self._superseded_requests = {}  # type: Dict[Hashable, int]
         self._request_handlers = {}  # type: Dict[str, Callable]
         self._notification_handlers = {}  # type: Dict[str, Callable]
-        self._sync_request_results = {}  # type: Dict[int, Optional[Any]]
-        self._sync_request_lock = Lock()
-        self._sync_request_cvar = Condition(self._sync_request_lock)
+        self._dispatch_priorities = {}  # type: Dict[str, int]
         self.exiting = False
         self._crash_handler = None  # type: Optional[Callable]
         self._transport_fail_handler = None  # type: Optional[Callable]
         self._error_display_handler = lambda msg: debug(msg)
         self.settings = settings
+        self.server_name = "server"
+        self._metrics = None  # type: Optional[ServerMetrics]
+        self._recorder = None  # type: Optional[Recorder]
+        self.transport.start(self.receive_payload, self.on_transport_closed)
+
+    def _log(self, *args: 'Any') -> None:
+        trace(self.server_name, *args)
+
+    def set_metrics(self, metrics: 'ServerMetrics') -> None:
+        """Counts what is sent and received in metrics. Without them, nothing is counted or timed."""
+        self._metrics = metrics
+        metrics.watch_queue(self.dispatcher)
+
+    def set_recorder(self, recorder: 'Recorder') -> None:
+        """Writes every message sent and received to recorder, until the transport closes."""
+        self._recorder = recorder
+
+    def _next_request_id(self) -> int:
+        with self._request_id_lock:
+            self.request_id += 1
+            return self.request_id
 
     def send_request(
             self,
             request: Request,
-            handler: 'Callable[[Optional[Any]], None]',
+            handler: 'Optional[Callable[[Optional[Any]], None]]' = None,
             error_handler: 'Optional[Callable[[Any], None]]' = None,
-    ) -> 'None':
-        self.request_id += 1
+            supersession_key: 'Optional[Hashable]' = None
+    ) -> Future:
+        """
+        Sends a request. The response is passed to handler (or the error to error_handler), and resolves the
+        returned Future. Cancelling the future cancels the request, handlers will not see a late response.
+
+        A request sent with a supersession_key cancels the one still in flight with the same key, e.g. the
+        completion request for a view once the next one is sent.
+        """
+        request_id = self._next_request_id()
         if self.transport is not None:
-            debug(' --> ' + request.method)
-            self._response_handlers[self.request_id] = (handler, error_handler)
-            self.send_payload(request.to_payload(self.request_id))
+            self._log(' -->', request.method, request_id)
+            future = Future(on_cancel=lambda: self._cancel_request(request_id))
+            pending = PendingRequest(request.method, handler, error_handler, future, supersession_key)
+            timeout = self.request_timeout(request.method)
+            if timeout:
+                pending.deadline = deadlines.schedule(timeout, lambda: self._handle_request_timeout(request_id))
+            if self._metrics:
+                pending.sent_at = monotonic()
+                self._metrics.request_sent(request.method)
+            self._response_handlers[request_id] = pending
+            if supersession_key is not None:
+                self._supersede(supersession_key, request_id)
+            self.send_payload(request.to_payload(request_id))
+            return future
         else:
-            debug('unable to send', request.method)
+            self._log('unable to send', request.method)
             if error_handler is not None:
                 error_handler(None)
-            return None
+            return failed({"code": ErrorCode.InternalError, "message": "unable to send " + request.method})
+
+    def _supersede(self, supersession_key: 'Hashable', request_id: int) -> None:
+        previous_id = self._superseded_requests.get(supersession_key)
+        self._superseded_requests[supersession_key] = request_id
+        if previous_id is not None:
+            previous = self._response_handlers.get(previous_id)
+            if previous:
+                previous.future.cancel()
+
+    def request_timeout(self, method: str) -> 'Optional[float]':
+        """Seconds to wait for a response to a request, from the "request_timeouts" setting. None waits forever."""
+        timeouts = self.settings.request_timeouts
+        return timeouts.get(method, timeouts.get("*")) or None
+
+    def _pop_pending_request(self, request_id: int) -> 'Optional[PendingRequest]':
+        pending = self._response_handlers.pop(request_id, None)
+        if pending:
+            if self._metrics:
+                self._metrics.request_finished(pending.method)
+            if pending.deadline:
+                deadlines.cancel(pending.deadline)
+            if pending.supersession_key is not None:
+                if self._superseded_requests.get(pending.supersession_key) == request_id:
+                    del self._superseded_requests[pending.supersession_key]
+        return pending
+
+    def _handle_request_timeout(self, request_id: int) -> None:
+        pending = self._pop_pending_request(request_id)
+        if pending:
+            self._log('timeout on', pending.method, request_id)
+            if self._metrics:
+                self._metrics.request_timed_out(pending.method)
+            self.send_notification(Notification.cancelRequest(request_id))
+            message = "{} timed out after {}s".format(pending.method, self.request_timeout(pending.method))
+            error = {"code": ErrorCode.RequestTimedOut, "message": message}
+            self.dispatcher.dispatch(self._response_priority(pending),
+                                     lambda: self._fail_pending_request(pending, error))
+
+    def _fail_pending_request(self, pending: PendingRequest, error: 'Dict[str, Any]', display: bool = True) -> None:
+        try:
+            if pending.error_handler:
+                pending.error_handler(error)
+            elif display and not pending.future.has_callbacks():
+                self._error_display_handler(error.get("message"))
+        except Exception as err:
+            exception_log("Error handling failure of {}".format(pending.method), err)
+        pending.future.set_error(error)
+
+    def _fail_pending_requests(self, message: str) -> None:
+        for request_id in list(self._response_handlers):
+            pending = self._pop_pending_request(request_id)
+            if pending:
+                self._fail_pending_request(pending, {"code": ErrorCode.InternalError, "message": message}, False)
+
+    def _cancel_request(self, request_id: int) -> None:
+        pending = self._pop_pending_request(request_id)
+        if pending:
+            self._log(' --x', pending.method, request_id)
+            if self._metrics:
+                self._metrics.request_cancelled(pending.method)
+            self.send_notification(Notification.cancelRequest(request_id))
 
     def execute_request(self, request: Request, timeout: float = DEFAULT_SYNC_REQUEST_TIMEOUT) -> 'Optional[Any]':
         """
         Sends a request and waits for response up to timeout (default: 1 second), blocking the current thread.
         """
         if self.transport is None:
-            debug('unable to send', request.method)
+            self._log('unable to send', request.method)
             return None
 
-        debug(' ==> ' + request.method)
-        self.request_id += 1
-        request_id = self.request_id
-        self.send_payload(request.to_payload(request_id))
-        result = None
+        self._log(' ==>', request.method)
+        future = self.send_request(request)
         try:
-            with self._sync_request_cvar:
-                # We go to sleep. We wake up once another thread calls .notify() on this condition variable.
-                self._sync_request_cvar.wait_for(lambda: request_id in self._sync_request_results, timeout)
-                result = self._sync_request_results.pop(request_id)
-        except KeyError as e:
-            debug('timeout on', request.method)
-            return None
-        return result
+            return future.result(timeout)
+        except TimeoutError:
+            self._log('timeout on', request.method)
+            future.cancel()
+        except RequestError:
+            pass
+        return None
 
     def send_notification(self, notification: Notification) -> None:
         if self.transport is not None:
-            debug(' --> ' + notification.method)
+            self._log(' -->', notification.method)
             self.send_payload(notification.to_payload())
         else:
-            debug('unable to send', notification.method)
+            self._log('unable to send', notification.method)
 
     def send_response(self, response: Response) -> None:
         self.send_payload(response.to_payload())
@@ -150,7 +301,7 @@ class Client(object):
         self._transport_fail_handler = handler
 
     def handle_transport_failure(self) -> None:
-        debug('transport failed')
+        self._log('transport failed')
         self.transport = None
         if self._transport_fail_handler is not None:
             self._transport_fail_handler()
@@ -160,76 +311,119 @@ class Client(object):
     def send_payload(self, payload: 'Dict[str, Any]') -> None:
         if self.transport:
             message = format_request(payload)
-            self.transport.send(message)
+            if self._recorder:
+                self._recorder.record(OUTBOUND, message)
+            if self._metrics:
+                self._metrics.message_sent(payload.get("method"), len(message.encode("UTF-8")), "id" not in payload)
+            priority, uri, replaceable = outbound_routing(payload)
+            self.transport.send(message, priority=priority, uri=uri, replaceable=replaceable)
 
     def receive_payload(self, message: str) -> None:
-        payload = None
+        if self._recorder:
+            self._recorder.record(INBOUND, message)
         try:
-            payload = json.loads(message)
-            # limit = min(len(message), 200)
-            # debug("got json: ", message[0:limit], "...")
-        except IOError as err:
+            envelope = peek_envelope(message)
+        except ValueError as err:
             exception_log("got a non-JSON payload: " + message, err)
             return
 
+        # The reader thread only routes, handlers run (and decode) on the dispatcher thread.
         try:
-            if "method" in payload:
-                if "id" in payload:
-                    self.handle("request", payload, self._request_handlers, payload.get("id"))
-                else:
-                    self.handle("notification", payload, self._notification_handlers)
-            elif "id" in payload:
-                self.response_handler(payload)
+            if envelope.method is not None:
+                if self._metrics:
+                    self._metrics.notification_received(envelope.method, len(message.encode("UTF-8")))
+                if envelope.method not in self._request_handlers and \
+                        envelope.method not in self._notification_handlers:
+                    # nothing would look at the params, don't decode them
+                    self._log("Unhandled message", envelope.method)
+                    return
+                priority = self._dispatch_priorities.get(envelope.method, DISPATCH_NORMAL)
+                self.dispatcher.dispatch(priority, lambda: self._handle_message(envelope))
+            elif envelope.id is not None:
+                pending = self._response_handlers.get(int(envelope.id))
+                if pending is None:
+                    # e.g. the late result of a superseded completion request, which can be huge
+                    self._log('dropping response to unknown or cancelled request', envelope.id)
+                    return
+                if self._metrics:
+                    self._metrics.response_received(pending.method, len(message.encode("UTF-8")),
+                                                    monotonic() - pending.sent_at)
+                self.dispatcher.dispatch(self._response_priority(pending),
+                                         lambda: self.response_handler(envelope.payload))
             else:
-                debug("Unknown payload type: ", payload)
+                self._log("Unknown payload type:", Payload(envelope.payload))
         except Exception as err:
             exception_log("Error handling server payload", err)
 
+    def _response_priority(self, pending: PendingRequest) -> int:
+        return DISPATCH_INTERACTIVE if pending.method in INTERACTIVE_METHODS else DISPATCH_NORMAL
+
+    def _handle_message(self, envelope: Envelope) -> None:
+        payload = envelope.payload
+        if "id" in payload:
+            self.handle("request", payload, self._request_handlers, payload.get("id"))
+        else:
+            self.handle("notification", payload, self._notification_handlers)
+
     def on_transport_closed(self) -> None:
+        self.dispatcher.dispatch(DISPATCH_LAST, self._handle_transport_closed)
+        self.dispatcher.close()
+
+    def _handle_transport_closed(self) -> None:
+        if self._recorder:
+            self._recorder.close()
         self._error_display_handler("Communication to server closed, exiting")
+        # no response will come for requests still in flight
+        self._fail_pending_requests("communication to server closed")
         # Differentiate between normal exit and server crash?
         if not self.exiting:
             self.handle_transport_failure()
 
     def response_handler(self, response: 'Dict[str, Any]') -> None:
         # This response handler *must not* run from the same thread that does a sync request
-        # because of the usage of the condition variable below.
+        # because that thread is blocked waiting on the future. It runs on the dispatcher thread, so handlers must not
+        # call execute_request.
         request_id = int(response["id"])
-        if self.settings.log_payloads:
-            debug('     ' + str(response.get("result", None)))
-        handler, error_handler = self._response_handlers.pop(request_id, (None, None))
+        pending = self._pop_pending_request(request_id)
+        if pending is None:
+            self._log('dropping response to unknown or cancelled request', request_id)
+            return
+        self._log('<--', pending.method, request_id)
         if "result" in response and "error" not in response:
-            if handler:
-                handler(response["result"])
-            else:
-                with self._sync_request_cvar:
-                    self._sync_request_results[request_id] = response["result"]
-                    # At most one thread is waiting on the result.
-                    self._sync_request_cvar.notify()
+            if self.settings.log_payloads:
+                self._log('    ', Payload(response["result"]))
+            pending.future.set_result(response["result"])
+            if pending.handler:
+                pending.handler(response["result"])
         elif "result" not in response and "error" in response:
             error = response["error"]
             if self.settings.log_payloads:
-                debug('ERR: ' + str(error))
-            if error_handler:
-                error_handler(error)
-            else:
-                self._error_display_handler(error.get("message"))
+                self._log('ERR:', Payload(error))
+            if self._metrics:
+                self._metrics.request_failed(pending.method)
+            self._fail_pending_request(pending, error)
         else:
-            debug('invalid response payload', response)
+            self._log('invalid response payload', Payload(response))
+            pending.future.set_error({"code": ErrorCode.InvalidRequest, "message": "invalid response payload"})
 
     def on_request(self, request_method: str, handler: 'Callable') -> None:
         self._request_handlers[request_method] = handler
 
-    def on_notification(self, notification_method: str, handler: 'Callable') -> None:
+    def on_notification(self, notification_method: str, handler: 'Callable', priority: int = DISPATCH_NORMAL) -> None:
+        """
+        Registers the handler of a notification. With DISPATCH_BACKGROUND, responses and other notifications are
+        handled ahead of it.
+        """
         self._notification_handlers[notification_method] = handler
+        self._dispatch_priorities[notification_method] = priority
 
     def handle(self, typestr: str, message: 'Dict[str, Any]', handlers: 'Dict[str, Callable]', *args: 'Any') -> None:
         method = message.get("method", "")
         params = message.get("params")
         if method != "window/logMessage":
-            debug('<--  ' + method)
+            self._log('<-- ', method)
             if self.settings.log_payloads and params:
-                debug('     ' + str(params))
+                self._log('    ', Payload(params))
         handler = handlers.get(method)
         if handler:
             try:
@@ -237,4 +431,4 @@ class Client(object):
             except Exception as err:
                 exception_log("Error handling {} {}".format(typestr, method), err)
         else:
-            debug("Unhandled {}".format(typestr), method)
+            self._log("Unhandled", typestr, method)
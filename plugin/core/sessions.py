@@ -1,15 +1,24 @@
 from .types import ClientConfig, ClientStates, Settings
 from .protocol import Request
-from .transports import start_tcp_transport
-from .rpc import Client, attach_stdio_client
+from .transports import Transport, start_tcp_transport, start_unix_transport
+from .rpc import Client, attach_stdio_client, transport_reactor, try_terminate_process
 from .process import start_server
+from .pool import process_pools
 from .url import filename_to_uri
 from .logging import debug
+from .metrics import metrics
+from .recording import start_recording
+from .resources import resource_monitor
+from .capabilities import capability_cache
+from .debounce import ChangeDebounce
 import os
 from .protocol import completion_item_kinds, symbol_kinds
 try:
+    import subprocess
     from typing import Callable, Dict, Any, Optional
-    assert Callable and Dict and Any and Optional
+    assert Callable and Dict and Any and Optional and subprocess
+    from .snapshots import Snapshot
+    assert Snapshot
 except ImportError:
     pass
 
@@ -24,34 +33,47 @@ def create_session(config: ClientConfig,
                    bootstrap_client: 'Optional[Any]' = None) -> 'Optional[Session]':
 
     def with_client(client: Client) -> 'Session':
-        return Session(
+        if isinstance(client, Client):
+            client.server_name = config.name
+        if settings.rpc_metrics and isinstance(client, Client):
+            client.set_metrics(metrics.server(config.name))
+        if settings.rpc_recording_dir and isinstance(client, Client):
+            recorder = start_recording(settings.rpc_recording_dir, config.name)
+            if recorder:
+                client.set_recorder(recorder)
+        session = Session(
             config=config,
             project_path=project_path,
             client=client,
             on_pre_initialize=on_pre_initialize,
             on_post_initialize=on_post_initialize,
             on_post_exit=on_post_exit)
+        if settings.rpc_metrics:
+            session.change_debounce.set_metrics(metrics.server(config.name))
+        return session
 
     session = None
     if config.binary_args:
-        process = start_server(config.binary_args, project_path, env, settings.log_stderr)
+        process = None
+        if not (config.tcp_port or config.unix_socket):
+            # a server listening on a socket cannot be spawned twice
+            process = process_pools.take(config, project_path, env, settings.log_stderr)
+        if not process:
+            process = start_server(config.binary_args, project_path, env, settings.log_stderr)
         if process:
-            if config.tcp_port:
-                transport = start_tcp_transport(config.tcp_port, config.tcp_host)
-                if transport:
-                    session = with_client(Client(transport, settings))
-                else:
-                    # try to terminate the process
-                    try:
-                        process.terminate()
-                    except Exception:
-                        pass
+            if config.tcp_port or config.unix_socket:
+                try:
+                    transport = connect_transport(config, settings, process)
+                except ConnectionError:
+                    try_terminate_process(process)
+                    raise
+                session = with_client(Client(transport, settings))
             else:
                 session = with_client(attach_stdio_client(process, settings))
+            resource_monitor.watch(config.name, process, config.resource_limits, session.handle_resource_limit)
     else:
-        if config.tcp_port:
-            transport = start_tcp_transport(config.tcp_port)
-            session = with_client(Client(transport, settings))
+        if config.tcp_port or config.unix_socket:
+            session = with_client(Client(connect_transport(config, settings), settings))
         elif bootstrap_client:
             session = with_client(bootstrap_client)
         else:
@@ -59,6 +81,15 @@ def create_session(config: ClientConfig,
     return session
 
 
+def connect_transport(config: ClientConfig, settings: Settings,
+                      process: 'Optional[subprocess.Popen]' = None) -> Transport:
+    """Connects to the socket of a server, giving up early if its process exits."""
+    reactor = transport_reactor(settings)
+    if config.unix_socket:
+        return start_unix_transport(os.path.expanduser(config.unix_socket), reactor, process)
+    return start_tcp_transport(config.tcp_port or 0, config.tcp_host, reactor, process)
+
+
 def get_initialize_params(project_path: str, config: ClientConfig) -> dict:
     initializeParams = {
         "processId": os.getpid(),
@@ -143,8 +174,14 @@ class Session(object):
         self.state = ClientStates.STARTING
         self._on_post_initialize = on_post_initialize
         self._on_post_exit = on_post_exit
-        self.capabilities = dict()  # type: Dict[str, Any]
+        # until initialize returns, what the server supported last time, if that is known
+        self.capabilities = capability_cache.get(config) or dict()  # type: Dict[str, Any]
         self.client = client
+        self._open_documents = dict()  # type: Dict[str, int]
+        self._document_versions = dict()  # type: Dict[str, int]
+        self._document_snapshots = dict()  # type: Dict[str, Snapshot]
+        self.change_debounce = ChangeDebounce()
+        self._resource_limit_handler = None  # type: Optional[Callable[[str], None]]
         if on_pre_initialize:
             on_pre_initialize(self)
         self.initialize()
@@ -155,6 +192,48 @@ class Session(object):
     def get_capability(self, capability: str) -> 'Optional[Any]':
         return self.capabilities.get(capability)
 
+    def set_resource_limit_handler(self, handler: 'Callable[[str], None]') -> None:
+        self._resource_limit_handler = handler
+
+    def handle_resource_limit(self, reason: str) -> None:
+        """Called from the resource monitor thread when the server process stays over one of its limits."""
+        if self._resource_limit_handler and self.state != ClientStates.STOPPING:
+            self._resource_limit_handler(reason)
+
+    def open_document(self, uri: str) -> bool:
+        """Counts a window opening uri. True for the first window, which should send didOpen."""
+        count = self._open_documents.get(uri, 0)
+        self._open_documents[uri] = count + 1
+        return count == 0
+
+    def close_document(self, uri: str) -> bool:
+        """Counts a window closing uri. True for the last window, which should send didClose."""
+        count = self._open_documents.get(uri, 0)
+        if count <= 1:
+            self._open_documents.pop(uri, None)
+            self._document_versions.pop(uri, None)
+            self._document_snapshots.pop(uri, None)
+            self.change_debounce.forget(uri)
+            return count == 1
+        self._open_documents[uri] = count - 1
+        return False
+
+    def document_version(self, uri: str, version: int) -> int:
+        """
+        The version to send for a change of uri: version, unless another window sharing the session sent that or a
+        later one already.
+        """
+        version = max(version, self._document_versions.get(uri, -1) + 1)
+        self._document_versions[uri] = version
+        return version
+
+    def document_snapshot(self, uri: str) -> 'Optional[Snapshot]':
+        """The snapshot of uri this server was sent last. Holding it keeps it in the snapshot store."""
+        return self._document_snapshots.get(uri)
+
+    def set_document_snapshot(self, uri: str, snapshot: 'Snapshot') -> None:
+        self._document_snapshots[uri] = snapshot
+
     def initialize(self) -> None:
         params = get_initialize_params(self.project_path, self.config)
         self.client.send_request(
@@ -164,6 +243,7 @@ class Session(object):
     def _handle_initialize_result(self, result: 'Any') -> None:
         self.state = ClientStates.READY
         self.capabilities = result.get('capabilities', dict())
+        capability_cache.put(self.config, self.capabilities)
         if self._on_post_initialize:
             self._on_post_initialize(self)
 
@@ -77,6 +77,20 @@ def update_settings(settings: Settings, settings_obj: sublime.Settings) -> None:
     settings.log_server = read_bool_setting(settings_obj, "log_server", True)
     settings.log_stderr = read_bool_setting(settings_obj, "log_stderr", False)
     settings.log_payloads = read_bool_setting(settings_obj, "log_payloads", False)
+    settings.log_payloads_limit = read_int_setting(settings_obj, "log_payloads_limit", 2000)
+    settings.log_buffer_size = read_int_setting(settings_obj, "log_buffer_size", 1000)
+    settings.transport_reactor = read_bool_setting(settings_obj, "transport_reactor", False)
+    settings.request_timeouts = read_dict_setting(settings_obj, "request_timeouts", Settings().request_timeouts)
+    settings.rpc_metrics = read_bool_setting(settings_obj, "rpc_metrics", False)
+    settings.rpc_metrics_file = read_str_setting(settings_obj, "rpc_metrics_file", "")
+    settings.rpc_metrics_interval = read_int_setting(settings_obj, "rpc_metrics_interval", 60)
+    settings.rpc_recording_dir = read_str_setting(settings_obj, "rpc_recording_dir", "")
+    settings.idle_session_timeout = read_int_setting(settings_obj, "idle_session_timeout", 0)
+    settings.resource_monitor_interval = read_int_setting(settings_obj, "resource_monitor_interval", 10)
+    settings.crash_restart_limit = read_int_setting(settings_obj, "crash_restart_limit", 5)
+    settings.cache_capabilities = read_bool_setting(settings_obj, "cache_capabilities", True)
+    settings.did_change_min_delay = read_int_setting(settings_obj, "did_change_min_delay", 50)
+    settings.did_change_max_delay = read_int_setting(settings_obj, "did_change_max_delay", 2000)
 
 
 class ClientConfigs(object):
@@ -179,7 +193,11 @@ def read_client_config(name: str, client_config: 'Dict') -> ClientConfig:
         client_config.get("initializationOptions", dict()),
         client_config.get("settings", dict()),
         client_config.get("env", dict()),
-        client_config.get("tcp_host", None)
+        client_config.get("tcp_host", None),
+        client_config.get("unix_socket", None),
+        client_config.get("pool_size", 0),
+        client_config.get("pool_idle_timeout", 600),
+        client_config.get("resource_limits", dict())
     )
 
 
@@ -197,5 +215,9 @@ def update_client_config(config: 'ClientConfig', settings: dict) -> 'ClientConfi
         settings.get("init_options", config.init_options),
         settings.get("settings", config.settings),
         settings.get("env", config.env),
-        settings.get("tcp_host", config.tcp_host)
+        settings.get("tcp_host", config.tcp_host),
+        settings.get("unix_socket", config.unix_socket),
+        settings.get("pool_size", config.pool_size),
+        settings.get("pool_idle_timeout", config.pool_idle_timeout),
+        settings.get("resource_limits", config.resource_limits)
     )
@@ -0,0 +1,100 @@
+import re
+import threading
+import weakref
+from bisect import bisect_right
+from .protocol import Point
+
+try:
+    from typing import Dict, List, Optional
+    assert Dict and List and Optional
+except ImportError:
+    pass
+
+
+class Snapshot(object):
+    """
+    The text of a document at one version. Never changes, so sessions and features can hold on to one while the
+    document moves on. The line index is built the first time it is needed.
+    """
+
+    __slots__ = ('version', 'text', '_line_starts', '__weakref__')
+
+    def __init__(self, version: int, text: str) -> None:
+        self.version = version
+        self.text = text
+        self._line_starts = None  # type: Optional[List[int]]
+
+    def __repr__(self) -> str:
+        return "Snapshot({}, {} characters)".format(self.version, len(self.text))
+
+    def line_starts(self) -> 'List[int]':
+        """The offset of the start of each line."""
+        if self._line_starts is None:
+            starts = [0]
+            starts.extend(match.end() for match in re.finditer('\n', self.text))
+            self._line_starts = starts
+        return self._line_starts
+
+    def point(self, offset: int) -> Point:
+        if self._line_starts is None:
+            # counting is cheaper than building the index for a single offset
+            return Point(self.text.count('\n', 0, offset), offset - self.text.rfind('\n', 0, offset) - 1)
+        row = bisect_right(self._line_starts, offset) - 1
+        return Point(row, offset - self._line_starts[row])
+
+    def offset(self, point: Point) -> int:
+        """The offset of point, clamped to the text, as a server would."""
+        starts = self.line_starts()
+        if point.row >= len(starts):
+            return len(self.text)
+        end = starts[point.row + 1] - 1 if point.row + 1 < len(starts) else len(self.text)
+        return min(starts[point.row] + point.col, end)
+
+
+class SnapshotStore(object):
+    """
+    The snapshots of the documents of a window, taken once per change and shared by every session and feature.
+    The store keeps the latest snapshot of each document. Older ones live on only while something, like a session
+    that was sent that version, holds them.
+    """
+
+    def __init__(self) -> None:
+        self._latest = {}  # type: Dict[str, Snapshot]
+        self._live = {}  # type: Dict[str, weakref.WeakValueDictionary]
+        self._lock = threading.Lock()
+
+    def take(self, path: str, text: str) -> Snapshot:
+        """A snapshot of path with text, the latest one again if the text did not change."""
+        with self._lock:
+            latest = self._latest.get(path)
+            if latest is not None and latest.text == text:
+                return latest
+            snapshot = Snapshot(latest.version + 1 if latest is not None else 0, text)
+            self._latest[path] = snapshot
+            self._live.setdefault(path, weakref.WeakValueDictionary())[snapshot.version] = snapshot
+            return snapshot
+
+    def latest(self, path: str) -> 'Optional[Snapshot]':
+        with self._lock:
+            return self._latest.get(path)
+
+    def get(self, path: str, version: int) -> 'Optional[Snapshot]':
+        """The snapshot of path at version, if it is the latest or still in use."""
+        with self._lock:
+            live = self._live.get(path)
+            return live.get(version) if live is not None else None
+
+    def versions(self, path: str) -> 'List[int]':
+        with self._lock:
+            live = self._live.get(path)
+            return sorted(live.keys()) if live is not None else []
+
+    def forget(self, path: str) -> None:
+        with self._lock:
+            self._latest.pop(path, None)
+            self._live.pop(path, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._latest.clear()
+            self._live.clear()
@@ -0,0 +1,99 @@
+import re
+from .protocol import ContentChange, Point, Range
+from .protocol import TextDocumentSyncKindFull, TextDocumentSyncKindIncremental
+
+try:
+    from typing import Any, Dict, List, Optional
+    assert Any and Dict and List and Optional
+except ImportError:
+    pass
+
+
+# a range change carrying more than this share of the document costs about as much as sending it whole
+FULL_SYNC_RATIO = 0.5
+
+# compared a block at a time, as comparing slices is done in C
+BLOCK_SIZE = 4096
+
+# characters taking two UTF-16 code units, where the character offsets of the spec and the code point offsets used
+# here disagree
+_ASTRAL = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def sync_kind(capabilities: 'Dict[str, Any]') -> int:
+    """How a server wants document changes: TextDocumentSyncKindFull or TextDocumentSyncKindIncremental."""
+    sync = capabilities.get('textDocumentSync')
+    if isinstance(sync, dict):
+        sync = sync.get('change')
+    return TextDocumentSyncKindIncremental if sync == TextDocumentSyncKindIncremental else TextDocumentSyncKindFull
+
+
+def content_change(old: 'Optional[str]', new: str) -> 'Optional[ContentChange]':
+    """
+    The change turning old, the text a server last got, into new: the replaced range with its new text, or the whole
+    of new when a range would not do. None if nothing changed.
+    """
+    if old == new:
+        return None
+    if old is None:
+        return ContentChange(new)
+    start = _common_prefix_length(old, new)
+    # the suffix may not overlap the prefix, in either text
+    common_suffix = _common_suffix_length(old, new, min(len(old), len(new)) - start)
+    old_end = len(old) - common_suffix
+    text = new[start:len(new) - common_suffix]
+    if len(text) > FULL_SYNC_RATIO * len(new):
+        return ContentChange(new)
+    start_point = _point(old, start)
+    end_point = _point(old, old_end)
+    if start_point is None or end_point is None:
+        return ContentChange(new)
+    return ContentChange(text, Range(start_point, end_point))
+
+
+def apply_content_changes(text: str, changes: 'List[Dict[str, Any]]') -> str:
+    """Applies the contentChanges of a didChange notification to text, the way a server would."""
+    for change in changes:
+        if 'range' not in change:
+            text = change['text']
+            continue
+        start = _offset(text, change['range']['start'])
+        end = _offset(text, change['range']['end'])
+        text = text[:start] + change['text'] + text[end:]
+    return text
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    start = 0
+    while start < limit and a[start:start + BLOCK_SIZE] == b[start:start + BLOCK_SIZE]:
+        start += BLOCK_SIZE
+    end = min(start + BLOCK_SIZE, limit)
+    while start < end and a[start] == b[start]:
+        start += 1
+    return min(start, limit)
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    length = 0
+    while length + BLOCK_SIZE <= limit and \
+            a[len(a) - length - BLOCK_SIZE:len(a) - length] == b[len(b) - length - BLOCK_SIZE:len(b) - length]:
+        length += BLOCK_SIZE
+    while length < limit and a[len(a) - length - 1] == b[len(b) - length - 1]:
+        length += 1
+    return length
+
+
+def _point(text: str, offset: int) -> 'Optional[Point]':
+    """The line and character of offset in text, None where servers could count them differently."""
+    line_start = text.rfind('\n', 0, offset) + 1
+    if text.find('\r', 0, offset) != -1 or _ASTRAL.search(text, line_start, offset):
+        return None
+    return Point(text.count('\n', 0, offset), offset - line_start)
+
+
+def _offset(text: str, position: 'Dict[str, int]') -> int:
+    line_start = 0
+    for i in range(position['line']):
+        line_start = text.index('\n', line_start) + 1
+    return line_start + position['character']
@@ -0,0 +1,75 @@
+from .capabilities import CapabilityCache, capability_cache, executable_identity
+from .sessions import Session
+from .test_session import MockClient, test_language
+from .types import ClientConfig, ClientStates
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+
+class CapabilityCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache", "capabilities.json")
+        self.executable = os.path.join(self.directory, "server")
+        with open(self.executable, "w") as file:
+            file.write("#!/bin/sh\n")
+        os.chmod(self.executable, os.stat(self.executable).st_mode | stat.S_IXUSR)
+        self.config = ClientConfig("server", [self.executable, "--stdio"], None, languages=[test_language])
+
+    def tearDown(self):
+        capability_cache.set_path(None)
+        shutil.rmtree(self.directory)
+
+    def cache(self) -> CapabilityCache:
+        cache = CapabilityCache()
+        cache.set_path(self.path)
+        return cache
+
+    def test_remembers_capabilities_across_runs(self):
+        self.cache().put(self.config, {"hoverProvider": True})
+        self.assertEqual(self.cache().get(self.config), {"hoverProvider": True})
+
+    def test_drops_capabilities_of_another_executable(self):
+        self.cache().put(self.config, {"hoverProvider": True})
+        os.utime(self.executable, (0, 0))
+        self.assertIsNone(self.cache().get(self.config))
+        other_command = ClientConfig("server", [self.executable], None, languages=[test_language])
+        self.assertIsNone(self.cache().get(other_command))
+
+    def test_needs_an_executable(self):
+        missing = ClientConfig("server", [os.path.join(self.directory, "missing")], None)
+        self.assertIsNone(executable_identity(missing))
+        self.assertIsNone(executable_identity(ClientConfig("server", [], 8080)))
+        cache = self.cache()
+        cache.put(missing, {"hoverProvider": True})
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_remembers_nothing_without_path(self):
+        cache = CapabilityCache()
+        cache.put(self.config, {"hoverProvider": True})
+        self.assertIsNone(cache.get(self.config))
+
+    def test_ignores_a_broken_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as file:
+            file.write("{")
+        self.assertIsNone(self.cache().get(self.config))
+
+    def test_starting_session_has_the_cached_capabilities(self):
+        capability_cache.set_path(self.path)
+        capability_cache.put(self.config, {"hoverProvider": True, "colorProvider": True})
+
+        def pre_initialize(session):
+            self.assertEqual(session.state, ClientStates.STARTING)
+            self.assertTrue(session.has_capability("colorProvider"))
+
+        session = Session(self.config, "/", MockClient(), on_pre_initialize=pre_initialize)  # type: ignore
+        # reconciled with the initialize result, which is remembered for the next start
+        self.assertEqual(session.state, ClientStates.READY)
+        self.assertFalse(session.has_capability("colorProvider"))
+        self.assertTrue(session.has_capability("testing"))
+        self.assertEqual(self.cache().get(self.config), session.capabilities)
@@ -0,0 +1,47 @@
+from .deadlines import Deadlines
+import threading
+import unittest
+
+
+class DeadlinesTest(unittest.TestCase):
+
+    def test_calls_back_in_order(self):
+        deadlines = Deadlines()
+        calls = []
+        done = threading.Event()
+
+        def late() -> None:
+            calls.append("late")
+            done.set()
+
+        deadlines.schedule(0.04, late)
+        deadlines.schedule(0.01, lambda: calls.append("early"))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(calls, ["early", "late"])
+        self.assertEqual(len(deadlines), 0)
+
+    def test_cancelled_deadline_does_not_fire(self):
+        deadlines = Deadlines()
+        calls = []
+        done = threading.Event()
+        deadline = deadlines.schedule(0.01, lambda: calls.append("cancelled"))
+        deadlines.schedule(0.03, done.set)
+        deadlines.cancel(deadline)
+        self.assertTrue(deadline.cancelled())
+        self.assertTrue(done.wait(2))
+        self.assertEqual(calls, [])
+
+    def test_cancelling_many_deadlines_compacts_heap(self):
+        deadlines = Deadlines()
+        scheduled = [deadlines.schedule(60, lambda: None) for i in range(200)]
+        for deadline in scheduled[:150]:
+            deadlines.cancel(deadline)
+        self.assertEqual(len(deadlines), 50)
+        self.assertLess(len(deadlines._heap), 200)
+
+    def test_earlier_deadline_wakes_thread(self):
+        deadlines = Deadlines()
+        done = threading.Event()
+        deadlines.schedule(60, lambda: None)
+        deadlines.schedule(0.01, done.set)
+        self.assertTrue(done.wait(2))
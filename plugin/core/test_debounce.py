@@ -0,0 +1,54 @@
+from .debounce import ChangeDebounce, SIZE_COST, TYPING_GAP
+from .metrics import ServerMetrics
+import unittest
+
+URI = "file:///a.py"
+MIN = 0.05
+MAX = 2.0
+
+
+class ChangeDebounceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.debounce = ChangeDebounce()
+
+    def test_small_document_waits_the_minimum(self):
+        self.assertAlmostEqual(self.debounce.edited(URI, 100, MIN, MAX, now=0), MIN + 100 * SIZE_COST)
+
+    def test_large_document_waits_longer_up_to_the_maximum(self):
+        self.assertAlmostEqual(self.debounce.edited(URI, 1000000, MIN, MAX, now=0), MIN + 1000000 * SIZE_COST)
+        self.assertEqual(self.debounce.edited("file:///huge.py", 100000000, MIN, MAX, now=0), MAX)
+
+    def test_waits_out_a_burst_of_typing(self):
+        for i in range(5):
+            delay = self.debounce.edited(URI, 100, MIN, MAX, now=0.2 * i)
+        self.assertAlmostEqual(delay, 1.5 * 0.2)
+        # after a pause, the next edit goes out quickly again
+        self.assertAlmostEqual(self.debounce.edited(URI, 100, MIN, MAX, now=1 + TYPING_GAP), MIN + 100 * SIZE_COST)
+
+    def test_slow_diagnostics_wait_longer(self):
+        self.debounce.edited(URI, 100, MIN, MAX, now=0)
+        self.debounce.sent(URI, now=0)
+        self.debounce.diagnostics_received(URI, now=1.0)
+        self.assertEqual(self.debounce.diagnostics_turnaround, 1.0)
+        # only the first publish after a change counts
+        self.debounce.diagnostics_received(URI, now=5.0)
+        self.assertEqual(self.debounce.diagnostics_turnaround, 1.0)
+        self.assertAlmostEqual(self.debounce.edited(URI, 100, MIN, MAX, now=10), 0.5)
+
+    def test_fixed_delay(self):
+        self.debounce.sent(URI, now=0)
+        self.debounce.diagnostics_received(URI, now=3.0)
+        self.assertEqual(self.debounce.edited(URI, 1000000, 0.5, 0.5, now=0), 0.5)
+
+    def test_reports_to_metrics(self):
+        metrics = ServerMetrics("pyls")
+        self.debounce.set_metrics(metrics)
+        delay = self.debounce.edited(URI, 100, MIN, MAX, now=0)
+        self.debounce.sent(URI, now=0)
+        self.debounce.diagnostics_received(URI, now=0.25)
+        self.assertEqual(metrics.change_delay, delay)
+        self.assertEqual(metrics.diagnostics_turnaround, 0.25)
+        self.assertEqual(self.debounce.to_dict(), {"diagnostics_turnaround": 0.25, "delays": {URI: delay}})
+        self.debounce.forget(URI)
+        self.assertEqual(self.debounce.to_dict()["delays"], {})
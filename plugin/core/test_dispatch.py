@@ -0,0 +1,54 @@
+from .dispatch import Dispatcher, DISPATCH_INTERACTIVE, DISPATCH_NORMAL, DISPATCH_BACKGROUND
+from .logging import set_exception_logging
+import threading
+import unittest
+
+
+class DispatcherTests(unittest.TestCase):
+
+    def test_runs_urgent_handlers_first(self):
+        dispatcher = Dispatcher()
+        started = threading.Event()
+        release = threading.Event()
+        done = threading.Event()
+        calls = []
+
+        def block():
+            started.set()
+            release.wait(2)
+
+        dispatcher.dispatch(DISPATCH_NORMAL, block)
+        self.assertTrue(started.wait(2))
+        dispatcher.dispatch(DISPATCH_BACKGROUND, lambda: calls.append("diagnostics 1"))
+        dispatcher.dispatch(DISPATCH_NORMAL, lambda: calls.append("notification"))
+        dispatcher.dispatch(DISPATCH_BACKGROUND, lambda: calls.append("diagnostics 2"))
+        dispatcher.dispatch(DISPATCH_INTERACTIVE, lambda: calls.append("completion"))
+        dispatcher.dispatch(DISPATCH_BACKGROUND, done.set)
+        self.assertEqual(dispatcher.depth(), 5)
+        release.set()
+        self.assertTrue(done.wait(2))
+        self.assertEqual(calls, ["completion", "notification", "diagnostics 1", "diagnostics 2"])
+        stats = dispatcher.stats()
+        self.assertEqual(stats["dispatched"], 6)
+        self.assertEqual(stats["max_depth"], 5)
+        self.assertGreater(stats["max_wait"], 0)
+
+    def test_survives_handler_error(self):
+        dispatcher = Dispatcher()
+        done = threading.Event()
+
+        def fail():
+            raise Exception("oops")
+
+        set_exception_logging(False)
+        dispatcher.dispatch(DISPATCH_NORMAL, fail)
+        dispatcher.dispatch(DISPATCH_NORMAL, done.set)
+        self.assertTrue(done.wait(2))
+
+    def test_close_handles_what_was_dispatched(self):
+        dispatcher = Dispatcher()
+        done = threading.Event()
+        dispatcher.dispatch(DISPATCH_NORMAL, done.set)
+        dispatcher.close()
+        dispatcher.dispatch(DISPATCH_NORMAL, lambda: self.fail("dispatched after close"))
+        self.assertTrue(done.wait(2))
@@ -9,15 +9,37 @@ from . import test_sublime as test_sublime
 from .test_rpc import MockSettings
 # from .logging import debug, set_debug_logging
 from .types import ClientConfig
+from .sync import apply_content_changes
 from os.path import basename
 
 try:
-    from typing import Any, Dict
-    assert Any and Dict and Session
+    from typing import Any, Dict, List, Tuple
+    assert Any and Dict and List and Tuple and Session
 except ImportError:
     pass
 
 
+class RecordingSublime(object):
+    """Keeps every timeout, where test_sublime keeps the last."""
+    Region = test_sublime.Region
+
+    def __init__(self) -> None:
+        self.timeouts = []  # type: List[Tuple[int, Any]]
+
+    def set_timeout_async(self, callback, duration):
+        self.timeouts.append((duration, callback))
+
+
+class CountingView(MockView):
+    def __init__(self, file_name):
+        super().__init__(file_name)
+        self.reads = 0
+
+    def substr(self, region):
+        self.reads += 1
+        return super().substr(region)
+
+
 class WindowDocumentHandlerTests(unittest.TestCase):
 
     def assert_if_none(self, session) -> 'Session':
@@ -138,3 +160,145 @@ class WindowDocumentHandlerTests(unittest.TestCase):
             status_configs = status_string.split(", ")
             self.assertIn("test", status_configs)
             self.assertIn("test2", status_configs)
+
+    def test_windows_sharing_a_session_open_and_close_a_document_once(self):
+        client = MockClient()
+        session = self.assert_if_none(
+            create_session(test_config, "", dict(), MockSettings(), bootstrap_client=client))
+        handlers = []
+        views = []
+        for _ in range(2):
+            events = Events()
+            view = MockView(__file__)
+            window = MockWindow([[view]])
+            view.set_window(window)
+            handler = WindowDocumentHandler(test_sublime, MockSettings(), window, events, MockConfigs())
+            handler.add_session(session)
+            events.publish("view.on_activated_async", view)
+            handlers.append((handler, events))
+            views.append(view)
+        self.assertEqual([n.method for n in client._notifications], ["textDocument/didOpen"])
+
+        handlers[0][1].publish("view.on_close", views[0])
+        self.assertEqual(len(client._notifications), 1)
+        handlers[1][1].publish("view.on_close", views[1])
+        self.assertEqual([n.method for n in client._notifications], ["textDocument/didOpen", "textDocument/didClose"])
+
+    def test_sends_incremental_changes_the_server_can_apply(self):
+        events = Events()
+        view = MockView(__file__)
+        window = MockWindow([[view]])
+        view.set_window(window)
+        handler = WindowDocumentHandler(test_sublime, MockSettings(), window, events, MockConfigs())
+        client = MockClient()
+        session = self.assert_if_none(
+            create_session(test_config, "", dict(), MockSettings(), bootstrap_client=client))
+        session.capabilities["textDocumentSync"] = {"openClose": True, "change": 2}
+        handler.add_session(session)
+        view._text = "def f():\n    return 1\n"
+        events.publish("view.on_activated_async", view)
+        server_text = client._notifications[0].params["textDocument"]["text"]
+
+        for text in ("def f():\n    return 12\n", "def g():\n    return 12\n", "def g():\n    return 12\n",
+                     "# é\ndef g():\n    return 12\n", ""):
+            sent = len(client._notifications)
+            view._text = text
+            events.publish("view.on_modified", view)
+            test_sublime._run_timeout()
+            for did_change in client._notifications[sent:]:
+                for change in did_change.params["contentChanges"]:
+                    self.assertIn("range", change)
+                server_text = apply_content_changes(server_text, did_change.params["contentChanges"])
+            self.assertEqual(server_text.encode("UTF-8"), text.encode("UTF-8"))
+
+        # the unchanged text was not sent again
+        did_changes = client._notifications[1:]
+        self.assertEqual(len(did_changes), 4)
+        self.assertEqual([n.params["textDocument"]["version"] for n in did_changes], [1, 2, 3, 4])
+        self.assertEqual(did_changes[0].params["contentChanges"], [{
+            "text": "2", "range": {"start": {"line": 1, "character": 12}, "end": {"line": 1, "character": 12}}
+        }])
+
+    def test_each_session_waits_as_long_as_suits_it(self):
+        sublime = RecordingSublime()
+        events = Events()
+        view = MockView(__file__)
+        window = MockWindow([[view]])
+        view.set_window(window)
+        handler = WindowDocumentHandler(sublime, MockSettings(), window, events, MockConfigs())
+        fast_client = MockClient()
+        fast = self.assert_if_none(
+            create_session(test_config, "", dict(), MockSettings(), bootstrap_client=fast_client))
+        slow_client = MockClient()
+        slow = self.assert_if_none(
+            create_session(ClientConfig("test2", [], None, languages=[test_language]), "", dict(), MockSettings(),
+                           bootstrap_client=slow_client))
+        slow.change_debounce.diagnostics_turnaround = 1.0  # takes a second to publish diagnostics
+        handler.add_session(fast)
+        handler.add_session(slow)
+        events.publish("view.on_activated_async", view)
+
+        view._text = "asdf jklm"
+        events.publish("view.on_modified", view)
+        (fast_delay, send_fast), (slow_delay, send_slow) = sorted(sublime.timeouts, key=lambda timeout: timeout[0])
+        self.assertEqual(fast_delay, 50)
+        self.assertEqual(slow_delay, 500)
+
+        send_fast()
+        self.assertEqual([n.method for n in fast_client._notifications],
+                         ["textDocument/didOpen", "textDocument/didChange"])
+        self.assertEqual(len(slow_client._notifications), 1)
+
+        # a request about to be sent needs every server up to date
+        events.publish("view.on_purge_changes", view)
+        self.assertEqual(len(fast_client._notifications), 2)
+        self.assertEqual(slow_client._notifications[1].params["contentChanges"], [{"text": "asdf jklm"}])
+        self.assertEqual(handler._pending_buffer_changes, {})
+        send_slow()
+        self.assertEqual(len(slow_client._notifications), 2)
+
+    def test_sessions_share_one_snapshot_per_change(self):
+        sublime = RecordingSublime()
+        events = Events()
+        view = CountingView(__file__)
+        window = MockWindow([[view]])
+        view.set_window(window)
+        handler = WindowDocumentHandler(sublime, MockSettings(), window, events, MockConfigs())
+        clients = [MockClient(), MockClient()]
+        sessions = []
+        for name, client in zip(("test", "test2"), clients):
+            session = self.assert_if_none(
+                create_session(ClientConfig(name, [], None, languages=[test_language]), "", dict(), MockSettings(),
+                               bootstrap_client=client))
+            session.capabilities["textDocumentSync"] = {"openClose": True, "change": 2}
+            handler.add_session(session)
+            sessions.append(session)
+        events.publish("view.on_activated_async", view)
+        self.assertEqual(view.reads, 1)
+        self.assertEqual(handler._snapshots.versions(__file__), [0])
+
+        for text in ("asdf jklm", "asdf jklm qwer"):
+            view._text = text
+            events.publish("view.on_modified", view)
+            events.publish("view.on_purge_changes", view)
+        self.assertEqual(view.reads, 3)
+        for client in clients:
+            self.assertEqual([n.params["textDocument"]["version"] for n in client._notifications[1:]], [1, 2])
+        snapshot = handler.snapshot(__file__)
+        assert snapshot
+        self.assertEqual((snapshot.version, snapshot.text), (2, "asdf jklm qwer"))
+        self.assertEqual(handler._snapshots.versions(__file__), [2])
+        del snapshot  # which would keep it alive too
+
+        # the version a session waiting for its turn was sent stays until it moves on
+        sessions[0].change_debounce.diagnostics_turnaround = 1.0
+        view._text = "asdf"
+        events.publish("view.on_modified", view)
+        fast = min(sublime.timeouts[-2:], key=lambda timeout: timeout[0])
+        fast[1]()
+        self.assertEqual(handler._snapshots.versions(__file__), [2, 3])
+        events.publish("view.on_purge_changes", view)
+        self.assertEqual(handler._snapshots.versions(__file__), [3])
+
+        events.publish("view.on_close", view)
+        self.assertIsNone(handler.snapshot(__file__))
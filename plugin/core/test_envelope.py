@@ -0,0 +1,39 @@
+from .envelope import peek_envelope
+import unittest
+
+
+class PeekEnvelopeTests(unittest.TestCase):
+
+    def test_reads_response_id_without_decoding_result(self):
+        envelope = peek_envelope('{"jsonrpc": "2.0", "id": 3, "result": {"items": []}}')
+        self.assertEqual(envelope.id, 3)
+        self.assertIsNone(envelope.method)
+        self.assertFalse(envelope.is_decoded())
+        self.assertEqual(envelope.payload["result"], {"items": []})
+
+    def test_does_not_decode_params(self):
+        envelope = peek_envelope('{"jsonrpc":"2.0","method":"$/progress","params":{not json')
+        self.assertEqual(envelope.method, "$/progress")
+        self.assertFalse(envelope.is_decoded())
+
+    def test_falls_back_to_decoding_when_members_come_late(self):
+        envelope = peek_envelope('{"params": {"a": 1}, "method": "x/y", "id": 2}')
+        self.assertTrue(envelope.is_decoded())
+        self.assertEqual(envelope.method, "x/y")
+        self.assertEqual(envelope.id, 2)
+
+    def test_notification_without_params(self):
+        envelope = peek_envelope('{"jsonrpc": "2.0", "method": "exit"}')
+        self.assertEqual(envelope.method, "exit")
+        self.assertIsNone(envelope.id)
+
+    def test_request_id_after_params_is_read_on_decode(self):
+        envelope = peek_envelope('{"method": "workspace/applyEdit", "params": {}, "id": 7}')
+        self.assertEqual(envelope.method, "workspace/applyEdit")
+        self.assertEqual(envelope.payload["id"], 7)
+
+    def test_rejects_non_json(self):
+        with self.assertRaises(ValueError):
+            peek_envelope('Content-Length: 3')
+        with self.assertRaises(ValueError):
+            peek_envelope('[1, 2]')
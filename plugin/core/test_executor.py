@@ -0,0 +1,34 @@
+from .executor import Executor
+import threading
+import unittest
+
+
+class ExecutorTests(unittest.TestCase):
+
+    def test_runs_tasks_side_by_side(self):
+        executor = Executor(2, "test")
+        first, second = threading.Event(), threading.Event()
+        done = []
+        finished = threading.Semaphore(0)
+
+        def task(mine: threading.Event, other: threading.Event) -> None:
+            mine.set()
+            # only finishes in time if the other task runs at the same time
+            done.append(other.wait(2))
+            finished.release()
+
+        executor.submit(lambda: task(first, second))
+        executor.submit(lambda: task(second, first))
+        self.assertTrue(finished.acquire(timeout=5) and finished.acquire(timeout=5))
+        self.assertEqual(done, [True, True])
+
+    def test_keeps_running_after_a_failed_task(self):
+        executor = Executor(1, "test")
+        finished = threading.Event()
+
+        def fail() -> None:
+            raise ValueError("expected")
+
+        executor.submit(fail)
+        executor.submit(finished.set)
+        self.assertTrue(finished.wait(5))
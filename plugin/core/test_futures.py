@@ -0,0 +1,117 @@
+from .futures import Future, RequestError, CancelledError, gather, first_completed, resolved, failed, wrap_future
+import threading
+import unittest
+try:
+    import asyncio
+except ImportError:
+    asyncio = None  # type: ignore
+try:
+    from typing import Any, List
+    assert Any and List
+except ImportError:
+    pass
+
+
+class FutureTests(unittest.TestCase):
+
+    def test_done_callbacks_run_once_resolved(self):
+        future = Future()
+        results = []  # type: List[Any]
+        future.add_done_callback(lambda f: results.append(f.result()))
+        self.assertEqual(results, [])
+        future.set_result(42)
+        future.add_done_callback(lambda f: results.append(f.result()))
+        self.assertEqual(results, [42, 42])
+
+    def test_completes_only_once(self):
+        future = Future()
+        self.assertTrue(future.set_result(1))
+        self.assertFalse(future.set_result(2))
+        self.assertFalse(future.cancel())
+        self.assertEqual(future.result(), 1)
+
+    def test_result_times_out(self):
+        with self.assertRaises(TimeoutError):
+            Future().result(0.01)
+
+    def test_result_waits_for_other_thread(self):
+        future = Future()
+        threading.Timer(0.01, lambda: future.set_result("done")).start()
+        self.assertEqual(future.result(2), "done")
+
+    def test_error_raises_request_error(self):
+        future = failed({"code": -32601, "message": "no such method"})
+        with self.assertRaises(RequestError) as context:
+            future.result()
+        self.assertEqual(context.exception.code, -32601)
+
+    def test_cancel_invokes_on_cancel(self):
+        cancelled = []  # type: List[bool]
+        future = Future(on_cancel=lambda: cancelled.append(True))
+        self.assertTrue(future.cancel())
+        self.assertTrue(future.cancelled())
+        self.assertEqual(cancelled, [True])
+        with self.assertRaises(CancelledError):
+            future.result()
+
+    def test_then_chains_futures(self):
+        inner = Future()
+        chained = resolved(1).then(lambda value: inner).then(lambda value: value * 2)
+        self.assertFalse(chained.done())
+        inner.set_result(21)
+        self.assertEqual(chained.result(0), 42)
+
+    def test_cancelling_a_chain_cancels_the_inner_future(self):
+        inner = Future()
+        chained = resolved(1).then(lambda value: inner).then(lambda value: value * 2)
+        self.assertTrue(chained.cancel())
+        self.assertTrue(inner.cancelled())
+
+    def test_then_passes_errors_along(self):
+        chained = failed({"message": "oops"}).then(lambda value: value)
+        self.assertEqual(chained.error(), {"message": "oops"})
+
+
+class CombinatorTests(unittest.TestCase):
+
+    def test_gather_keeps_order(self):
+        first, second = Future(), Future()
+        combined = gather([first, second])
+        second.set_result(2)
+        self.assertFalse(combined.done())
+        first.set_result(1)
+        self.assertEqual(combined.result(0), [1, 2])
+
+    def test_gather_fails_fast_and_cancels_others(self):
+        first, second = Future(), Future()
+        combined = gather([first, second])
+        first.set_error({"message": "oops"})
+        self.assertEqual(combined.error(), {"message": "oops"})
+        self.assertTrue(second.cancelled())
+
+    def test_gather_of_nothing(self):
+        self.assertEqual(gather([]).result(0), [])
+
+    def test_first_completed_of_nothing(self):
+        with self.assertRaises(ValueError):
+            first_completed([])
+
+    def test_first_completed(self):
+        first, second = Future(), Future()
+        combined = first_completed([first, second], cancel_others=True)
+        second.set_result("fast")
+        self.assertIs(combined.result(0), second)
+        self.assertTrue(first.cancelled())
+
+
+@unittest.skipIf(asyncio is None, "needs asyncio")
+class AsyncioBridgeTests(unittest.TestCase):
+
+    def test_awaits_future_resolved_on_other_thread(self):
+        loop = asyncio.new_event_loop()
+        try:
+            future = Future()
+            threading.Timer(0.01, lambda: future.set_result("done")).start()
+            self.assertEqual(loop.run_until_complete(wrap_future(future, loop)), "done")
+        finally:
+            loop.close()
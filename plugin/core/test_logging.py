@@ -0,0 +1,106 @@
+from . import logging
+from .logging import LogBuffer, Payload, trace
+import os
+import tempfile
+import unittest
+
+
+class Counted(object):
+    """Counts how often it is formatted."""
+
+    def __init__(self) -> None:
+        self.formatted = 0
+
+    def __str__(self) -> str:
+        self.formatted += 1
+        return "counted"
+
+
+class TraceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.log_debug = logging.log_debug
+        logging.set_debug_logging(False)
+
+    def tearDown(self):
+        logging.set_debug_logging(self.log_debug)
+        logging.set_log_buffer_size(0)
+
+    def test_formats_nothing_when_off(self):
+        logging.set_log_buffer_size(0)
+        counted = Counted()
+        trace("server", "message", counted)
+        self.assertEqual(counted.formatted, 0)
+
+    def test_buffered_records_are_formatted_when_read(self):
+        logging.set_log_buffer_size(10)
+        counted = Counted()
+        trace("server", "message", counted)
+        self.assertEqual(counted.formatted, 0)
+        records = logging.log_buffer.records("server")
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].message(), "message counted")
+        self.assertEqual(counted.formatted, 1)
+
+
+class PayloadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.limit = logging.payload_limit
+
+    def tearDown(self):
+        logging.set_payload_limit(self.limit)
+
+    def test_serializes_to_json(self):
+        self.assertEqual(str(Payload({"a": [1, None]})), '{"a": [1, null]}')
+
+    def test_truncates(self):
+        logging.set_payload_limit(5)
+        self.assertEqual(str(Payload("abcdefghij")), '"abcd... (7 more characters)')
+
+    def test_no_limit(self):
+        logging.set_payload_limit(0)
+        self.assertEqual(str(Payload("x" * 5000)), '"' + "x" * 5000 + '"')
+
+
+class LogBufferTests(unittest.TestCase):
+
+    def test_keeps_the_last_records_per_server(self):
+        buffer = LogBuffer(3)
+        for i in range(5):
+            buffer.append("a", ("a", i))
+        buffer.append("b", ("b",))
+        self.assertEqual([record.message() for record in buffer.records("a")], ["a 2", "a 3", "a 4"])
+        self.assertEqual(buffer.server_names(), ["a", "b"])
+        self.assertEqual(len(buffer.records()), 4)
+
+    def test_serializes_payloads_only_when_read(self):
+        buffer = LogBuffer(3)
+        payload = Payload([1, 2])
+        buffer.append("a", ("result", payload))
+        self.assertIsNone(payload._text)
+        record = buffer.records("a")[0]
+        self.assertIs(record.args[1], payload)
+        self.assertEqual(record.message(), "result [1, 2]")
+
+    def test_shrink(self):
+        buffer = LogBuffer(3)
+        for i in range(3):
+            buffer.append("a", (i,))
+        buffer.set_capacity(1)
+        self.assertEqual([record.message() for record in buffer.records("a")], ["2"])
+        buffer.set_capacity(0)
+        self.assertEqual(buffer.records(), [])
+
+    def test_dump(self):
+        buffer = LogBuffer(10)
+        buffer.append("a", ("first",))
+        buffer.append("b", ("second",))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.txt")
+            self.assertEqual(buffer.dump(path), 2)
+            with open(path, encoding="UTF-8") as file:
+                lines = file.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(" a: first"))
+        self.assertTrue(lines[1].endswith(" b: second"))
@@ -0,0 +1,111 @@
+from .metrics import MetricsRegistry, MethodMetrics, MetricsDump, ServerMetrics
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+
+class MethodMetricsTests(unittest.TestCase):
+
+    def test_latency_histogram(self):
+        metrics = MethodMetrics()
+        for latency in (0.001, 0.02, 0.02, 0.3, 45):
+            metrics.observe_latency(latency)
+        self.assertEqual(sum(metrics.buckets), 5)
+        self.assertEqual(metrics.buckets[0], 1)
+        self.assertEqual(metrics.buckets[-1], 1)
+        self.assertEqual(metrics.latency_max, 45)
+        self.assertEqual(metrics.latency_quantile(0.5), 0.025)
+        self.assertEqual(metrics.latency_quantile(1.0), 45)
+
+
+class ServerMetricsTests(unittest.TestCase):
+
+    def test_counts_from_several_threads(self):
+        server = ServerMetrics("pyls")
+
+        def count():
+            for _ in range(10000):
+                server.message_sent("textDocument/didChange", 1, True)
+                server.notification_received("textDocument/publishDiagnostics", 1)
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(server.methods["textDocument/didChange"].bytes_out, 40000)
+        self.assertEqual(server.methods["textDocument/publishDiagnostics"].notifications_in, 40000)
+
+
+class MetricsRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        server = self.registry.server("pyls")
+        server.request_sent("textDocument/hover")
+        server.response_received("textDocument/hover", 120, 0.04)
+        server.request_finished("textDocument/hover")
+        server.request_sent("textDocument/completion")
+        server.request_sent("textDocument/completion")
+        server.request_finished("textDocument/completion")
+        server.request_timed_out("textDocument/completion")
+        server.message_sent("textDocument/didChange", 300, True)
+        server.notification_received("window/logMessage", 80)
+
+    def test_json(self):
+        dumped = json.loads(self.registry.to_json())
+        completion = dumped["pyls"]["methods"]["textDocument/completion"]
+        self.assertEqual(completion["requests"], 2)
+        self.assertEqual(completion["in_flight"], 1)
+        self.assertEqual(completion["timeouts"], 1)
+        self.assertEqual(dumped["pyls"]["methods"]["textDocument/hover"]["latency_buckets"]["0.05"], 1)
+        self.assertEqual(dumped["pyls"]["queue_depth"], 0)
+
+    def test_prometheus(self):
+        text = self.registry.to_prometheus()
+        self.assertIn('lsp_rpc_requests_total{server="pyls",method="textDocument/completion"} 2\n', text)
+        self.assertIn('lsp_rpc_bytes_out_total{server="pyls",method="textDocument/didChange"} 300\n', text)
+        self.assertIn('lsp_rpc_latency_seconds_bucket{server="pyls",method="textDocument/hover",le="0.05"} 1\n',
+                      text)
+        self.assertIn('lsp_rpc_latency_seconds_count{server="pyls",method="textDocument/hover"} 1\n', text)
+
+    def test_hibernation(self):
+        server = self.registry.server("pyls")
+        server.session_hibernated()
+        server.session_restarted(90)
+        self.assertEqual(json.loads(self.registry.to_json())["pyls"]["restarts"], 1)
+        text = self.registry.to_prometheus()
+        self.assertIn('lsp_session_hibernations_total{server="pyls"} 1\n', text)
+        self.assertIn('lsp_session_hibernated_seconds_total{server="pyls"} 90.0\n', text)
+        self.assertIn("pyls: 1 ended idle, 1 restarted after 90s", self.registry.format_report())
+
+    def test_crashes(self):
+        self.registry.server("pyls").session_crashed()
+        self.assertIn('lsp_session_crashes_total{server="pyls"} 1\n', self.registry.to_prometheus())
+        self.assertIn("crashes      pyls: 1", self.registry.format_report())
+
+    def test_change_debounce(self):
+        server = self.registry.server("pyls")
+        server.observe_change_delay(0.12)
+        server.observe_diagnostics_turnaround(0.8)
+        self.assertEqual(json.loads(self.registry.to_json())["pyls"]["change_delay"], 0.12)
+        self.assertIn('lsp_did_change_delay_seconds{server="pyls"} 0.12\n', self.registry.to_prometheus())
+        self.assertIn("did change   pyls: 120 ms, diagnostics after 800 ms", self.registry.format_report())
+
+    def test_report_sorts_on_column(self):
+        lines = self.registry.format_report("bytes_out").splitlines()
+        self.assertTrue(lines[0].startswith("server"))
+        self.assertIn("textDocument/didChange", lines[1])
+        lines = self.registry.format_report("timeouts").splitlines()
+        self.assertIn("textDocument/completion", lines[1])
+
+    def test_dump_writes_file(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "metrics.prom")
+        MetricsDump(self.registry, path, 60).write()
+        with open(path) as file:
+            self.assertIn("# TYPE lsp_rpc_latency_seconds histogram", file.read())
+        os.remove(path)
+        os.rmdir(directory)
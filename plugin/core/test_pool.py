@@ -0,0 +1,86 @@
+from .pool import ProcessPool
+import time
+import unittest
+
+try:
+    from typing import List, Optional
+    assert List and Optional
+except ImportError:
+    pass
+
+
+class FakeProcess(object):
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.returncode = None  # type: Optional[int]
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.returncode = -15
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+
+class ProcessPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.spawned = []  # type: List[FakeProcess]
+
+    def spawn(self):
+        process = FakeProcess(len(self.spawned) + 1)
+        self.spawned.append(process)
+        return process
+
+    def test_first_take_fills_the_pool(self):
+        pool = ProcessPool(self.spawn, 2, 60)
+        self.assertIsNone(pool.take())
+        wait_until(lambda: pool.idle_count() == 2)
+        self.assertIs(pool.take(), self.spawned[0])
+        wait_until(lambda: len(self.spawned) == 3)
+        wait_until(lambda: pool.idle_count() == 2)
+        pool.close()
+
+    def test_skips_processes_that_exited(self):
+        pool = ProcessPool(self.spawn, 2, 60)
+        pool.fill()
+        wait_until(lambda: pool.idle_count() == 2)
+        self.spawned[0].returncode = 1
+        self.assertIs(pool.take(), self.spawned[1])
+        pool.close()
+
+    def test_terminates_idle_processes(self):
+        pool = ProcessPool(self.spawn, 1, 0.01)
+        pool.fill()
+        wait_until(lambda: len(self.spawned) == 1)
+        wait_until(lambda: self.spawned[0].returncode is not None)
+        self.assertEqual(pool.idle_count(), 0)
+        self.assertEqual(len(self.spawned), 1)
+
+    def test_terminates_every_idle_process(self):
+        pool = ProcessPool(self.spawn, 3, 0.05)
+        pool.fill()
+        wait_until(lambda: len(self.spawned) == 3)
+        wait_until(lambda: all(process.returncode is not None for process in self.spawned))
+        self.assertEqual(pool.idle_count(), 0)
+
+    def test_close_terminates_idle_processes(self):
+        pool = ProcessPool(self.spawn, 2, 60)
+        pool.fill()
+        wait_until(lambda: pool.idle_count() == 2)
+        pool.close()
+        self.assertTrue(all(process.returncode is not None for process in self.spawned))
+        self.assertIsNone(pool.take())
@@ -0,0 +1,58 @@
+from .profiling import StartupProfile
+import builtins
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+class StartupProfileTests(unittest.TestCase):
+
+    def setUp(self):
+        # a package with a module that imports a sibling, none of them imported yet
+        self.directory = tempfile.mkdtemp()
+        package = os.path.join(self.directory, "profiled")
+        os.mkdir(package)
+        for name, content in (("__init__.py", ""), ("outer.py", "from .inner import VALUE\n"),
+                              ("inner.py", "VALUE = 1\n")):
+            with open(os.path.join(package, name), "w") as file:
+                file.write(content)
+        sys.path.insert(0, self.directory)
+
+    def tearDown(self):
+        sys.path.remove(self.directory)
+        for name in ("profiled", "profiled.outer", "profiled.inner"):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.directory)
+
+    def test_times_first_imports(self):
+        profile = StartupProfile()
+        original = builtins.__import__
+        with profile.timing_imports():
+            import profiled.outer  # type: ignore # noqa
+            import profiled.outer  # type: ignore # noqa
+        self.assertIs(builtins.__import__, original)
+        timings = dict((timing.name, timing) for timing in profile.imports)
+        self.assertEqual(sorted(timings), ["profiled.inner", "profiled.outer"])
+        outer = timings["profiled.outer"]
+        self.assertLessEqual(outer.own, outer.total)
+        self.assertGreaterEqual(outer.total, timings["profiled.inner"].total)
+        self.assertAlmostEqual(profile.import_seconds(), sum(timing.own for timing in profile.imports))
+
+    def test_reports_phases(self):
+        profile = StartupProfile()
+        with profile.phase("load settings"):
+            pass
+        self.assertEqual([name for name, seconds in profile.phases], ["load settings"])
+        self.assertIn("load settings", profile.format_report())
+        self.assertEqual(set(profile.to_dict()), {"imports", "phases", "total"})
+
+    def test_starts_over(self):
+        profile = StartupProfile()
+        with profile.phase("load settings"):
+            pass
+        with profile.timing_imports():
+            pass
+        self.assertEqual(profile.phases, [])
+        self.assertEqual(profile.format_report(), "Nothing was profiled.\n")
@@ -0,0 +1,108 @@
+from .reactor import Reactor, is_reactor_supported
+from .transports import reactor_stdio_transport, reactor_tcp_transport
+from .test_transports import json_rpc_message
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+try:
+    from typing import List
+    assert List
+except ImportError:
+    pass
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@unittest.skipUnless(is_reactor_supported(), "needs selectors and non-blocking pipes")
+class ReactorTests(unittest.TestCase):
+
+    def test_runs_calls_and_timers_on_reactor_thread(self):
+        reactor = Reactor()
+        threads = []  # type: List[str]
+        reactor.call_later(0.01, lambda: threads.append(threading.current_thread().name))
+        reactor.call_soon(lambda: threads.append(threading.current_thread().name))
+        self.assertTrue(wait_for(lambda: len(threads) == 2))
+        self.assertEqual(threads, ["LSP reactor", "LSP reactor"])
+
+    def test_watches_pipe(self):
+        reactor = Reactor()
+        read_fd, write_fd = os.pipe()
+        received = []  # type: List[bytes]
+
+        def on_readable():
+            received.append(os.read(read_fd, 100))
+            reactor.watch(read_fd, None, None)
+
+        reactor.call_soon(lambda: reactor.watch(read_fd, on_readable, None))
+        os.write(write_fd, b"hello")
+        self.assertTrue(wait_for(lambda: received == [b"hello"]))
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+@unittest.skipUnless(is_reactor_supported(), "needs selectors and non-blocking pipes")
+class ReactorTransportTests(unittest.TestCase):
+
+    def test_tcp_transport_reads_and_writes(self):
+        reactor = Reactor()
+        ours, theirs = socket.socketpair()
+        transport = reactor_tcp_transport(ours, reactor)
+        received = []  # type: List[str]
+        closed = []  # type: List[bool]
+        transport.start(received.append, lambda: closed.append(True))
+
+        theirs.sendall(json_rpc_message("hello") + json_rpc_message("wörld"))
+        self.assertTrue(wait_for(lambda: received == ["hello", "wörld"]))
+
+        big = "x" * (1024 * 1024)
+        transport.send("ping")
+        transport.send(big)
+        expected = json_rpc_message("ping") + json_rpc_message(big)
+        sent = b""
+        while len(sent) < len(expected):
+            sent += theirs.recv(65536)
+        self.assertEqual(sent, expected)
+
+        theirs.close()
+        self.assertTrue(wait_for(lambda: closed == [True]))
+
+    def test_stdio_transport_talks_to_process(self):
+        reactor = Reactor()
+        echo = "import sys\nwhile True:\n    data = sys.stdin.buffer.read1(65536)\n    if not data: break\n" \
+               "    sys.stdout.buffer.write(data)\n    sys.stdout.flush()\n"
+        process = subprocess.Popen([sys.executable, "-c", echo], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        transport = reactor_stdio_transport(process, reactor)
+        received = []  # type: List[str]
+        closed = []  # type: List[bool]
+        transport.start(received.append, lambda: closed.append(True))
+        transport.send("hello")
+        transport.send("world")
+        self.assertTrue(wait_for(lambda: received == ["hello", "world"], 5))
+        assert process.stdin
+        process.stdin.close()
+        self.assertTrue(wait_for(lambda: closed == [True], 5))
+        self.assertTrue(wait_for(lambda: process.poll() is not None, 5))
+
+    def test_stdio_transport_closes_pipes_when_closed(self):
+        reactor = Reactor()
+        process = subprocess.Popen([sys.executable, "-c", "import sys; sys.stdin.read()"],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        stdin, stdout = process.stdin, process.stdout
+        assert stdin and stdout
+        transport = reactor_stdio_transport(process, reactor)
+        transport.start(lambda message: None, lambda: None)
+        transport.close()
+        self.assertTrue(wait_for(lambda: stdin.closed and stdout.closed, 5))
+        # the server sees its input end
+        self.assertTrue(wait_for(lambda: process.poll() is not None, 5))
@@ -0,0 +1,81 @@
+from benchmarks.replay import replay
+from .recording import Recorder, ReplayTransport, read_recording, INBOUND, OUTBOUND
+from .rpc import Client
+from .protocol import Request
+from .types import Settings
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+
+class RecordingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "session.jsonl.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_records_messages_in_order(self):
+        recorder = Recorder(self.path, "pyls")
+        recorder.record(OUTBOUND, '{"id": 1, "method": "initialize"}')
+        recorder.record(INBOUND, '{"id": 1, "result": {}}')
+        recorder.close()
+        recorder.record(INBOUND, '{"method": "late"}')
+        records = list(read_recording(self.path))
+        self.assertEqual([(r["dir"], r["message"], r["server"]) for r in records],
+                         [("out", '{"id": 1, "method": "initialize"}', "pyls"),
+                          ("in", '{"id": 1, "result": {}}', "pyls")])
+        self.assertLessEqual(records[0]["t"], records[1]["t"])
+
+    def test_replays_responses_after_their_requests(self):
+        recorder = Recorder(self.path, "pyls")
+        recorder.record(INBOUND, '{"jsonrpc": "2.0", "id": 1, "result": {"capabilities": {}}}')
+        # after the response, so the replay cannot reach it before the handler is registered
+        recorder.record(INBOUND, '{"jsonrpc": "2.0", "method": "window/logMessage", "params": {"message": "hi"}}')
+        recorder.close()
+
+        transport = ReplayTransport(self.path, speed=0)
+        client = Client(transport, Settings())
+        logged = []
+        results = []
+        closed = threading.Event()
+        client.on_notification("window/logMessage", lambda params: logged.append(params["message"]))
+        client.set_crash_handler(closed.set)
+        # the response is held back until the request it answers was sent
+        self.assertFalse(transport.finished.wait(0.05))
+        client.send_request(Request.initialize({}), lambda result: results.append(result))
+        self.assertTrue(closed.wait(2))
+        self.assertEqual(logged, ["hi"])
+        self.assertEqual(results, [{"capabilities": {}}])
+        self.assertEqual(len(transport.sent), 1)
+
+    def test_replay_tool_handles_every_notification_without_waiting(self):
+        recorder = Recorder(self.path, "pyls")
+        recorder.record(INBOUND, '{"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics", '
+                                 '"params": {"uri": "file:///a.py", "diagnostics": [{"range": {"start": '
+                                 '{"line": 0, "character": 0}, "end": {"line": 0, "character": 1}}, "message": "x"}]}}')
+        recorder.record(INBOUND, '{"jsonrpc": "2.0", "id": 1, "result": {"capabilities": {}}}')
+        recorder.record(INBOUND, '{"jsonrpc": "2.0", "id": 2, "result": null}')
+        recorder.close()
+
+        result = replay(self.path, 0)
+        self.assertEqual(result["updates"], 1)
+        self.assertLess(result["seconds"], ReplayTransport.REQUEST_WAIT)
+
+    def test_paused_transport_replays_on_play(self):
+        recorder = Recorder(self.path, "pyls")
+        recorder.record(INBOUND, '{"jsonrpc": "2.0", "method": "window/logMessage", "params": {"message": "hi"}}')
+        recorder.close()
+
+        transport = ReplayTransport(self.path, speed=0, paused=True)
+        client = Client(transport, Settings())
+        self.assertFalse(transport.finished.wait(0.05))
+        logged = []
+        client.on_notification("window/logMessage", lambda params: logged.append(params["message"]))
+        transport.play()
+        self.assertTrue(transport.finished.wait(2))
+        self.assertEqual(logged, ["hi"])
@@ -0,0 +1,158 @@
+from .resources import (ProcessStat, ResourceMonitor, WatchedProcess, children_are_listed, descendants, is_supported,
+                        parse_stat, read_stat, read_tree_stats, CLOCK_TICKS, LIMIT_SAMPLES, TERMINATE_GRACE)
+import os
+import subprocess
+import sys
+import unittest
+
+try:
+    from typing import Dict, List, Optional
+    assert Dict and List and Optional
+except ImportError:
+    pass
+
+# /proc/<pid>/stat of a process whose command name holds a space and a parenthesis
+STAT = ("4242 (my (server)) S 1000 4242 4242 0 -1 4194304 1501 0 0 0 250 50 0 0 20 0 12 0 "
+        "1234567 1073741824 25600 18446744073709551615 1 1 0 0 0 0 0 4096 0 0 0 0 17 3 0 0 0 0 0")
+
+
+class FakeProcess(object):
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.returncode = None  # type: Optional[int]
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.returncode = -15
+
+
+def stats_of(*stats: ProcessStat) -> 'Dict[int, ProcessStat]':
+    return dict((stat.pid, stat) for stat in stats)
+
+
+class ParseStatTests(unittest.TestCase):
+
+    def test_parses_fields_after_the_command_name(self):
+        stat = parse_stat(STAT)
+        self.assertEqual(stat.pid, 4242)
+        self.assertEqual(stat.ppid, 1000)
+        self.assertEqual(stat.cpu_ticks, 300)
+        self.assertEqual(stat.threads, 12)
+        self.assertEqual(stat.rss_pages, 25600)
+
+    @unittest.skipUnless(is_supported(), "needs /proc")
+    def test_reads_own_process(self):
+        stat = read_stat(os.getpid())
+        assert stat
+        self.assertEqual(stat.pid, os.getpid())
+        self.assertEqual(stat.ppid, os.getppid())
+        self.assertGreater(stat.rss_pages, 0)
+        self.assertGreaterEqual(stat.threads, 1)
+
+    @unittest.skipUnless(is_supported() and children_are_listed(), "needs /proc listing children")
+    def test_reads_only_the_tree_of_a_process(self):
+        child = subprocess.Popen([sys.executable, "-c", "import sys; sys.stdin.read()"], stdin=subprocess.PIPE)
+        try:
+            stats = read_tree_stats([os.getpid()])
+            self.assertEqual(sorted(descendants(os.getpid(), stats)), sorted(stats))
+            self.assertIn(child.pid, stats)
+            self.assertNotIn(os.getppid(), stats)
+        finally:
+            child.communicate(b"")
+
+    def test_finds_descendants(self):
+        stats = stats_of(ProcessStat(1, 0, 0, 1, 1), ProcessStat(10, 1, 0, 1, 1), ProcessStat(11, 10, 0, 1, 1),
+                         ProcessStat(12, 11, 0, 1, 1), ProcessStat(20, 1, 0, 1, 1))
+        self.assertEqual(sorted(descendants(10, stats)), [10, 11, 12])
+        self.assertEqual(descendants(99, stats), [])
+
+
+class WatchedProcessTests(unittest.TestCase):
+
+    def setUp(self):
+        self.reasons = []  # type: List[str]
+        self.watched = WatchedProcess("server", FakeProcess(10), {"rss_mb": 100, "threads": 50},  # type: ignore
+                                      self.reasons.append)
+
+    def sample(self, now: float, rss_mb: int, threads: int = 1, cpu_ticks: int = 0) -> 'Optional[str]':
+        pages = int(rss_mb * 1048576 / 4096)
+        # and a child process using as much, which counts towards the limits as well
+        stats = stats_of(ProcessStat(10, 1, cpu_ticks, threads, pages), ProcessStat(11, 10, 0, threads, pages))
+        return self.watched.update(stats, now)
+
+    def test_sums_descendants(self):
+        self.sample(0, 10, threads=3)
+        sample = self.watched.sample
+        assert sample
+        self.assertEqual(sample.threads, 6)
+        self.assertEqual(sample.processes, 2)
+        self.assertGreater(sample.rss_mb, 0)
+
+    def test_computes_cpu_percent_between_samples(self):
+        self.sample(0, 1)
+        self.sample(2, 1, cpu_ticks=int(CLOCK_TICKS))
+        sample = self.watched.sample
+        assert sample
+        self.assertAlmostEqual(sample.cpu_percent, 50.0)
+
+    def test_lets_a_spike_through(self):
+        self.assertIsNone(self.sample(0, 10))
+        self.assertIsNone(self.sample(1, 1000))
+        self.assertIsNone(self.sample(2, 10))
+        self.assertIsNone(self.sample(3, 1000))
+
+    def test_reports_a_limit_exceeded_on_consecutive_samples(self):
+        reasons = [self.sample(now, 1000, threads=10) for now in range(LIMIT_SAMPLES + 1)]
+        self.assertEqual(reasons[:LIMIT_SAMPLES - 1], [None] * (LIMIT_SAMPLES - 1))
+        reason = reasons[LIMIT_SAMPLES - 1]
+        assert reason
+        self.assertTrue(reason.startswith("rss_mb"))
+        self.assertIsNone(reasons[LIMIT_SAMPLES])  # once
+
+
+class ResourceMonitorTests(unittest.TestCase):
+
+    def test_off_without_interval(self):
+        monitor = ResourceMonitor()
+        monitor.set_interval(0)
+        monitor.watch("server", FakeProcess(os.getpid()), {"threads": 100})  # type: ignore
+        self.assertEqual(monitor.watched(), [])
+
+    @unittest.skipUnless(is_supported(), "needs /proc")
+    def test_samples_processes_without_limits_but_never_acts(self):
+        monitor = ResourceMonitor()
+        monitor.set_interval(3600)
+        reasons = []  # type: List[str]
+        process = FakeProcess(os.getpid())
+        monitor.watch("server", process, {}, reasons.append)  # type: ignore
+        for i in range(LIMIT_SAMPLES + 1):
+            monitor.sample()
+        self.assertIsNotNone(monitor.watched()[0].sample)
+        self.assertIn("server", monitor.format_report())
+        self.assertEqual(reasons, [])
+        self.assertIsNone(process.returncode)
+
+    @unittest.skipUnless(is_supported(), "needs /proc")
+    def test_calls_back_and_terminates_process_over_its_limits(self):
+        monitor = ResourceMonitor()
+        monitor.set_interval(3600)
+        reasons = []  # type: List[str]
+        process = FakeProcess(os.getpid())
+        monitor.watch("server", process, {"threads": 0.5}, reasons.append)  # type: ignore
+        watched = monitor.watched()[0]
+        for i in range(LIMIT_SAMPLES):
+            monitor.sample()
+        self.assertEqual(len(reasons), 1)
+        self.assertTrue(reasons[0].startswith("threads"))
+        self.assertIn("server", monitor.format_report())
+
+        monitor.sample()
+        self.assertIsNone(process.returncode)
+        assert watched.exceeded_at is not None
+        watched.exceeded_at -= TERMINATE_GRACE
+        monitor.sample()
+        self.assertEqual(process.returncode, -15)
+        monitor.sample()
+        self.assertEqual(monitor.watched(), [])
@@ -1,10 +1,14 @@
-from .rpc import (format_request, Client)
-from .transports import Transport
-from .protocol import (Request, Notification)
+from .rpc import (format_request, Client, outbound_routing)
+from .futures import RequestError, CancelledError
+from .dispatch import Dispatcher, DISPATCH_BACKGROUND
+from .metrics import ServerMetrics
+from .transports import Transport, PRIORITY_NORMAL, PRIORITY_INTERACTIVE
+from .protocol import (Request, Notification, ErrorCode)
 from .types import Settings
 from .logging import set_exception_logging
 import unittest
 import json
+import threading
 try:
     from typing import Any, List, Dict, Tuple, Callable, Optional
     assert Any and List and Dict and Tuple and Callable and Optional
@@ -43,6 +47,13 @@ def notify_pong(message):
     return json.dumps(notification)
 
 
+class InlineDispatcher(Dispatcher):
+    """Runs handlers right away, so tests can check their effects after receiving a message."""
+
+    def dispatch(self, priority, callback):
+        callback()
+
+
 class MockTransport(Transport):
     def __init__(self, responder=None):
         self.messages = []  # type: List[str]
@@ -53,7 +64,7 @@ class MockTransport(Transport):
         self.on_closed = on_closed
         self.has_started = True
 
-    def send(self, message):
+    def send(self, message, priority=PRIORITY_NORMAL, uri=None, replaceable=False):
         self.messages.append(message)
         if self.responder:
             self.on_receive(self.responder(message))
@@ -82,7 +93,7 @@ class ClientTest(unittest.TestCase):
     def test_client_request_response(self):
         transport = MockTransport(return_empty_dict_result)
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
         req = Request.initialize(dict())
@@ -95,7 +106,7 @@ class ClientTest(unittest.TestCase):
     def test_client_request_with_none_response(self):
         transport = MockTransport(return_null_result)
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
         req = Request.shutdown()
@@ -108,7 +119,7 @@ class ClientTest(unittest.TestCase):
     def test_client_should_reject_response_when_both_result_and_error_are_present(self):
         transport = MockTransport(lambda x: '{"id": 1, "result": {"key": "value"}, "error": {"message": "oops"}}')
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         req = Request.initialize(dict())
         responses = []
         errors = []
@@ -119,7 +130,7 @@ class ClientTest(unittest.TestCase):
     def test_client_should_reject_response_when_both_result_and_error_keys_are_not_present(self):
         transport = MockTransport(lambda x: '{"id": 1}')
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         req = Request.initialize(dict())
         responses = []
         errors = []
@@ -130,7 +141,7 @@ class ClientTest(unittest.TestCase):
     def test_client_notification(self):
         transport = MockTransport(notify_pong)
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
         pongs = []
@@ -145,7 +156,7 @@ class ClientTest(unittest.TestCase):
     def test_server_request(self):
         transport = MockTransport()
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
         pings = []  # type: List[Tuple[int, Dict[str, Any]]]
@@ -159,7 +170,7 @@ class ClientTest(unittest.TestCase):
     def test_error_response_handler(self):
         transport = MockTransport(return_error)
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
         req = Request.initialize(dict())
@@ -173,7 +184,7 @@ class ClientTest(unittest.TestCase):
     def test_error_display_handler(self):
         transport = MockTransport(return_error)
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
         req = Request.initialize(dict())
@@ -189,7 +200,7 @@ class ClientTest(unittest.TestCase):
         set_exception_logging(False)
         transport = MockTransport(raise_error)
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         errors = []
         client.set_transport_failure_handler(lambda: errors.append(""))
         self.assertTrue(transport.has_started)
@@ -200,10 +211,209 @@ class ClientTest(unittest.TestCase):
         set_exception_logging(False)
         transport = MockTransport(return_empty_dict_result)
         settings = MockSettings()
-        client = Client(transport, settings)
+        client = Client(transport, settings, InlineDispatcher())
         self.assertIsNotNone(client)
         self.assertTrue(transport.has_started)
         req = Request.initialize(dict())
         client.send_request(req, lambda resp: raise_error('handler failed'))
         # exception would fail test if not handled in client
         self.assertEqual(len(client._response_handlers), 0)
+
+    def test_send_request_returns_resolved_future(self):
+        transport = MockTransport(return_empty_dict_result)
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        future = client.send_request(Request.initialize(dict()))
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(0), {})
+
+    def test_error_response_fails_future(self):
+        transport = MockTransport(return_error)
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        displayed = []  # type: List[str]
+        client.set_error_display_handler(lambda err: displayed.append(err))
+        future = client.send_request(Request.initialize(dict()))
+        with self.assertRaises(RequestError):
+            future.result(0)
+        self.assertEqual(future.error(), {"message": "oops"})
+        self.assertEqual(displayed, ["oops"])
+
+    def test_cancelled_request_ignores_late_response(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        responses = []  # type: List[Any]
+        future = client.send_request(Request.initialize(dict()), lambda resp: responses.append(resp))
+        self.assertTrue(future.cancel())
+        self.assertEqual(len(client._response_handlers), 0)
+        transport.receive('{"id": 1, "result": {}}')
+        self.assertEqual(responses, [])
+        with self.assertRaises(CancelledError):
+            future.result(0)
+
+    def test_execute_request_waits_for_response(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        timer = threading.Timer(0.05, lambda: transport.receive('{"id": 1, "result": {"key": "value"}}'))
+        timer.start()
+        self.assertEqual(client.execute_request(Request.initialize(dict()), 2), {"key": "value"})
+
+    def test_execute_request_timeout_cleans_up(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        self.assertIsNone(client.execute_request(Request.initialize(dict()), 0.01))
+        self.assertEqual(len(client._response_handlers), 0)
+
+    def test_request_ids_are_unique_across_threads(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+
+        def send_many():
+            for i in range(200):
+                client.send_request(Request.shutdown())
+
+        threads = [threading.Thread(target=send_many) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = set(json.loads(message)["id"] for message in transport.messages)
+        self.assertEqual(len(ids), 800)
+
+    def test_cancelling_request_notifies_server(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        future = client.send_request(Request.initialize(dict()))
+        future.cancel()
+        self.assertEqual(json.loads(transport.messages[-1]),
+                         {"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": 1}})
+
+    def test_request_with_same_key_supersedes_request_in_flight(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        responses = []  # type: List[Any]
+        first = client.send_request(Request.complete({}), lambda resp: responses.append(("first", resp)),
+                                    supersession_key=("completion", 1))
+        other = client.send_request(Request.complete({}), lambda resp: responses.append(("other", resp)),
+                                    supersession_key=("completion", 2))
+        second = client.send_request(Request.complete({}), lambda resp: responses.append(("second", resp)),
+                                     supersession_key=("completion", 1))
+        self.assertTrue(first.cancelled())
+        self.assertFalse(other.done())
+        cancels = [json.loads(message) for message in transport.messages
+                   if json.loads(message).get("method") == "$/cancelRequest"]
+        self.assertEqual([cancel["params"]["id"] for cancel in cancels], [1])
+
+        transport.receive('{"id": 1, "error": {"code": -32800, "message": "cancelled"}}')
+        transport.receive('{"id": 3, "result": "new"}')
+        transport.receive('{"id": 2, "result": "unrelated"}')
+        self.assertEqual(responses, [("second", "new"), ("other", "unrelated")])
+        self.assertTrue(second.done())
+        self.assertEqual(len(client._response_handlers), 0)
+        self.assertEqual(len(client._superseded_requests), 0)
+
+    def test_request_timeout_fails_request_and_purges_bookkeeping(self):
+        transport = MockTransport()
+        settings = MockSettings()
+        settings.request_timeouts = {"*": 60, "textDocument/completion": 0.01}
+        client = Client(transport, settings, InlineDispatcher())
+        errors = []  # type: List[Any]
+        done = threading.Event()
+
+        def on_error(error):
+            errors.append(error)
+            done.set()
+
+        future = client.send_request(Request.complete({}), lambda resp: None, on_error,
+                                     supersession_key=("completion", 1))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(errors[0]["code"], ErrorCode.RequestTimedOut)
+        with self.assertRaises(RequestError):
+            future.result(0)
+        self.assertEqual(len(client._response_handlers), 0)
+        self.assertEqual(len(client._superseded_requests), 0)
+        self.assertEqual(json.loads(transport.messages[-1])["method"], "$/cancelRequest")
+
+    def test_request_timeouts_per_method(self):
+        settings = MockSettings()
+        settings.request_timeouts = {"*": 60, "initialize": 0, "textDocument/hover": 5}
+        client = Client(MockTransport(), settings, InlineDispatcher())
+        self.assertEqual(client.request_timeout("textDocument/hover"), 5)
+        self.assertEqual(client.request_timeout("textDocument/references"), 60)
+        self.assertIsNone(client.request_timeout("initialize"))
+
+    def test_transport_closed_fails_requests_in_flight(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        errors = []  # type: List[Any]
+        future = client.send_request(Request.hover({}), lambda resp: None, lambda err: errors.append(err))
+        transport.close()
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(future.done())
+        self.assertEqual(len(client._response_handlers), 0)
+
+    def test_routes_interactive_requests_ahead(self):
+        completion = Request.complete({"textDocument": {"uri": "file:///a.py"}}).to_payload(1)
+        self.assertEqual(outbound_routing(completion), (PRIORITY_INTERACTIVE, "file:///a.py", False))
+        did_change = Notification.didChange({"textDocument": {"uri": "file:///a.py", "version": 2},
+                                             "contentChanges": [{"text": "new"}]}).to_payload()
+        self.assertEqual(outbound_routing(did_change), (PRIORITY_NORMAL, "file:///a.py", True))
+        self.assertEqual(outbound_routing(Notification.exit().to_payload()), (PRIORITY_NORMAL, None, False))
+
+    def test_server_request_with_id_after_params(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        requests = []  # type: List[Any]
+        client.on_request("workspace/applyEdit", lambda params, request_id: requests.append((params, request_id)))
+        transport.receive('{"jsonrpc": "2.0", "method": "workspace/applyEdit", "params": {"edit": {}}, "id": 4}')
+        self.assertEqual(requests, [({"edit": {}}, 4)])
+
+    def test_drops_unhandled_notification_undecoded(self):
+        set_exception_logging(False)
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        pings = []  # type: List[Any]
+        client.on_notification("ping", lambda params: pings.append(params))
+        transport.receive('{"jsonrpc": "2.0", "method": "$/progress", "params": {truncated')
+        transport.receive('{"jsonrpc": "2.0", "method": "ping", "params": {"n": 1}}')
+        self.assertEqual(pings, [{"n": 1}])
+
+    def test_handlers_run_off_the_reader_thread(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings())
+        done = threading.Event()
+        threads = []  # type: List[Any]
+        client.on_notification("textDocument/publishDiagnostics", lambda params: None, DISPATCH_BACKGROUND)
+
+        def handle_response(response: 'Any') -> None:
+            threads.append(threading.current_thread())
+            done.set()
+
+        client.send_request(Request.complete({}), handle_response)
+        transport.receive('{"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics", "params": {}}')
+        transport.receive('{"jsonrpc": "2.0", "id": 1, "result": []}')
+        self.assertTrue(done.wait(2))
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_counts_metrics(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        metrics = ServerMetrics("test")
+        client.set_metrics(metrics)
+        client.send_request(Request.hover({}))
+        client.send_request(Request.hover({})).cancel()
+        transport.receive('{"jsonrpc": "2.0", "id": 1, "error": {"code": 1, "message": "oops"}}')
+        transport.receive('{"jsonrpc": "2.0", "method": "window/logMessage", "params": {}}')
+        hover = metrics.methods["textDocument/hover"]
+        self.assertEqual((hover.requests, hover.responses, hover.errors, hover.cancelled, hover.in_flight),
+                         (2, 1, 1, 1, 0))
+        self.assertGreater(hover.bytes_out, 0)
+        self.assertEqual(metrics.methods["$/cancelRequest"].notifications_out, 1)
+        self.assertEqual(metrics.methods["window/logMessage"].notifications_in, 1)
+
+    def test_metrics_count_encoded_bytes(self):
+        transport = MockTransport()
+        client = Client(transport, MockSettings(), InlineDispatcher())
+        metrics = ServerMetrics("test")
+        client.set_metrics(metrics)
+        message = '{"jsonrpc": "2.0", "method": "window/logMessage", "params": {"message": "\u2603"}}'
+        transport.receive(message)
+        self.assertEqual(metrics.methods["window/logMessage"].bytes_in, len(message) + 2)
@@ -2,6 +2,7 @@ from .types import ClientConfig, LanguageConfig, ClientStates, Settings
 from .sessions import create_session, Session
 from .protocol import Request, Notification
 from .logging import debug
+from .futures import Future
 
 import unittest
 import unittest.mock
@@ -36,23 +37,37 @@ class MockClient():
         self.responses = basic_responses
         self._notifications = []  # type: List[Notification]
         self._async_response_callback = async_response
+        self._request_handlers = {}  # type: Dict[str, Callable]
+        self._responses = []  # type: List[Any]
 
-    def send_request(self, request: Request, on_success: 'Callable', on_error: 'Callable' = None) -> None:
+    def send_request(self, request: Request, on_success: 'Callable', on_error: 'Callable' = None,
+                     supersession_key: 'Any' = None) -> Future:
         response = self.responses.get(request.method)
         debug("TEST: responding to", request.method, "with", response)
+        future = Future()
+
+        def respond() -> None:
+            # a cancelled request gets no response, like with a Client
+            if future.set_result(response):
+                on_success(response)
+
         if self._async_response_callback:
-            self._async_response_callback(lambda: on_success(response))
+            self._async_response_callback(respond)
         else:
-            on_success(response)
+            respond()
+        return future
 
     def send_notification(self, notification: Notification) -> None:
         self._notifications.append(notification)
 
-    def on_notification(self, name, handler: 'Callable') -> None:
+    def on_notification(self, name, handler: 'Callable', priority: int = 1) -> None:
         pass
 
     def on_request(self, name, handler: 'Callable') -> None:
-        pass
+        self._request_handlers[name] = handler
+
+    def send_response(self, response: 'Any') -> None:
+        self._responses.append(response)
 
     def set_error_display_handler(self, handler: 'Callable') -> None:
         pass
@@ -148,3 +163,22 @@ class SessionTest(unittest.TestCase):
         self.assertFalse(session.has_capability("testing"))
         self.assertIsNone(session.get_capability("testing"))
         post_exit_callback.assert_called_once()
+
+    def test_counts_windows_with_document_open(self):
+        session = self.assert_if_none(
+            create_session(config=test_config, project_path="/", env=dict(), settings=Settings(),
+                           bootstrap_client=MockClient()))
+        self.assertTrue(session.open_document("file:///a"))
+        self.assertFalse(session.open_document("file:///a"))
+        self.assertFalse(session.close_document("file:///a"))
+        self.assertTrue(session.close_document("file:///a"))
+        self.assertFalse(session.close_document("file:///a"))
+
+    def test_document_versions_only_increase(self):
+        session = self.assert_if_none(
+            create_session(config=test_config, project_path="/", env=dict(), settings=Settings(),
+                           bootstrap_client=MockClient()))
+        self.assertEqual(session.document_version("file:///a", 0), 0)
+        self.assertEqual(session.document_version("file:///a", 5), 5)
+        # another window sharing the session, with a counter of its own
+        self.assertEqual(session.document_version("file:///a", 1), 6)
@@ -0,0 +1,55 @@
+from .protocol import Point
+from .snapshots import Snapshot, SnapshotStore
+import unittest
+
+TEXT = "import os\n\ndef main():\n    print(os.getcwd())\n"
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def test_points_and_offsets(self):
+        counted = Snapshot(0, TEXT)
+        indexed = Snapshot(0, TEXT)
+        self.assertEqual(indexed.line_starts(), [0, 10, 11, 23, 46])
+        for offset in range(len(TEXT) + 1):
+            point = counted.point(offset)
+            self.assertEqual((point.row, point.col), (indexed.point(offset).row, indexed.point(offset).col))
+            self.assertEqual(indexed.offset(point), offset)
+
+    def test_clamps_offsets(self):
+        snapshot = Snapshot(0, TEXT)
+        self.assertEqual(snapshot.offset(Point(0, 100)), 9)
+        self.assertEqual(snapshot.offset(Point(100, 0)), len(TEXT))
+
+
+class SnapshotStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SnapshotStore()
+
+    def test_takes_a_version_per_change(self):
+        first = self.store.take("a.py", TEXT)
+        self.assertEqual(first.version, 0)
+        self.assertIs(self.store.take("a.py", TEXT), first)
+        second = self.store.take("a.py", TEXT + "main()\n")
+        self.assertEqual(second.version, 1)
+        self.assertIs(self.store.latest("a.py"), second)
+        self.assertEqual(self.store.take("b.py", TEXT).version, 0)
+
+    def test_reclaims_snapshots_nothing_holds(self):
+        held = self.store.take("a.py", "1")
+        self.store.take("a.py", "2")
+        self.store.take("a.py", "3")
+        # the latest, and the one still held
+        self.assertEqual(self.store.versions("a.py"), [0, 2])
+        self.assertIs(self.store.get("a.py", 0), held)
+        self.assertIsNone(self.store.get("a.py", 1))
+        del held
+        self.assertEqual(self.store.versions("a.py"), [2])
+
+    def test_forgets_closed_documents(self):
+        self.store.take("a.py", TEXT)
+        self.store.forget("a.py")
+        self.assertIsNone(self.store.latest("a.py"))
+        self.assertEqual(self.store.versions("a.py"), [])
+        self.assertEqual(self.store.take("a.py", TEXT).version, 0)
@@ -0,0 +1,100 @@
+from .protocol import TextDocumentSyncKindFull, TextDocumentSyncKindIncremental
+from .sync import apply_content_changes, content_change, sync_kind, BLOCK_SIZE
+import random
+import unittest
+
+try:
+    from typing import List
+    assert List
+except ImportError:
+    pass
+
+TEXT = "import os\n\ndef main():\n    print(os.getcwd())\n"
+
+
+class SyncKindTests(unittest.TestCase):
+
+    def test_reads_number_and_options(self):
+        self.assertEqual(sync_kind({"textDocumentSync": 2}), TextDocumentSyncKindIncremental)
+        self.assertEqual(sync_kind({"textDocumentSync": {"openClose": True, "change": 2}}),
+                         TextDocumentSyncKindIncremental)
+        self.assertEqual(sync_kind({"textDocumentSync": 1}), TextDocumentSyncKindFull)
+        self.assertEqual(sync_kind({"textDocumentSync": {"openClose": True}}), TextDocumentSyncKindFull)
+        self.assertEqual(sync_kind({}), TextDocumentSyncKindFull)
+
+
+class ContentChangeTests(unittest.TestCase):
+
+    def assert_reconstructs(self, old: str, new: str) -> None:
+        change = content_change(old, new)
+        assert change
+        rebuilt = apply_content_changes(old, [change.to_lsp()])
+        self.assertEqual(rebuilt.encode("UTF-8"), new.encode("UTF-8"))
+
+    def test_nothing_changed(self):
+        self.assertIsNone(content_change(TEXT, TEXT))
+
+    def test_sends_the_replaced_range(self):
+        new = TEXT.replace("getcwd", "getpid")
+        change = content_change(TEXT, new)
+        assert change
+        self.assertEqual(change.to_lsp(), {
+            "text": "pi",
+            "range": {"start": {"line": 3, "character": 16}, "end": {"line": 3, "character": 18}}
+        })
+        self.assert_reconstructs(TEXT, new)
+
+    def test_insert_and_delete(self):
+        self.assert_reconstructs(TEXT, TEXT + "main()\n")
+        self.assert_reconstructs(TEXT, "# start\n" + TEXT)
+        self.assert_reconstructs(TEXT, TEXT.replace("\n\n", "\n"))
+        self.assert_reconstructs("a\n", "")
+        # repeated characters, where the prefix and suffix could overlap
+        self.assert_reconstructs("aaaa", "aaaaaa")
+        self.assert_reconstructs("aaaaaa", "aaaa")
+
+    def test_full_text_without_previous_text(self):
+        change = content_change(None, TEXT)
+        assert change
+        self.assertEqual(change.to_lsp(), {"text": TEXT})
+
+    def test_full_text_for_large_changes(self):
+        change = content_change(TEXT, "x")
+        assert change
+        self.assertEqual(change.to_lsp(), {"text": "x"})
+
+    def test_full_text_where_servers_count_differently(self):
+        # a character outside the BMP before the change on its line is two characters in UTF-16
+        old = "smile \U0001F600 here\n" + TEXT
+        change = content_change(old, old.replace("here", "there"))
+        assert change
+        self.assertNotIn("range", change.to_lsp())
+        # but fine on an earlier line
+        change = content_change(old, old.replace("getcwd", "getpid"))
+        assert change
+        self.assertIn("range", change.to_lsp())
+        # and a carriage return makes another line break
+        old = "a\rb\n" + TEXT
+        change = content_change(old, old.replace("getcwd", "getpid"))
+        assert change
+        self.assertNotIn("range", change.to_lsp())
+
+    def test_across_blocks(self):
+        old = "x" * (3 * BLOCK_SIZE + 7)
+        self.assert_reconstructs(old, old[:BLOCK_SIZE + 3] + "y\n" + old[BLOCK_SIZE + 3:])
+        self.assert_reconstructs(old, old[:2 * BLOCK_SIZE] + old[2 * BLOCK_SIZE + 1:])
+
+    def test_random_edits_reconstruct_the_buffer(self):
+        rng = random.Random(23)
+        alphabet = "ab \n\tüé€中"  # all within the BMP
+        buffer = "".join(rng.choice(alphabet) for i in range(2000))
+        server = buffer
+        for i in range(500):
+            start = rng.randrange(len(buffer) + 1)
+            end = min(len(buffer), start + rng.randrange(20))
+            inserted = "".join(rng.choice(alphabet) for i in range(rng.randrange(20)))
+            buffer = buffer[:start] + inserted + buffer[end:]
+            change = content_change(server, buffer)
+            if change:
+                server = apply_content_changes(server, [change.to_lsp()])
+            self.assertEqual(server.encode("UTF-8"), buffer.encode("UTF-8"))
@@ -1,6 +1,13 @@
 import unittest
 import io
-from .transports import StdioTransport, TCPTransport
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from .transports import (StdioTransport, TCPTransport, FrameParser, SendQueue, take_queued_messages,
+                         PRIORITY_INTERACTIVE, connect_socket)
 import time
 try:
     from typing import List
@@ -10,9 +17,9 @@ except ImportError:
 
 
 def json_rpc_message(payload: str) -> bytes:
-    content_length = len(payload)
+    content = bytes(payload, 'utf-8')
     return b'Content-Length: ' + bytes(
-        str(content_length), 'utf-8') + b'\r\n\r\n' + bytes(payload, 'utf-8')
+        str(len(content)), 'utf-8') + b'\r\n\r\n' + content
 
 
 class FakeProcess(object):
@@ -37,7 +44,7 @@ class FakeProcess(object):
 class FakeSocket(object):
     def __init__(self, received: bytes) -> None:
         self.received = received
-        self.sent = []  # type: List[str]
+        self.sent = []  # type: List[bytes]
         self.index = 0
 
     def recv(self, length: int) -> bytes:
@@ -49,10 +56,62 @@ class FakeSocket(object):
             time.sleep(1)  # simulate blocking for the duration of the test.
             return b''
 
-    def sendall(self, payload: str) -> None:
+    def recv_into(self, buffer: memoryview) -> int:
+        data = self.recv(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def sendall(self, payload: bytes) -> None:
         self.sent.append(payload)
 
 
+class FrameParserTests(unittest.TestCase):
+    def parse_chunks(self, parser, chunks):
+        received = []  # type: List[str]
+        for chunk in chunks:
+            parser.feed(chunk)
+            received.extend(parser.messages())
+        return received
+
+    def test_parses_several_messages_in_one_chunk(self):
+        data = json_rpc_message("hello") + json_rpc_message("world")
+        self.assertEqual(self.parse_chunks(FrameParser(), [data]), ["hello", "world"])
+
+    def test_parses_messages_split_at_every_byte(self):
+        data = json_rpc_message("hello") + json_rpc_message("world")
+        chunks = [data[i:i + 1] for i in range(len(data))]
+        self.assertEqual(self.parse_chunks(FrameParser(), chunks), ["hello", "world"])
+
+    def test_ignores_other_headers(self):
+        data = (b'Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n'
+                b'content-length: 5\r\n\r\nhello')
+        self.assertEqual(self.parse_chunks(FrameParser(), [data]), ["hello"])
+
+    def test_drops_header_block_without_content_length(self):
+        data = json_rpc_message("hello") + b'Content-Type: text/plain\r\n\r\n' + json_rpc_message("world")
+        self.assertEqual(self.parse_chunks(FrameParser(), [data]), ["hello", "world"])
+        chunks = [data[i:i + 1] for i in range(len(data))]
+        self.assertEqual(self.parse_chunks(FrameParser(), chunks), ["hello", "world"])
+
+    def test_content_length_counts_bytes(self):
+        data = json_rpc_message("h\u00e9llo w\u00f6rld \u2603") + json_rpc_message("next")
+        self.assertEqual(self.parse_chunks(FrameParser(), [data[:9], data[9:]]),
+                         ["h\u00e9llo w\u00f6rld \u2603", "next"])
+
+    def test_fills_large_message_with_few_reads(self):
+        payload = "x" * (3 * 1024 * 1024)
+        stream = io.BytesIO(json_rpc_message(payload) + json_rpc_message("tail"))
+        parser = FrameParser()
+        received = []  # type: List[str]
+        reads = 0
+        while parser.fill(stream.readinto):
+            reads += 1
+            received.extend(parser.messages())
+        self.assertEqual(received, [payload, "tail"])
+        self.assertLess(reads, 5)
+        self.assertEqual(parser.pending(), 0)
+
+
 class StdioTransportTests(unittest.TestCase):
     def test_read_messages(self):
 
@@ -92,6 +151,25 @@ class StdioTransportTests(unittest.TestCase):
         self.assertEqual(process.stdin.getvalue(), json_rpc_message("hello") + json_rpc_message("world"))
         t.close()
 
+    def test_write_non_ascii_message(self):
+        process = FakeProcess()
+        t = StdioTransport(process)  # type: ignore
+        t.start(lambda msg: None, lambda: None)
+        t.send("h\u00e9llo \u2603")
+        time.sleep(0.01)
+        self.assertEqual(process.stdin.getvalue(), b'Content-Length: 10\r\n\r\nh\xc3\xa9llo \xe2\x98\x83')
+        t.close()
+
+    def test_writes_queued_messages_in_one_batch(self):
+        process = FakeProcess()
+        t = StdioTransport(process)  # type: ignore
+        t.send("hello")
+        t.send("world")
+        t.send_queue.close()
+        data, closed = take_queued_messages(t.send_queue)
+        self.assertEqual(data, json_rpc_message("hello") + json_rpc_message("world"))
+        self.assertTrue(closed)
+
 
 class TCPTransportTests(unittest.TestCase):
     def test_read_messages(self):
@@ -128,5 +206,116 @@ class TCPTransportTests(unittest.TestCase):
         t.send("hello")
         t.send("world")
         time.sleep(0.1)
-        self.assertEqual(sock.sent, [json_rpc_message("hello"), json_rpc_message("world")])
+        self.assertEqual(b''.join(sock.sent), json_rpc_message("hello") + json_rpc_message("world"))
         t.close()
+
+
+class ConnectSocketTests(unittest.TestCase):
+    def listen_later(self, family, address, delay):
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+
+        def listen():
+            time.sleep(delay)
+            listener.bind(address)
+            listener.listen(1)
+
+        thread = threading.Thread(target=listen)
+        thread.start()
+        self.addCleanup(thread.join)
+        return listener
+
+    def free_port(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            return sock.getsockname()[1]
+
+    def test_connects_once_server_listens(self):
+        port = self.free_port()
+        self.listen_later(socket.AF_INET, ("localhost", port), 0.1)
+        sock = connect_socket(socket.AF_INET, ("localhost", port), timeout=5)
+        self.assertEqual(sock.getpeername()[1], port)
+        sock.close()
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+    def test_connects_to_unix_socket_once_created(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "server.sock")
+            self.listen_later(socket.AF_UNIX, path, 0.1)
+            sock = connect_socket(socket.AF_UNIX, path, timeout=5)
+            sock.close()
+
+    @unittest.skipUnless(socket.has_ipv6, "needs IPv6")
+    def test_connects_over_ipv6(self):
+        try:
+            listener = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+            listener.bind(("::1", 0))
+        except OSError:
+            self.skipTest("no IPv6 loopback")
+        listener.listen(1)
+        port = listener.getsockname()[1]
+        sock = connect_socket(socket.AF_INET, ("::1", port), timeout=5)
+        self.assertEqual(sock.getpeername()[1], port)
+        sock.close()
+        listener.close()
+
+    def test_host_that_does_not_resolve_times_out(self):
+        with self.assertRaises(ConnectionError):
+            connect_socket(socket.AF_INET, ("lsp-test.invalid", 2087), timeout=0.2)
+
+    def test_times_out(self):
+        start = time.monotonic()
+        with self.assertRaises(ConnectionError):
+            connect_socket(socket.AF_INET, ("localhost", self.free_port()), timeout=0.2)
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_gives_up_once_process_exits(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        start = time.monotonic()
+        with self.assertRaises(ConnectionError) as context:
+            connect_socket(socket.AF_INET, ("localhost", self.free_port()), process, timeout=30)
+        self.assertIn("exited with code 0", str(context.exception))
+        self.assertLess(time.monotonic() - start, 10)
+
+
+class SendQueueTests(unittest.TestCase):
+    def test_interactive_messages_go_first(self):
+        queue = SendQueue()
+        queue.put(b"change b", uri="b")
+        queue.put(b"completion a", PRIORITY_INTERACTIVE, uri="a")
+        self.assertEqual(queue.take(), ([b"completion a", b"change b"], False))
+
+    def test_interactive_message_keeps_order_within_document(self):
+        queue = SendQueue()
+        queue.put(b"change a", uri="a")
+        queue.put(b"change b", uri="b")
+        queue.put(b"completion a", PRIORITY_INTERACTIVE, uri="a")
+        self.assertEqual(queue.take()[0], [b"change a", b"completion a", b"change b"])
+
+    def test_nothing_overtakes_message_without_document(self):
+        queue = SendQueue()
+        queue.put(b"configuration")
+        queue.put(b"completion a", PRIORITY_INTERACTIVE, uri="a")
+        self.assertEqual(queue.take()[0], [b"configuration", b"completion a"])
+
+    def test_replaces_queued_full_text_change(self):
+        queue = SendQueue()
+        queue.put(b"change a 1", uri="a", replaceable=True)
+        queue.put(b"change b 1", uri="b", replaceable=True)
+        queue.put(b"change a 2", uri="a", replaceable=True)
+        self.assertEqual(queue.take()[0], [b"change b 1", b"change a 2"])
+
+    def test_does_not_replace_change_across_other_message(self):
+        queue = SendQueue()
+        queue.put(b"change a 1", uri="a", replaceable=True)
+        queue.put(b"save a", uri="a")
+        queue.put(b"change a 2", uri="a", replaceable=True)
+        self.assertEqual(queue.take()[0], [b"change a 1", b"save a", b"change a 2"])
+
+    def test_take_returns_queued_messages_once_closed(self):
+        queue = SendQueue()
+        queue.put(b"exit")
+        queue.close()
+        queue.put(b"late")
+        self.assertEqual(queue.take(), ([b"exit"], True))
+        self.assertEqual(queue.take(block=False), ([], True))
@@ -1,14 +1,16 @@
-from .windows import WindowManager, WindowRegistry, ViewLike
+from .windows import WindowManager, WindowRegistry, SharedSessions, ViewLike
 from .diagnostics import WindowDiagnostics
 from .sessions import create_session, Session
 from .test_session import MockClient, test_config, test_language
 from .test_rpc import MockSettings
 from .events import global_events
+from .metrics import metrics
 from .types import ClientConfig, LanguageConfig
 from . import test_sublime as test_sublime
 # from .logging import set_debug_logging, debug
 import os
 import tempfile
+import threading
 import unittest
 
 try:
@@ -73,12 +75,14 @@ class MockHandlerDispatcher(object):
     def __init__(self, can_start: bool = True) -> None:
         self._can_start = can_start
         self._initialized = set()  # type: Set[str]
+        self.initialized_windows = []  # type: List[Any]
 
     def on_start(self, config_name: str, window) -> bool:
         return self._can_start
 
     def on_initialized(self, config_name: str, window, client):
         self._initialized.add(config_name)
+        self.initialized_windows.append(window)
 
 
 class MockWindow(object):
@@ -217,6 +221,9 @@ class MockDocuments(object):
     def reset(self):
         self._documents = []
 
+    def snapshot(self, path: str) -> None:
+        return None
+
 
 class TestDocumentHandlerFactory(object):
     def for_window(self, window, configs):
@@ -318,6 +325,18 @@ class WindowManagerTests(unittest.TestCase):
         # our starting document must be loaded
         self.assertListEqual(docs._documents, [__file__])
 
+    def test_restarts_do_not_add_view_close_listeners(self):
+        global_events.reset()
+        wm = WindowManager(MockWindow([[MockView(__file__)]]), MockConfigs(), MockDocuments(),
+                           WindowDiagnostics(), mock_start_session, test_sublime, MockHandlerDispatcher())
+        wm.start_active_views()
+        for i in range(3):
+            wm.restart_sessions()
+        self.assertIsNotNone(wm.get_session(test_config.name))
+        self.assertEqual(len(global_events._listener_dict["view.on_close"]), 1)
+        wm.end_sessions()
+        self.assertEqual(global_events._listener_dict["view.on_close"], [])
+
     def test_ends_sessions_when_closed(self):
         global_events.reset()
         docs = MockDocuments()
@@ -367,27 +386,59 @@ class WindowManagerTests(unittest.TestCase):
         # don't forget to check or we'll keep restarting sessions!
         self.assertEqual(wm._project_path, new_project_path)
 
-    def test_offers_restart_on_crash(self):
+    def test_restarts_crashed_session(self):
         docs = MockDocuments()
         wm = WindowManager(MockWindow([[MockView(__file__)]]), MockConfigs(), docs,
                            WindowDiagnostics(), mock_start_session, test_sublime,
                            MockHandlerDispatcher())
         wm.start_active_views()
-
-        # session must be started (todo: verify session is ready)
-        self.assertIsNotNone(wm.get_session(test_config.name))
-
-        # our starting document must be loaded
-        self.assertListEqual(docs._documents, [__file__])
+        session = wm.get_session(test_config.name)
+        assert session
 
         wm._handle_server_crash(test_config)
+        test_sublime._run_timeout()
 
-        # session must be started (todo: verify session is ready)
-        self.assertIsNotNone(wm.get_session(test_config.name))
+        # ended at once, started again after the backoff
+        self.assertIsNone(wm.get_session(test_config.name))
+        test_sublime._run_timeout()
+        restarted = wm.get_session(test_config.name)
+        self.assertIsNotNone(restarted)
+        self.assertIsNot(restarted, session)
 
         # our starting document must be loaded
         self.assertListEqual(docs._documents, [__file__])
 
+    def test_backs_off_and_asks_after_crash_loop(self):
+        settings = MockSettings()
+        settings.crash_restart_limit = 2
+        wm = WindowManager(MockWindow([[MockView(__file__)]]), MockConfigs(), MockDocuments(),
+                           WindowDiagnostics(), mock_start_session, test_sublime,
+                           MockHandlerDispatcher(), settings=settings)
+        wm.start_active_views()
+        delays = []
+        original = test_sublime.set_timeout_async
+
+        def set_timeout_async(callback, duration):
+            delays.append(duration)
+            original(callback, duration)
+
+        test_sublime.set_timeout_async = set_timeout_async
+        try:
+            for crash in range(2):
+                wm._handle_server_crash(test_config)
+                test_sublime._run_timeout()
+                test_sublime._run_timeout()
+                self.assertIsNotNone(wm.get_session(test_config.name))
+            self.assertEqual(delays, [0, 1000, 0, 2000])
+
+            # the third crash asks, test_sublime says yes
+            wm._handle_server_crash(test_config)
+            test_sublime._run_timeout()
+            self.assertIsNotNone(wm.get_session(test_config.name))
+            self.assertNotIn(test_config.name, wm._crashes)
+        finally:
+            test_sublime.set_timeout_async = original
+
     def test_invokes_language_handler(self):
         docs = MockDocuments()
         dispatcher = MockHandlerDispatcher()
@@ -404,3 +455,172 @@ class WindowManagerTests(unittest.TestCase):
 
         # client_start_listeners, client_initialization_listeners,
         self.assertTrue(test_config.name in dispatcher._initialized)
+
+    def test_starts_sessions_in_the_background(self):
+        docs = MockDocuments()
+        tasks = []  # type: List[Callable[[], None]]
+        wm = WindowManager(MockWindow([[MockView(__file__)]]), MockConfigs(), docs,
+                           WindowDiagnostics(), mock_start_session, test_sublime, MockHandlerDispatcher(),
+                           start_async=tasks.append)
+        wm.start_active_views()
+        wm.activate_view(MockView(__file__))
+        self.assertEqual(len(tasks), 1)
+        self.assertIsNone(wm.get_session(test_config.name))
+
+        tasks[0]()
+        self.assertIsNotNone(wm.get_session(test_config.name))
+        self.assertListEqual(docs._documents, [__file__])
+
+    def test_restarts_session_over_its_resource_limits(self):
+        docs = MockDocuments()
+        wm = WindowManager(MockWindow([[MockView(__file__)]]), MockConfigs(), docs,
+                           WindowDiagnostics(), mock_start_session, test_sublime, MockHandlerDispatcher())
+        wm.start_active_views()
+        session = wm.get_session(test_config.name)
+        assert session
+
+        session.handle_resource_limit("rss_mb 5000 over the limit of 4096")
+        test_sublime._run_timeout()
+
+        self.assertIsNone(session.client)
+        restarted = wm.get_session(test_config.name)
+        self.assertIsNotNone(restarted)
+        self.assertIsNot(restarted, session)
+        self.assertIs(docs._sessions[test_config.name], restarted)
+
+
+class SharedSessionsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.started = 0
+        self.shared = SharedSessions()
+
+    def start_session(self, **kwargs):
+        self.started += 1
+        return mock_start_session(**kwargs)
+
+    def window_manager(self, docs):
+        return WindowManager(MockWindow([[MockView(__file__)]]), MockConfigs(), docs, WindowDiagnostics(),
+                             self.start_session, test_sublime, MockHandlerDispatcher(), shared_sessions=self.shared)
+
+    def test_windows_with_the_same_project_share_a_session(self):
+        docs1, docs2 = MockDocuments(), MockDocuments()
+        wm1, wm2 = self.window_manager(docs1), self.window_manager(docs2)
+        wm1.start_active_views()
+        wm2.start_active_views()
+        session = wm1.get_session(test_config.name)
+        self.assertIsNotNone(session)
+        self.assertIs(wm2.get_session(test_config.name), session)
+        self.assertEqual(self.started, 1)
+        self.assertIs(docs1._sessions[test_config.name], session)
+        self.assertIs(docs2._sessions[test_config.name], session)
+        self.assertEqual(self.shared.sharing_count(test_config.name, os.path.dirname(__file__)), 2)
+
+    def test_last_window_ends_the_session(self):
+        docs1, docs2 = MockDocuments(), MockDocuments()
+        wm1, wm2 = self.window_manager(docs1), self.window_manager(docs2)
+        wm1.start_active_views()
+        wm2.start_active_views()
+        session = wm1.get_session(test_config.name)
+
+        wm1.end_sessions()
+        self.assertIsNone(wm1.get_session(test_config.name))
+        self.assertEqual(docs1._sessions, {})
+        self.assertIsNotNone(session.client)
+        self.assertIs(wm2.get_session(test_config.name), session)
+
+        wm2.end_sessions()
+        self.assertIsNone(session.client)
+        self.assertIsNone(wm2.get_session(test_config.name))
+        self.assertEqual(self.shared.sharing_count(test_config.name, os.path.dirname(__file__)), 0)
+
+    def test_next_window_handles_requests_once_the_starting_one_closes(self):
+        docs1, docs2 = MockDocuments(), MockDocuments()
+        wm1, wm2 = self.window_manager(docs1), self.window_manager(docs2)
+        wm1.start_active_views()
+        wm2.start_active_views()
+        session = wm1.get_session(test_config.name)
+        self.assertEqual(wm2._handlers.initialized_windows, [])
+
+        wm1.end_sessions()
+        self.assertEqual(wm2._handlers.initialized_windows, [wm2._window])
+        session.client._request_handlers["workspace/applyEdit"]({"edit": {}}, 1)
+        self.assertEqual(wm1._window.commands, [])
+        self.assertEqual([command for command, args in wm2._window.commands], ["lsp_apply_workspace_edit"])
+        self.assertEqual(len(session.client._responses), 1)
+
+    def test_first_window_restarts_session_over_its_resource_limits(self):
+        docs1, docs2 = MockDocuments(), MockDocuments()
+        wm1, wm2 = self.window_manager(docs1), self.window_manager(docs2)
+        wm1.start_active_views()
+        wm2.start_active_views()
+        session = wm1.get_session(test_config.name)
+        assert session
+
+        session.handle_resource_limit("threads 900 over the limit of 500")
+        test_sublime._run_timeout()
+
+        self.assertIsNone(session.client)
+        self.assertEqual(self.started, 2)
+        self.assertIsNotNone(wm1.get_session(test_config.name))
+        self.assertIsNone(wm2.get_session(test_config.name))
+
+    def test_window_waits_for_the_session_another_window_starts(self):
+        starting, release = threading.Event(), threading.Event()
+
+        def start_session(**kwargs):
+            starting.set()
+            release.wait(5)
+            return self.start_session(**kwargs)
+
+        wm1, wm2 = self.window_manager(MockDocuments()), self.window_manager(MockDocuments())
+        wm1._start_session = wm2._start_session = start_session
+        first = threading.Thread(target=wm1.start_active_views)
+        first.start()
+        self.assertTrue(starting.wait(5))
+        second = threading.Thread(target=wm2.start_active_views)
+        second.start()
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(self.started, 1)
+        self.assertIsNotNone(wm1.get_session(test_config.name))
+        self.assertIs(wm2.get_session(test_config.name), wm1.get_session(test_config.name))
+
+    def test_window_with_another_project_gets_its_own_session(self):
+        wm1, wm2 = self.window_manager(MockDocuments()), self.window_manager(MockDocuments())
+        wm2._window.set_folders([tempfile.gettempdir()])
+        wm2._project_path = tempfile.gettempdir()
+        wm1.start_active_views()
+        wm2.start_active_views()
+        self.assertEqual(self.started, 2)
+        self.assertIsNot(wm1.get_session(test_config.name), wm2.get_session(test_config.name))
+
+
+class IdleSessionTests(unittest.TestCase):
+
+    def test_ends_idle_session_and_restarts_it_on_activation(self):
+        settings = MockSettings()
+        settings.idle_session_timeout = 60
+        docs = MockDocuments()
+        window = MockWindow([[]])
+        window._default_view.settings().set("syntax", "Unsupported Syntax")
+        wm = WindowManager(window, MockConfigs(), docs, WindowDiagnostics(), mock_start_session, test_sublime,
+                           MockHandlerDispatcher(), settings=settings)
+        server_metrics = metrics.server(test_config.name)
+        hibernations, restarts = server_metrics.hibernations, server_metrics.restarts
+        view = MockView(__file__)
+        wm.activate_view(view)
+        self.assertIsNotNone(wm.get_session(test_config.name))
+
+        wm._check_idle_sessions()
+        self.assertIsNotNone(wm.get_session(test_config.name))
+
+        wm._last_active[test_config.name] -= 61
+        wm._check_idle_sessions()
+        self.assertIsNone(wm.get_session(test_config.name))
+        self.assertEqual(server_metrics.hibernations, hibernations + 1)
+
+        wm.activate_view(view)
+        self.assertIsNotNone(wm.get_session(test_config.name))
+        self.assertEqual(server_metrics.restarts, restarts + 1)
@@ -1,10 +1,14 @@
 from abc import ABCMeta, abstractmethod
+import os
 import threading
 import time
 import socket
-from queue import Queue
+import re
+from collections import deque
+from itertools import islice
 import subprocess
 from .logging import exception_log, debug
+from .reactor import Reactor, set_non_blocking
 
 try:
     from typing import Callable, Dict, Any, Optional
@@ -18,12 +22,16 @@ ContentLengthHeader_len = len(ContentLengthHeader)
 TCP_CONNECT_TIMEOUT = 5
 
 try:
-    from typing import Any, Dict, Callable
-    assert Any and Dict and Callable
+    from typing import Any, Dict, Callable, Iterator, List, Tuple
+    assert Any and Dict and Callable and Iterator and List and Tuple
 except ImportError:
     pass
 
 
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+
+
 class Transport(object, metaclass=ABCMeta):
     @abstractmethod
     def __init__(self) -> None:
@@ -34,7 +42,11 @@ class Transport(object, metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def send(self, message: str) -> None:
+    def send(self, message: str, priority: int = PRIORITY_NORMAL, uri: 'Optional[str]' = None,
+             replaceable: bool = False) -> None:
+        """
+        Queues a message for the server. See SendQueue for what priority, uri and replaceable mean.
+        """
         pass
 
 
@@ -48,34 +60,348 @@ StateStrings = {STATE_HEADERS: 'STATE_HEADERS',
 
 
 def state_to_string(state: int) -> str:
-    return StateStrings.get(state, '<unknown state: %d>'.format(state))
+    return StateStrings.get(state, '<unknown state: {}>'.format(state))
 
 
-def start_tcp_transport(port: int, host: 'Optional[str]' = None) -> 'Transport':
-    start_time = time.time()
-    debug('connecting to {}:{}'.format(host or "localhost", port))
+HEADERS_SEPARATOR = b"\r\n\r\n"
+CONTENT_LENGTH_PATTERN = re.compile(b"Content-Length:[ \t]*([0-9]+)", re.IGNORECASE)
+LATER_CONTENT_LENGTH_PATTERN = re.compile(b"\r\nContent-Length:[ \t]*([0-9]+)", re.IGNORECASE)
+MIN_READ_SIZE = 64 * 1024
+MAX_READ_SIZE = 4 * 1024 * 1024
+MAX_IDLE_BUFFER_SIZE = 2 * MAX_READ_SIZE
+
+
+class FrameParser(object):
+    """
+    Incremental decoder for the "Content-Length" framing used by JSON-RPC over a stream.
+
+    Incoming bytes are read into a single bytearray and complete frames are decoded straight out of it (through a
+    memoryview for large ones), so a message is copied once when read and once when decoded, however many reads it
+    spans.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray(MIN_READ_SIZE)
+        self._start = 0  # first unconsumed byte
+        self._end = 0  # one past the last received byte
+        self._scan = 0  # where to resume looking for the end of the headers
+        self._content_start = -1
+        self._content_length = -1
+        self._read_size = MIN_READ_SIZE
+        self.state = STATE_HEADERS
+
+    def pending(self) -> int:
+        return self._end - self._start
+
+    def next_read_size(self) -> int:
+        """
+        How many bytes the next read should ask for. While a body is being read this is whatever is still missing
+        of it, so large messages arrive in a few large reads. Between messages, the size grows while reads keep
+        filling it.
+        """
+        if self.state == STATE_CONTENT:
+            missing = self._content_start + self._content_length - self._end
+            return max(missing, MIN_READ_SIZE)
+        return self._read_size
 
-    while time.time() - start_time < TCP_CONNECT_TIMEOUT:
+    def fill(self, readinto: 'Callable[[memoryview], Optional[int]]') -> int:
+        """
+        Reads into the buffer with a readinto-style callable and returns the number of bytes read (0 on EOF).
+        """
+        size = self.next_read_size()
+        self._reserve(size)
+        with memoryview(self._buffer) as view:
+            count = readinto(view[self._end:self._end + size]) or 0
+        self._received(count, size)
+        return count
+
+    def feed(self, data: bytes) -> None:
+        count = len(data)
+        self._reserve(count)
+        self._buffer[self._end:self._end + count] = data
+        self._end += count
+
+    def messages(self) -> 'Iterator[str]':
+        """Yields every complete message in the buffer, consuming it."""
+        buffer = self._buffer
+        while True:
+            if self.state == STATE_HEADERS:
+                if not self._parse_headers():
+                    break
+                if self.state == STATE_HEADERS:
+                    continue  # a header block was dropped, look for the next one
+            content_start = self._content_start
+            content_end = content_start + self._content_length
+            if content_end > self._end:
+                break
+            if content_end - content_start < MIN_READ_SIZE:
+                content = buffer[content_start:content_end].decode("UTF-8")
+            else:
+                with memoryview(buffer) as view:
+                    content = str(view[content_start:content_end], "UTF-8")
+            self._start = self._scan = content_end
+            self.state = STATE_HEADERS
+            yield content
+        self._compact()
+
+    def _received(self, count: int, requested: int) -> None:
+        self._end += count
+        if self.state == STATE_HEADERS:
+            if count == requested:
+                self._read_size = min(self._read_size * 2, MAX_READ_SIZE)
+            elif count < requested // 4:
+                self._read_size = max(self._read_size // 2, MIN_READ_SIZE)
+
+    def _parse_headers(self) -> bool:
+        separator = self._buffer.find(HEADERS_SEPARATOR, self._scan, self._end)
+        if separator < 0:
+            self._scan = max(self._start, self._end - len(HEADERS_SEPARATOR) + 1)
+            return False
+        self._content_start = separator + len(HEADERS_SEPARATOR)
+        # Content-Length is nearly always the first header, try that before searching the others.
+        match = CONTENT_LENGTH_PATTERN.match(self._buffer, self._start, separator) or \
+            LATER_CONTENT_LENGTH_PATTERN.search(self._buffer, self._start, separator)
+        if not match:
+            debug("dropping message without Content-Length header")
+            self._consume(self._content_start)
+            self._content_start = -1
+            self._content_length = -1
+            return True
+        self._content_length = int(match.group(1))
+        self.state = STATE_CONTENT
+        return True
+
+    def _consume(self, position: int) -> None:
+        self._start = position
+        self._scan = position
+        self.state = STATE_HEADERS
+
+    def _reserve(self, size: int) -> None:
+        if len(self._buffer) - self._end >= size:
+            return
+        pending = self._end - self._start
+        if self._start > 0:
+            # move the incomplete frame to the front, copying at most one message
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._shift(self._start)
+        if len(self._buffer) - self._end < size:
+            self._buffer.extend(bytearray(pending + size - len(self._buffer)))
+
+    def _compact(self) -> None:
+        if self._start == self._end:
+            self._shift(self._start)
+            if len(self._buffer) > MAX_IDLE_BUFFER_SIZE:
+                # release the memory held on to by a huge message
+                self._buffer = bytearray(MIN_READ_SIZE)
+
+    def _shift(self, offset: int) -> None:
+        self._start -= offset
+        self._end -= offset
+        self._scan = max(self._scan - offset, 0)
+        if self.state == STATE_CONTENT:
+            self._content_start -= offset
+
+
+def stream_readinto(stream: 'Any') -> 'Callable[[memoryview], Optional[int]]':
+    """
+    Buffered readers block in readinto until the view is full, use the unbuffered stream below them instead.
+    """
+    return getattr(stream, 'raw', stream).readinto
+
+
+# seconds between attempts to connect to a server that is still starting, doubling up to the maximum
+CONNECT_BACKOFF_INITIAL = 0.01
+CONNECT_BACKOFF_MAX = 0.5
+
+
+def connect_socket(family: int, address: 'Any', process: 'Optional[subprocess.Popen]' = None,
+                   timeout: float = TCP_CONNECT_TIMEOUT) -> 'socket.socket':
+    """
+    Connects to a server that may still be starting up, waiting longer and longer between attempts. With the process
+    of the server, gives up as soon as it exits instead of trying until timeout. A (host, port) address is looked up
+    on every attempt and each of its addresses tried in turn, IPv6 ones too.
+    """
+    deadline = time.monotonic() + timeout
+    delay = CONNECT_BACKOFF_INITIAL
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            sock = _connect_once(family, address, max(deadline - time.monotonic(), 0.01))
+            debug("connected to", address, "after", attempts, "attempts")
+            return sock
+        except (ConnectionRefusedError, FileNotFoundError, socket.timeout, socket.gaierror) as err:
+            # not listening yet, (for a Unix domain socket) not even created yet, or the host name did not resolve
+            error = err
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ConnectionError("Timeout connecting to {} after {} attempts: {}".format(address, attempts, error))
+        delay = min(delay, remaining)
+        if process:
+            try:
+                returncode = process.wait(delay)
+                raise ConnectionError("Server exited with code {} before accepting connections on {}".format(
+                    returncode, address))
+            except subprocess.TimeoutExpired:
+                pass
+        else:
+            time.sleep(delay)
+        delay = min(delay * 2, CONNECT_BACKOFF_MAX)
+
+
+def _connect_once(family: int, address: 'Any', timeout: float) -> 'socket.socket':
+    if family != getattr(socket, "AF_UNIX", None):
+        sock = socket.create_connection(address, timeout)
+    else:
+        sock = socket.socket(family, socket.SOCK_STREAM)
         try:
-            sock = socket.create_connection((host or "localhost", port))
-            return TCPTransport(sock)
-        except ConnectionRefusedError:
-            pass
+            sock.settimeout(timeout)
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+    sock.settimeout(None)
+    return sock
+
+
+def start_tcp_transport(port: int, host: 'Optional[str]' = None, reactor: 'Optional[Reactor]' = None,
+                        process: 'Optional[subprocess.Popen]' = None) -> 'Transport':
+    debug('connecting to {}:{}'.format(host or "localhost", port))
+    sock = connect_socket(socket.AF_INET, (host or "localhost", port), process)
+    return socket_transport(sock, reactor)
+
+
+def start_unix_transport(path: str, reactor: 'Optional[Reactor]' = None,
+                         process: 'Optional[subprocess.Popen]' = None) -> 'Transport':
+    if not hasattr(socket, "AF_UNIX"):
+        raise ConnectionError("Unix domain sockets are not available on this platform")
+    debug('connecting to', path)
+    sock = connect_socket(socket.AF_UNIX, path, process)  # type: ignore
+    return socket_transport(sock, reactor)
+
+
+def socket_transport(sock: 'socket.socket', reactor: 'Optional[Reactor]' = None) -> 'Transport':
+    if reactor:
+        return reactor_tcp_transport(sock, reactor)
+    return TCPTransport(sock)
+
+
+def build_message(content: str) -> bytes:
+    """Encodes a message body, the header is added when the message is written."""
+    return content.encode("UTF-8")
+
+
+def build_header(body: bytes) -> bytes:
+    return ContentLengthHeader + str(len(body)).encode("ascii") + b"\r\n\r\n"
+
+
+class QueuedMessage(object):
+    __slots__ = ('body', 'uri', 'replaceable')
+
+    def __init__(self, body: 'Optional[bytes]', uri: 'Optional[str]', replaceable: bool) -> None:
+        self.body = body  # None once replaced by a newer message
+        self.uri = uri
+        self.replaceable = replaceable
+
+
+class SendQueue(object):
+    """
+    Messages waiting to be written to the server, in two lanes: interactive messages are written before the others.
+
+    Messages about a document (uri) stay in order with respect to each other: an interactive request takes the
+    messages queued before it for the same document along into the interactive lane. Messages about no document in
+    particular keep their place among all messages, nothing overtakes them.
+
+    A replaceable message, such as a full text didChange, replaces the message queued just before it for the same
+    document if that is replaceable as well, so only the latest text is sent.
+    """
 
-    # process.kill()
-    raise Exception("Timeout connecting to socket")
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._interactive = deque()  # type: deque
+        self._normal = deque()  # type: deque
+        self._latest = {}  # type: Dict[str, QueuedMessage]
+        self._barriers = 0  # messages without a uri in the normal lane
+        self._closed = False
+
+    def put(self, body: bytes, priority: int = PRIORITY_NORMAL, uri: 'Optional[str]' = None,
+            replaceable: bool = False) -> None:
+        message = QueuedMessage(body, uri, replaceable)
+        with self._condition:
+            if self._closed:
+                return
+            if uri is None:
+                self._normal.append(message)
+                self._barriers += 1
+            elif priority == PRIORITY_INTERACTIVE and not self._barriers:
+                if uri in self._latest:
+                    self._promote(uri)
+                self._interactive.append(message)
+            else:
+                previous = self._latest.get(uri)
+                if replaceable and previous and previous.replaceable:
+                    previous.body = None
+                self._normal.append(message)
+                self._latest[uri] = message
+            self._condition.notify()
 
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def take(self, block: bool = True) -> 'Tuple[List[bytes], bool]':
+        """
+        Takes every queued message, waiting for one if block is set and the queue is empty.
+        Returns the message bodies in the order to write them and whether the queue was closed.
+        """
+        with self._condition:
+            while True:
+                bodies = self._drain()
+                if bodies or self._closed or not block:
+                    return bodies, self._closed
+                self._condition.wait()
+
+    def _drain(self) -> 'List[bytes]':
+        bodies = [message.body for message in self._interactive if message.body is not None]
+        self._interactive.clear()
+        for message in self._normal:
+            if message.body is not None:
+                bodies.append(message.body)
+        self._normal.clear()
+        self._latest.clear()
+        self._barriers = 0
+        return bodies
+
+    def _promote(self, uri: str) -> None:
+        remaining = deque()  # type: deque
+        for message in self._normal:
+            if message.uri == uri:
+                if message.body is not None:
+                    self._interactive.append(message)
+            else:
+                remaining.append(message)
+        self._normal = remaining
+        del self._latest[uri]
 
-def build_message(content: str) -> str:
-    content_length = len(content)
-    result = "Content-Length: {}\r\n\r\n{}".format(content_length, content)
-    return result
+
+def take_queued_messages(send_queue: SendQueue) -> 'Tuple[bytes, bool]':
+    """
+    Waits for a message, then takes everything else already queued so it can be written in one go.
+    Returns the framed messages joined into one buffer and whether the queue was closed.
+    """
+    bodies, closed = send_queue.take()
+    chunks = []  # type: List[bytes]
+    for body in bodies:
+        chunks.append(build_header(body))
+        chunks.append(body)
+    return b"".join(chunks), closed
 
 
 class TCPTransport(Transport):
     def __init__(self, socket: 'Any') -> None:
         self.socket = socket  # type: 'Optional[Any]'
-        self.send_queue = Queue()  # type: Queue[Optional[str]]
+        self.send_queue = SendQueue()
 
     def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
         self.on_receive = on_receive
@@ -86,77 +412,49 @@ class TCPTransport(Transport):
         self.write_thread.start()
 
     def close(self) -> None:
-        self.send_queue.put(None)  # kill the write thread as it's blocked on send_queue
+        self.send_queue.close()  # kill the write thread as it's blocked on send_queue
         self.socket = None
         self.on_closed()
 
     def read_socket(self) -> None:
-        remaining_data = b""
-        is_incomplete = False
-        read_state = STATE_HEADERS
-        content_length = 0
+        parser = FrameParser()
         while self.socket:
-            is_incomplete = False
             try:
-                received_data = self.socket.recv(4096)
+                received = parser.fill(self.socket.recv_into)
             except Exception as err:
                 exception_log("Failure reading from socket", err)
                 self.close()
                 break
 
-            if not received_data:
+            if not received:
                 debug("no data received, closing")
                 self.close()
                 break
 
-            data = remaining_data + received_data
-            remaining_data = b""
-
-            while len(data) > 0 and not is_incomplete:
-                if read_state == STATE_HEADERS:
-                    headers, _sep, rest = data.partition(b"\r\n\r\n")
-                    if len(_sep) < 1:
-                        is_incomplete = True
-                        remaining_data = data
-                    else:
-                        for header in headers.split(b"\r\n"):
-                            if header.startswith(ContentLengthHeader):
-                                header_value = header[ContentLengthHeader_len:]
-                                content_length = int(header_value)
-                                read_state = STATE_CONTENT
-                        data = rest
-
-                if read_state == STATE_CONTENT:
-                    # read content bytes
-                    if len(data) >= content_length:
-                        content = data[:content_length]
-                        self.on_receive(content.decode("UTF-8"))
-                        data = data[content_length:]
-                        read_state = STATE_HEADERS
-                    else:
-                        is_incomplete = True
-                        remaining_data = data
-
-    def send(self, content: str) -> None:
-        self.send_queue.put(build_message(content))
+            for message in parser.messages():
+                self.on_receive(message)
+
+    def send(self, content: str, priority: int = PRIORITY_NORMAL, uri: 'Optional[str]' = None,
+             replaceable: bool = False) -> None:
+        self.send_queue.put(build_message(content), priority, uri, replaceable)
 
     def write_socket(self) -> None:
         while self.socket:
-            message = self.send_queue.get()
-            if message is None:
-                break
-            else:
+            data, closed = take_queued_messages(self.send_queue)
+            if data and self.socket:
                 try:
-                    self.socket.sendall(bytes(message, 'UTF-8'))
+                    self.socket.sendall(data)
                 except Exception as err:
                     exception_log("Failure writing to socket", err)
                     self.close()
+            if closed:
+                break
 
 
 class StdioTransport(Transport):
     def __init__(self, process: 'subprocess.Popen') -> None:
         self.process = process  # type: Optional[subprocess.Popen]
-        self.send_queue = Queue()  # type: Queue[Optional[str]]
+        self.send_queue = SendQueue()
 
     def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
         self.on_receive = on_receive
@@ -168,68 +466,208 @@ class StdioTransport(Transport):
 
     def close(self) -> None:
         self.process = None
-        self.send_queue.put(None)  # kill the write thread as it's blocked on send_queue
+        self.send_queue.close()  # kill the write thread as it's blocked on send_queue
         self.on_closed()
 
     def read_stdout(self) -> None:
         """
         Reads JSON responses from process and dispatch them to response_handler
         """
-        running = True
         pid = self.process.pid if self.process else "???"
-        state = STATE_HEADERS
-        content_length = 0
-        while running and self.process and state != STATE_EOF:
-            running = self.process.poll() is None
+        parser = FrameParser()
+        readinto = stream_readinto(self.process.stdout) if self.process else None
+        while self.process and readinto:
             try:
-                # debug("read_stdout: state = {}".format(state_to_string(state)))
-                if state == STATE_HEADERS:
-                    header = self.process.stdout.readline()
-                    # debug('read_stdout reads: {}'.format(header))
-                    if not header:
-                        # Truly, this is the EOF on the stream
-                        state = STATE_EOF
-                        break
-
-                    header = header.strip()
-                    if not header:
-                        # Not EOF, blank line -> content follows
-                        state = STATE_CONTENT
-                    elif header.startswith(ContentLengthHeader):
-                        content_length = int(header[ContentLengthHeader_len:])
-                elif state == STATE_CONTENT:
-                    if content_length > 0:
-                        content = self.process.stdout.read(content_length)
-                        self.on_receive(content.decode("UTF-8"))
-                        # debug("read_stdout: read and received {} byte message".format(content_length))
-                        content_length = 0
-                    state = STATE_HEADERS
-
+                if not parser.fill(readinto):
+                    # Truly, this is the EOF on the stream
+                    parser.state = STATE_EOF
+                    break
+                for message in parser.messages():
+                    self.on_receive(message)
             except IOError as err:
                 self.close()
                 exception_log("Failure reading stdout", err)
-                state = STATE_EOF
                 break
 
         debug("process {} stdout ended {}".format(pid, "(still alive)" if self.process else "(terminated)"))
-        if self.process:
+        process = self.process
+        if process:
             # We use the stdout thread to block and wait on the exiting process, or zombie processes may be the result.
-            returncode = self.process.wait()
+            returncode = process.wait()
             debug("process {} exited with code {}".format(pid, returncode))
+            if returncode is not None and self.process:
+                # also stops the write thread blocked on send_queue
+                self.close()
 
-    def send(self, content: str) -> None:
-        self.send_queue.put(build_message(content))
+    def send(self, content: str, priority: int = PRIORITY_NORMAL, uri: 'Optional[str]' = None,
+             replaceable: bool = False) -> None:
+        self.send_queue.put(build_message(content), priority, uri, replaceable)
 
     def write_stdin(self) -> None:
         while self.process:
-            message = self.send_queue.get()
-            if message is None:
-                break
-            else:
+            data, closed = take_queued_messages(self.send_queue)
+            if data and self.process:
                 try:
-                    msgbytes = bytes(message, 'UTF-8')
-                    self.process.stdin.write(msgbytes)
+                    self.process.stdin.write(data)
                     self.process.stdin.flush()
                 except (BrokenPipeError, OSError) as err:
                     exception_log("Failure writing to stdout", err)
                     self.close()
+            if closed:
+                break
+
+
+MAX_WRITE_CHUNKS = 64  # well below IOV_MAX on every platform
+
+
+class ReactorTransport(Transport):
+    """
+    Non-blocking transport driven by a shared Reactor thread, instead of a reader and a writer thread of its own.
+    """
+
+    def __init__(self, reactor: Reactor, read_fd: int, readinto: 'Callable[[memoryview], int]',
+                 write_fd: int, writev: 'Callable[[List[Any]], int]',
+                 process: 'Optional[subprocess.Popen]' = None, on_close: 'Optional[Callable[[], None]]' = None) -> None:
+        self._reactor = reactor
+        self._read_fd = read_fd
+        self._readinto = readinto
+        self._write_fd = write_fd
+        self._writev = writev
+        self._process = process
+        self._on_close = on_close
+        self._parser = FrameParser()
+        self._send_queue = SendQueue()
+        self._outbox = deque()  # type: deque  # framed chunks taken from _send_queue, being written
+        self._lock = threading.Lock()
+        self._writing = False
+        self._closed = False
+
+    def start(self, on_receive: 'Callable[[str], None]', on_closed: 'Callable[[], None]') -> None:
+        self.on_receive = on_receive
+        self.on_closed = on_closed
+        self._reactor.call_soon(self._update_watches)
+
+    def send(self, content: str, priority: int = PRIORITY_NORMAL, uri: 'Optional[str]' = None,
+             replaceable: bool = False) -> None:
+        body = build_message(content)
+        with self._lock:
+            if self._closed:
+                return
+            self._send_queue.put(body, priority, uri, replaceable)
+            must_watch = not self._writing
+            self._writing = True
+        if must_watch:
+            self._reactor.call_soon(self._update_watches)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._send_queue.close()
+            self._outbox.clear()
+        self._reactor.call_soon(self._release)
+        self.on_closed()
+
+    def _release(self) -> None:
+        self._update_watches()
+        if self._on_close:
+            self._on_close()
+        if self._process:
+            self._reap_process(self._process)
+
+    def _update_watches(self) -> None:
+        on_readable = None if self._closed else self._on_readable
+        on_writable = self._on_writable if self._writing and not self._closed else None
+        if self._read_fd == self._write_fd:
+            self._reactor.watch(self._read_fd, on_readable, on_writable)
+        else:
+            self._reactor.watch(self._read_fd, on_readable, None)
+            self._reactor.watch(self._write_fd, None, on_writable)
+
+    def _on_readable(self) -> None:
+        try:
+            received = self._parser.fill(self._readinto)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as err:
+            exception_log("Failure reading from server", err)
+            self.close()
+            return
+        if not received:
+            debug("no data received, closing")
+            self.close()
+            return
+        for message in self._parser.messages():
+            self.on_receive(message)
+
+    def _on_writable(self) -> None:
+        with self._lock:
+            if not self._outbox:
+                self._fill_outbox()
+            chunks = list(islice(self._outbox, MAX_WRITE_CHUNKS))
+        try:
+            written = self._writev(chunks) if chunks else 0
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as err:
+            exception_log("Failure writing to server", err)
+            self.close()
+            return
+        with self._lock:
+            while written and self._outbox:
+                chunk = self._outbox[0]
+                if len(chunk) <= written:
+                    written -= len(chunk)
+                    self._outbox.popleft()
+                else:
+                    self._outbox[0] = memoryview(chunk)[written:]
+                    written = 0
+            if not self._outbox:
+                # take what was queued meanwhile only now, so interactive messages can still go first
+                self._fill_outbox()
+            if self._outbox:
+                return
+            self._writing = False
+        self._update_watches()
+
+    def _fill_outbox(self) -> None:
+        bodies, _closed = self._send_queue.take(block=False)
+        for body in bodies:
+            self._outbox.append(build_header(body))
+            self._outbox.append(body)
+
+    def _reap_process(self, process: 'subprocess.Popen') -> None:
+        # Never wait on the reactor thread, check back until the process has exited to avoid a zombie.
+        returncode = process.poll()
+        if returncode is None:
+            self._reactor.call_later(1, lambda: self._reap_process(process))
+        else:
+            debug("process {} exited with code {}".format(process.pid, returncode))
+
+
+def reactor_stdio_transport(process: 'subprocess.Popen', reactor: Reactor) -> ReactorTransport:
+    stdout = process.stdout
+    stdin = process.stdin
+    assert stdout is not None and stdin is not None, "the process needs pipes for stdin and stdout"
+    read_fd = stdout.fileno()
+    write_fd = stdin.fileno()
+    set_non_blocking(read_fd)
+    set_non_blocking(write_fd)
+
+    def close_pipes() -> None:
+        for pipe in (stdin, stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass  # the server exited with output left unread
+
+    return ReactorTransport(reactor, read_fd, lambda view: os.readv(read_fd, [view]),
+                            write_fd, lambda chunks: os.writev(write_fd, chunks), process=process,
+                            on_close=close_pipes)
+
+
+def reactor_tcp_transport(sock: 'socket.socket', reactor: Reactor) -> ReactorTransport:
+    sock.setblocking(False)
+    return ReactorTransport(reactor, sock.fileno(), sock.recv_into,
+                            sock.fileno(), sock.sendmsg, on_close=sock.close)
@@ -40,6 +40,25 @@ class Settings(object):
         self.log_server = True
         self.log_stderr = False
         self.log_payloads = False
+        self.log_payloads_limit = 2000
+        self.log_buffer_size = 1000
+        self.transport_reactor = False
+        self.request_timeouts = {
+            "*": 0,
+            "textDocument/hover": 10,
+            "textDocument/completion": 15,
+            "textDocument/references": 300
+        }  # type: Dict[str, float]
+        self.rpc_metrics = False
+        self.rpc_metrics_file = ""
+        self.rpc_metrics_interval = 60
+        self.rpc_recording_dir = ""
+        self.idle_session_timeout = 0
+        self.resource_monitor_interval = 10
+        self.crash_restart_limit = 5
+        self.cache_capabilities = True
+        self.did_change_min_delay = 50
+        self.did_change_max_delay = 2000
 
 
 class ClientStates(object):
@@ -66,11 +85,17 @@ class ClientConfig(object):
     def __init__(self, name: str, binary_args: 'List[str]', tcp_port: 'Optional[int]', scopes: 'List[str]' = [],
                  syntaxes: 'List[str]' = [], languageId: 'Optional[str]' = None,
                  languages: 'List[LanguageConfig]' = [], enabled: bool = True, init_options: dict = dict(),
-                 settings: dict = dict(), env: dict = dict(), tcp_host: 'Optional[str]' = None) -> None:
+                 settings: dict = dict(), env: dict = dict(), tcp_host: 'Optional[str]' = None,
+                 unix_socket: 'Optional[str]' = None, pool_size: int = 0, pool_idle_timeout: float = 600,
+                 resource_limits: 'Dict[str, float]' = dict()) -> None:
         self.name = name
         self.binary_args = binary_args
         self.tcp_port = tcp_port
         self.tcp_host = tcp_host
+        self.unix_socket = unix_socket
+        self.pool_size = pool_size
+        self.pool_idle_timeout = pool_idle_timeout
+        self.resource_limits = resource_limits
         if not languages:
             languages = [LanguageConfig(languageId, scopes, syntaxes)] if languageId else []
         self.languages = languages
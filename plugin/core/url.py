@@ -1,9 +1,13 @@
 from urllib.parse import urljoin
 from urllib.parse import urlparse
-from urllib.request import pathname2url
-from urllib.request import url2pathname
 import os
 
+# what urllib.request uses for these, without the cost of importing it (and http.client, email and ssl with it)
+if os.name == 'nt':
+    from nturl2path import pathname2url, url2pathname  # type: ignore
+else:
+    from urllib.parse import quote as pathname2url, unquote as url2pathname  # type: ignore
+
 
 def filename_to_uri(path: str) -> str:
     return urljoin('file:', pathname2url(path))
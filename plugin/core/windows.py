@@ -4,25 +4,38 @@ from .logging import debug, server_log
 from .types import (ClientStates, ClientConfig, WindowLike, ViewLike,
                     LanguageConfig, config_supports_syntax, ConfigRegistry,
                     GlobalConfigs, Settings)
-from .protocol import Notification, Response
+from .protocol import ContentChange, Notification, Response, TextDocumentSyncKindIncremental
 from .edit import parse_workspace_edit
 from .events import Events
 from .sessions import Session
 from .url import filename_to_uri
 from .workspace import get_project_path, get_active_view_path
 from .rpc import Client
+from .snapshots import Snapshot, SnapshotStore
+from .sync import content_change, sync_kind
+from .dispatch import DISPATCH_BACKGROUND
 import threading
+from time import monotonic
+from .metrics import metrics
 try:
     from typing_extensions import Protocol
-    from typing import Optional, List, Callable, Dict, Any, Iterator, Union
+    from typing import Optional, List, Callable, Dict, Any, Iterator, Union, Tuple, Set
     from types import ModuleType
     assert Optional and List and Callable and Dict and Session and Any and ModuleType and Iterator and Union
+    assert Tuple and Set
     assert LanguageConfig
 except ImportError:
     pass
     Protocol = object  # type: ignore
 
 
+# seconds to wait before restarting a crashed server, doubled for each crash that followed the previous one within
+# CRASH_LOOP_WINDOW seconds
+CRASH_BACKOFF_INITIAL = 1
+CRASH_BACKOFF_MAX = 60
+CRASH_LOOP_WINDOW = 300
+
+
 class SublimeLike(Protocol):
 
     def set_timeout_async(self, f: 'Callable', timeout_ms: int = 0) -> None:
@@ -54,6 +67,9 @@ class DocumentHandler(Protocol):
     def reset(self) -> None:
         ...
 
+    def snapshot(self, path: str) -> 'Optional[Snapshot]':
+        ...
+
 
 def get_active_views(window: WindowLike) -> 'List[ViewLike]':
     views = list()  # type: List[ViewLike]
@@ -69,14 +85,9 @@ def get_active_views(window: WindowLike) -> 'List[ViewLike]':
 
 
 class DocumentState:
-    """Stores version count for documents open in a language service"""
+    """A document of the window synced with language servers, its versions are in the snapshot store"""
     def __init__(self, path: str) -> None:
         self.path = path
-        self.version = 0
-
-    def inc_version(self) -> int:
-        self.version += 1
-        return self.version
 
 
 class DocumentHandlerFactory(object):
@@ -97,8 +108,12 @@ class WindowDocumentHandler(object):
         self._configs = configs
         self._window = window
         self._document_states = dict()  # type: Dict[str, DocumentState]
+        self._snapshots = SnapshotStore()
         self._pending_buffer_changes = dict()  # type: Dict[int, Dict]
+        # the pending version of each buffer the sessions got already, as each waits as long as suits it
+        self._flushed_versions = dict()  # type: Dict[int, Dict[str, int]]
         self._sessions = dict()  # type: Dict[str, Session]
+        self._session_documents = dict()  # type: Dict[str, Set[str]]
         events.subscribe('view.on_load_async', self.handle_view_opened)
         events.subscribe('view.on_activated_async', self.handle_view_opened)
         events.subscribe('view.on_modified', self.handle_view_modified)
@@ -111,13 +126,18 @@ class WindowDocumentHandler(object):
         self._notify_open_documents(session)
 
     def remove_session(self, config_name: str) -> None:
-        if config_name in self._sessions:
-            del self._sessions[config_name]
+        session = self._sessions.pop(config_name, None)
+        file_names = self._session_documents.pop(config_name, set())
+        if session and session.client:
+            # the session lives on in other windows, which may not have these documents open
+            for file_name in file_names:
+                self._close_document(session, file_name)
 
     def reset(self) -> None:
         for view in self._window.views():
             self.detach_view(view)
         self._document_states.clear()
+        self._snapshots.clear()
 
     def get_document_state(self, path: str) -> DocumentState:
         if path not in self._document_states:
@@ -127,6 +147,10 @@ class WindowDocumentHandler(object):
     def has_document_state(self, path: str) -> bool:
         return path in self._document_states
 
+    def snapshot(self, path: str) -> 'Optional[Snapshot]':
+        """The text of path as last sent to the sessions, for features that need it."""
+        return self._snapshots.latest(path)
+
     def _get_applicable_sessions(self, view: ViewLike, notification_type: 'Optional[str]'=None) -> 'List[Session]':
         sessions = []  # type: List[Session]
         syntax = view.settings().get("syntax")
@@ -203,33 +227,56 @@ class WindowDocumentHandler(object):
                     # the document will get synced when a session is added.
                     sessions = self._get_applicable_sessions(view)
                     self._attach_view(view, sessions)
-                    for session in sessions:
-                        if self._session_supports_notification(session, 'openClose'):
-                            self._notify_did_open(view, session)
-
-    def _notify_did_open(self, view: ViewLike, session: Session) -> None:
+                    opening = [session for session in sessions
+                               if self._session_supports_notification(session, 'openClose')]
+                    if opening:
+                        # read once for all of them
+                        snapshot = self._snapshots.take(file_name, view.substr(self._sublime.Region(0, view.size())))
+                        for session in opening:
+                            self._notify_did_open(view, session, snapshot)
+
+    def _notify_did_open(self, view: ViewLike, session: Session, snapshot: 'Optional[Snapshot]' = None) -> None:
         file_name = view.file_name()
         if file_name:
-            ds = self.get_document_state(file_name)
+            opened = self._session_documents.setdefault(session.config.name, set())
+            if file_name in opened:
+                return
+            opened.add(file_name)
+            uri = filename_to_uri(file_name)
+            if not session.open_document(uri):
+                return  # another window sharing the session has it open
+            self.get_document_state(file_name)
+            if snapshot is None:
+                snapshot = self._snapshots.take(file_name, view.substr(self._sublime.Region(0, view.size())))
             params = {
                 "textDocument": {
-                    "uri": filename_to_uri(file_name),
+                    "uri": uri,
                     "languageId": self._view_language(view, session.config.name),
-                    "text": view.substr(self._sublime.Region(0, view.size())),
-                    "version": ds.version
+                    "text": snapshot.text,
+                    "version": session.document_version(uri, snapshot.version)
                 }
             }
+            session.set_document_snapshot(uri, snapshot)
             session.client.send_notification(Notification.didOpen(params))
 
     def handle_view_closed(self, view: ViewLike) -> None:
         file_name = view.file_name()
         if file_name in self._document_states:
             del self._document_states[file_name]
-            for session in self._get_applicable_sessions(view, 'openClose'):
-                debug('closing', file_name, session.config.name)
-                if session.client:
-                    params = {"textDocument": {"uri": filename_to_uri(file_name)}}
-                    session.client.send_notification(Notification.didClose(params))
+            self._snapshots.forget(file_name)
+            for session in self._get_applicable_sessions(view):
+                opened = self._session_documents.get(session.config.name)
+                if opened and file_name in opened:
+                    opened.discard(file_name)
+                    self._close_document(session, file_name)
+
+    def _close_document(self, session: Session, file_name: str) -> None:
+        uri = filename_to_uri(file_name)
+        if session.close_document(uri) and session.client and \
+                self._session_supports_notification(session, 'openClose'):
+            debug('closing', file_name, session.config.name)
+            params = {"textDocument": {"uri": uri}}
+            session.client.send_notification(Notification.didClose(params))
 
     def handle_view_saved(self, view: ViewLike) -> None:
         file_name = view.file_name()
@@ -258,13 +305,29 @@ class WindowDocumentHandler(object):
                     "version": buffer_version
                 }
 
-            self._sublime.set_timeout_async(
-                lambda: self.purge_did_change(buffer_id, buffer_version), 500)
+            file_name = view.file_name()
+            min_delay = self._settings.did_change_min_delay / 1000.0
+            sessions = self._get_applicable_sessions(view, 'change') if file_name else []
+            if not file_name or not sessions:
+                self._schedule_purge(buffer_id, buffer_version, None, min_delay)
+                return
+            uri = filename_to_uri(file_name)
+            for session in sessions:
+                delay = session.change_debounce.edited(uri, view.size(), min_delay,
+                                                       self._settings.did_change_max_delay / 1000.0)
+                self._schedule_purge(buffer_id, buffer_version, session.config.name, delay)
+
+    def _schedule_purge(self, buffer_id: int, buffer_version: int, config_name: 'Optional[str]',
+                        delay: float) -> None:
+        self._sublime.set_timeout_async(
+            lambda: self.purge_did_change(buffer_id, buffer_version, config_name), int(1000 * delay))
 
     def purge_changes(self, view: ViewLike) -> None:
         self.purge_did_change(view.buffer_id())
 
-    def purge_did_change(self, buffer_id: int, buffer_version: 'Optional[int]' = None) -> None:
+    def purge_did_change(self, buffer_id: int, buffer_version: 'Optional[int]' = None,
+                         config_name: 'Optional[str]' = None) -> None:
+        """Sends the pending changes of buffer to the session of config_name, or to all of them."""
         if buffer_id not in self._pending_buffer_changes:
             return
 
@@ -272,38 +335,65 @@ class WindowDocumentHandler(object):
 
         if pending_buffer:
             if buffer_version is None or buffer_version == pending_buffer["version"]:
-                self.notify_did_change(pending_buffer["view"])
+                self.notify_did_change(pending_buffer["view"], config_name)
 
-    def notify_did_change(self, view: ViewLike) -> None:
+    def notify_did_change(self, view: ViewLike, config_name: 'Optional[str]' = None) -> None:
         file_name = view.file_name()
         if file_name and view.window() == self._window:
             # ensure view is opened.
             if not self.has_document_state(file_name):
                 self.handle_view_opened(view)
 
-            if view.buffer_id() in self._pending_buffer_changes:
-                del self._pending_buffer_changes[view.buffer_id()]
-
-                for session in self._get_applicable_sessions(view, 'change'):
+            buffer_id = view.buffer_id()
+            pending_buffer = self._pending_buffer_changes.get(buffer_id)
+            if pending_buffer:
+                version = pending_buffer["version"]
+                flushed = self._flushed_versions.setdefault(buffer_id, {})
+                sessions = self._get_applicable_sessions(view, 'change')
+                snapshot = None  # type: Optional[Snapshot]
+                uri = filename_to_uri(file_name)
+                for session in sessions:
+                    if config_name and session.config.name != config_name:
+                        continue
+                    if flushed.get(session.config.name) == version:
+                        continue
+                    flushed[session.config.name] = version
                     if session.client:
-                        document_state = self.get_document_state(file_name)
-                        uri = filename_to_uri(file_name)
+                        if snapshot is None:
+                            # taken once for all sessions, so they get the same text under the same version
+                            text = view.substr(self._sublime.Region(0, view.size()))
+                            snapshot = self._snapshots.take(file_name, text)
+                        previous = session.document_snapshot(uri)
+                        if previous is snapshot:
+                            continue
+                        session.set_document_snapshot(uri, snapshot)
+                        if sync_kind(session.capabilities) == TextDocumentSyncKindIncremental:
+                            # only what changed since the text the server last got
+                            change = content_change(previous.text if previous else None, snapshot.text)
+                            if not change:
+                                continue
+                        else:
+                            change = ContentChange(snapshot.text)
                         params = {
                             "textDocument": {
                                 "uri": uri,
-                                "version": document_state.inc_version(),
+                                "version": session.document_version(uri, snapshot.version),
                             },
-                            "contentChanges": [{
-                                "text": view.substr(self._sublime.Region(0, view.size()))
-                            }]
+                            "contentChanges": [change.to_lsp()]
                         }
                         session.client.send_notification(Notification.didChange(params))
+                        session.change_debounce.sent(uri)
+                if all(flushed.get(session.config.name) == version for session in sessions):
+                    del self._pending_buffer_changes[buffer_id]
+                    del self._flushed_versions[buffer_id]
 
 
 class WindowManager(object):
     def __init__(self, window: WindowLike, configs: ConfigRegistry, documents: DocumentHandler,
                  diagnostics: WindowDiagnostics, session_starter: 'Callable', sublime: 'Any',
-                 handler_dispatcher: LanguageHandlerListener, on_closed: 'Optional[Callable]' = None) -> None:
+                 handler_dispatcher: LanguageHandlerListener, on_closed: 'Optional[Callable]' = None,
+                 shared_sessions: 'Optional[SharedSessions]' = None, settings: 'Optional[Settings]' = None,
+                 start_async: 'Optional[Callable[[Callable[[], None]], None]]' = None) -> None:
 
         # to move here:
         # configurations.py: window_client_configs and all references
@@ -324,7 +414,17 @@ class WindowManager(object):
                                       DiagnosticsUpdate(self._window, client_name, file_path)))
         self._on_closed = on_closed
         self._is_closing = False
+        self._unsubscribe_view_closed = None  # type: Optional[Callable[[], None]]
         self._initialization_lock = threading.Lock()
+        self._shared_sessions = shared_sessions
+        self._settings = settings or Settings()
+        self._last_active = dict()  # type: Dict[str, float]
+        self._hibernated = dict()  # type: Dict[str, float]
+        self._idle_check_scheduled = False
+        self._restart_after_exit = dict()  # type: Dict[str, Tuple[ClientConfig, float]]
+        self._crashes = dict()  # type: Dict[str, List[float]]
+        self._start_async = start_async
+        self._starting = set()  # type: Set[str]
 
     def get_session(self, config_name: str) -> 'Optional[Session]':
         return self._sessions.get(config_name)
@@ -356,19 +456,44 @@ class WindowManager(object):
         # TODO: we can shortcut here by checking documentstate.
         if self._sessions:
             self._end_old_sessions()
+        if self._settings.idle_session_timeout:
+            now = monotonic()
+            for config in self._configs.syntax_configs(view):
+                self._last_active[config.name] = now
         self._initialize_on_open(view)
 
     def _initialize_on_open(self, view: ViewLike) -> None:
         # have all sessions for this document been started?
-        with self._initialization_lock:
-            startable_configs = filter(lambda c: c.enabled and c.name not in self._sessions,
-                                       self._configs.syntax_configs(view))
-
-            for config in startable_configs:
+        for config in self._configs.syntax_configs(view):
+            if config.enabled and self._request_client(config):
                 debug("window {} requests {} for {}".format(self._window.id(), config.name, view.file_name()))
-                self._start_client(config)
+
+    def _request_client(self, config: ClientConfig) -> bool:
+        """
+        Starts the session of config with start_async, so the sessions of a window start side by side and the caller
+        does not wait for processes to spawn or sockets to connect. False if it is running or starting already.
+
+        Views opened meanwhile are tracked by the document handler, which opens them in the session once it is
+        initialized.
+        """
+        with self._initialization_lock:
+            if config.name in self._sessions or config.name in self._starting:
+                return False
+            self._starting.add(config.name)
+        if self._start_async:
+            self._start_async(lambda: self._start_client(config))
+        else:
+            self._start_client(config)
+        return True
 
     def _start_client(self, config: ClientConfig) -> None:
+        try:
+            self._start_session_of(config)
+        finally:
+            with self._initialization_lock:
+                self._starting.discard(config.name)
+
+    def _start_session_of(self, config: ClientConfig) -> None:
         project_path = self._ensure_project_path()
 
         if project_path is None:
@@ -386,13 +511,16 @@ class WindowManager(object):
         debug("starting in", project_path)
         session = None  # type: Optional[Session]
         try:
-            session = self._start_session(
-                window=self._window,
-                project_path=project_path,
-                config=config,
-                on_pre_initialize=self._handle_pre_initialize,
-                on_post_initialize=self._handle_post_initialize,
-                on_post_exit=self._handle_post_exit)
+            if self._shared_sessions:
+                session = self._shared_sessions.acquire(self, config, project_path)
+            else:
+                session = self._start_session(
+                    window=self._window,
+                    project_path=project_path,
+                    config=config,
+                    on_pre_initialize=self._handle_pre_initialize,
+                    on_post_initialize=self._handle_post_initialize,
+                    on_post_exit=self._handle_post_exit)
         except Exception as e:
             message = "\n\n".join([
                 "Could not start {}",
@@ -406,6 +534,45 @@ class WindowManager(object):
         if session:
             debug("window {} added session {}".format(self._window.id(), config.name))
             self._sessions[config.name] = session
+            self._last_active[config.name] = monotonic()
+            hibernated = self._hibernated.pop(config.name, None)
+            if hibernated is not None:
+                metrics.server(config.name).session_restarted(monotonic() - hibernated)
+            self._schedule_idle_check()
+            if self._is_closing:
+                self.end_session(config.name)  # the window closed while the server started
+
+    def _schedule_idle_check(self) -> None:
+        timeout = self._settings.idle_session_timeout
+        if timeout and not self._idle_check_scheduled:
+            self._idle_check_scheduled = True
+            # often enough to end a session at most a quarter of the timeout late
+            self._sublime.set_timeout_async(self._check_idle_sessions, int(min(timeout / 4, 60) * 1000))
+
+    def _check_idle_sessions(self) -> None:
+        """Ends the sessions no active view in the window needed for idle_session_timeout seconds."""
+        self._idle_check_scheduled = False
+        timeout = self._settings.idle_session_timeout
+        if not timeout or self._is_closing:
+            return
+        now = monotonic()
+        for view in get_active_views(self._window):
+            if view:
+                for config in self._configs.syntax_configs(view):
+                    self._last_active[config.name] = now
+        for config_name, session in list(self._sessions.items()):
+            idle = now - self._last_active.get(config_name, now)
+            if session.state == ClientStates.READY and idle >= timeout:
+                self._hibernate(config_name, idle)
+        if self._sessions:
+            self._schedule_idle_check()
+
+    def _hibernate(self, config_name: str, idle: float) -> None:
+        debug("window {} ends {}, idle for {:.0f}s".format(self._window.id(), config_name, idle))
+        self._hibernated[config_name] = monotonic()
+        metrics.server(config_name).session_hibernated()
+        # the next view of its language starts it again, and opens the documents of the window in it
+        self.end_session(config_name)
 
     def _handle_message_request(self, params: dict, client: Client, request_id: int) -> None:
         actions = params.get("actions", [])
@@ -433,6 +600,8 @@ class WindowManager(object):
 
     def end_session(self, config_name: str) -> None:
         if config_name in self._sessions:
+            if self._shared_sessions and self._shared_sessions.release(self, config_name):
+                return
             debug("unloading session", config_name)
             self._sessions[config_name].end()
 
@@ -477,6 +646,7 @@ class WindowManager(object):
         client = session.client
         client.set_crash_handler(lambda: self._handle_server_crash(session.config))
         client.set_error_display_handler(self._window.status_message)
+        session.set_resource_limit_handler(lambda reason: self._handle_resource_limit(session.config, reason))
 
         client.on_request(
             "window/showMessageRequest",
@@ -488,9 +658,15 @@ class WindowManager(object):
 
         client.on_notification(
             "window/logMessage",
-            lambda params: server_log(session.config.name, params.get("message", "???") if params else "???"))
+            lambda params: server_log(session.config.name, params.get("message", "???") if params else "???"),
+            DISPATCH_BACKGROUND)
 
     def _handle_post_initialize(self, session: 'Session') -> None:
+        self._initialize_client(session)
+        self._attach_session(session)
+
+    def _initialize_client(self, session: 'Session') -> None:
+        """Registers the handlers of an initialized client, once however many windows share it."""
         client = session.client
 
         # handle server requests and notifications
@@ -504,27 +680,36 @@ class WindowManager(object):
 
         client.on_notification(
             "textDocument/publishDiagnostics",
-            lambda params: self._diagnostics.handle_client_diagnostics(session.config.name, params))
+            lambda params: self._handle_diagnostics(session, params),
+            DISPATCH_BACKGROUND)
 
         self._handlers.on_initialized(session.config.name, self._window, client)
 
         client.send_notification(Notification.initialized())
 
-        document_sync = session.capabilities.get("textDocumentSync")
-        if document_sync:
-            self._documents.add_session(session)
-
-        global_events.subscribe('view.on_close', lambda view: self._handle_view_closed(view, session))
-
         if session.config.settings:
             configParams = {
                 'settings': session.config.settings
             }
             client.send_notification(Notification.didChangeConfiguration(configParams))
 
+    def _handle_diagnostics(self, session: Session, params: 'Dict[str, Any]') -> None:
+        session.change_debounce.diagnostics_received(params.get("uri", ""))
+        self._diagnostics.handle_client_diagnostics(session.config.name, params)
+
+    def _attach_session(self, session: 'Session') -> None:
+        """Syncs the documents of this window with an initialized session."""
+        document_sync = session.capabilities.get("textDocumentSync")
+        if document_sync:
+            self._documents.add_session(session)
+
+        # one subscription for the window, however often sessions restart, until they all ended
+        if not self._unsubscribe_view_closed:
+            self._unsubscribe_view_closed = global_events.subscribe('view.on_close', self._handle_view_closed)
+
         self._window.status_message("{} initialized".format(session.config.name))
 
-    def _handle_view_closed(self, view: ViewLike, session: Session) -> None:
+    def _handle_view_closed(self, view: ViewLike) -> None:
         if view.file_name():
             if not self._is_closing:
                 if not self._window.is_valid():
@@ -548,8 +733,12 @@ class WindowManager(object):
 
     def _handle_all_sessions_ended(self) -> None:
         debug('clients for window {} unloaded'.format(self._window.id()))
+        if self._unsubscribe_view_closed:
+            self._unsubscribe_view_closed()
+            self._unsubscribe_view_closed = None
         if self._restarting:
             debug('window {} sessions unloaded - restarting'.format(self._window.id()))
+            self._restarting = False
             self.start_active_views()
         elif not self._window.is_valid():
             debug('window {} closed and sessions unloaded'.format(self._window.id()))
@@ -558,32 +747,230 @@ class WindowManager(object):
 
     def _handle_post_exit(self, config_name: str) -> None:
         self._documents.remove_session(config_name)
-        del self._sessions[config_name]
+        self._sessions.pop(config_name, None)
         for view in self._window.views():
             file_name = view.file_name()
             if file_name:
                 self._diagnostics.remove(file_name, config_name)
 
         debug("session", config_name, "ended")
+        restart = self._restart_after_exit.pop(config_name, None)
+        if restart and not self._is_closing:
+            config, delay = restart
+            if delay:
+                self._sublime.set_timeout_async(lambda: self._restart_client(config), int(delay * 1000))
+            else:
+                self._request_client(config)
         if not self._sessions:
             self._handle_all_sessions_ended()
 
+    def _handle_resource_limit(self, config: ClientConfig, reason: str) -> None:
+        self._sublime.set_timeout_async(lambda: self._restart_session(config, reason), 0)
+
+    def _restart_session(self, config: ClientConfig, reason: str) -> None:
+        """Ends the session of config, leaving the others alone, and starts it again once it exited."""
+        if config.name not in self._sessions or config.name in self._restart_after_exit:
+            return
+        self._window.status_message("Restarting {}: {}".format(config.name, reason))
+        self._restart_after_exit[config.name] = (config, 0)
+        self.end_session(config.name)
+
+    def _restart_client(self, config: ClientConfig) -> None:
+        if not self._is_closing and self._window.is_valid():
+            self._request_client(config)
+
     def _handle_server_crash(self, config: ClientConfig) -> None:
-        msg = "Language server {} has crashed, do you want to restart it?".format(config.name)
-        result = self._sublime.ok_cancel_dialog(msg, ok_title="Restart")
-        if result == self._sublime.DIALOG_YES:
-            self.restart_sessions()
+        self._sublime.set_timeout_async(lambda: self._recover_session(config), 0)
+
+    def _recover_session(self, config: ClientConfig) -> None:
+        """
+        Ends the session of a crashed server and starts it again, leaving the other sessions alone. The documents of
+        the window are opened in the new session with their current text. Each crash within CRASH_LOOP_WINDOW seconds
+        of the previous ones doubles the wait before the restart, and once the server crashed more than
+        crash_restart_limit times in a row the user is asked instead.
+        """
+        if config.name not in self._sessions or config.name in self._restart_after_exit:
+            return
+        metrics.server(config.name).session_crashed()
+        now = monotonic()
+        crashes = [crashed for crashed in self._crashes.get(config.name, []) if now - crashed < CRASH_LOOP_WINDOW]
+        crashes.append(now)
+        self._crashes[config.name] = crashes
+        if len(crashes) > self._settings.crash_restart_limit:
+            self.end_session(config.name)
+            msg = "Language server {} crashed {} times in the last {} minutes, do you want to restart it?".format(
+                config.name, len(crashes), CRASH_LOOP_WINDOW // 60)
+            if self._sublime.ok_cancel_dialog(msg, ok_title="Restart") == self._sublime.DIALOG_YES:
+                self._crashes.pop(config.name, None)
+                self._restart_client(config)
+            return
+        delay = min(CRASH_BACKOFF_INITIAL * 2 ** (len(crashes) - 1), CRASH_BACKOFF_MAX)
+        debug("window {} restarts crashed {} in {}s".format(self._window.id(), config.name, delay))
+        self._window.status_message("{} crashed, restarting it in {}s".format(config.name, delay))
+        self._restart_after_exit[config.name] = (config, delay)
+        self.end_session(config.name)
+
+
+class SharedSession(object):
+    def __init__(self, key: 'Tuple[str, str]', manager: WindowManager) -> None:
+        self.key = key
+        self.starter = manager
+        self.managers = [manager]  # the first one handles the requests of the server
+        self.session = None  # type: Optional[Session]
+        self.started = threading.Event()
+
+
+class SharedSessions(object):
+    """
+    The sessions of all windows, keyed by config name and project path, so windows with the same project share one
+    server. A session is ended once the last window sharing it lets go of it.
+
+    The first window still sharing a session handles its requests, such as workspace/applyEdit: the one that started
+    it, then the one that joined next once that one lets go. Diagnostics go to every window sharing the session.
+    """
+
+    def __init__(self) -> None:
+        self._entries = {}  # type: Dict[Tuple[str, str], SharedSession]
+        self._lock = threading.Lock()
+
+    def acquire(self, manager: WindowManager, config: ClientConfig, project_path: str) -> 'Optional[Session]':
+        """The session of config for project_path, started by manager if no other window has it."""
+        key = (config.name, project_path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry.session:
+                    session = entry.session
+                    if manager not in entry.managers:
+                        debug("window {} shares session {} in {}".format(
+                            manager._window.id(), config.name, project_path))
+                        entry.managers.append(manager)
+                        if session.state == ClientStates.READY:
+                            manager._attach_session(session)
+                    return session
+                if not entry:
+                    entry = SharedSession(key, manager)
+                    self._entries[key] = entry
+                    break
+            # another window is starting the server, share the session once it started (or start it if that failed)
+            entry.started.wait()
+        try:
+            session = manager._start_session(
+                window=manager._window,
+                project_path=project_path,
+                config=config,
+                on_pre_initialize=lambda session: self._handle_pre_initialize(entry, session),
+                on_post_initialize=lambda session: self._handle_post_initialize(entry, session),
+                on_post_exit=lambda config_name: self._handle_post_exit(entry, config_name))
+            if session:
+                entry.session = session
+            else:
+                self._forget(entry)
+        except Exception:
+            self._forget(entry)
+            raise
+        finally:
+            entry.started.set()
+        return session
+
+    def release(self, manager: WindowManager, config_name: str) -> bool:
+        """
+        Lets go of the session of config_name for manager. False if it was the last window sharing the session (or
+        the session crashed), which should end it then.
+        """
+        with self._lock:
+            entry = next((entry for entry in self._entries.values()
+                          if entry.key[0] == config_name and manager in entry.managers), None)
+            if not entry or len(entry.managers) < 2:
+                return False
+            was_first = entry.managers[0] is manager
+            entry.managers.remove(manager)
+            first = entry.managers[0]
+        debug("window {} releases shared session {}".format(manager._window.id(), config_name))
+        manager._handle_post_exit(config_name)
+        session = entry.session
+        if was_first and session and session.client and session.state == ClientStates.READY:
+            # the language handler of the window that takes over the requests gets to know the client
+            first._handlers.on_initialized(config_name, first._window, session.client)
+        return True
+
+    def sharing_count(self, config_name: str, project_path: str) -> int:
+        entry = self._entries.get((config_name, project_path))
+        return len(entry.managers) if entry else 0
+
+    def _forget(self, entry: SharedSession) -> None:
+        with self._lock:
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+
+    def _handle_pre_initialize(self, entry: SharedSession, session: Session) -> None:
+        entry.managers[0]._handle_pre_initialize(session)
+        client = session.client
+        client.set_crash_handler(lambda: self._handle_server_crash(entry, session.config))
+        client.set_error_display_handler(lambda message: self._display_error(entry, message))
+        session.set_resource_limit_handler(lambda reason: self._handle_resource_limit(entry, session.config, reason))
+        # looked up for every request, as the window that started the session may be closed first
+        client.on_request(
+            "window/showMessageRequest",
+            lambda params, request_id: self._first(entry)._handle_message_request(params, client, request_id))
+
+    def _first(self, entry: SharedSession) -> WindowManager:
+        with self._lock:
+            return entry.managers[0] if entry.managers else entry.starter
+
+    def _display_error(self, entry: SharedSession, message: str) -> None:
+        for manager in list(entry.managers):
+            manager._window.status_message(message)
+
+    def _handle_post_initialize(self, entry: SharedSession, session: Session) -> None:
+        entry.managers[0]._initialize_client(session)
+        client = session.client
+        client.on_request(
+            "workspace/applyEdit",
+            lambda params, request_id: self._first(entry)._apply_workspace_edit(params, client, request_id))
+        session.client.on_notification(
+            "textDocument/publishDiagnostics",
+            lambda params: self._handle_diagnostics(entry, session, params),
+            DISPATCH_BACKGROUND)
+        for manager in list(entry.managers):
+            manager._attach_session(session)
+
+    def _handle_diagnostics(self, entry: SharedSession, session: Session, params: 'Dict[str, Any]') -> None:
+        session.change_debounce.diagnostics_received(params.get("uri", ""))
+        for manager in list(entry.managers):
+            manager._diagnostics.handle_client_diagnostics(session.config.name, params)
+
+    def _handle_server_crash(self, entry: SharedSession, config: ClientConfig) -> None:
+        # windows starting the server from now on get a new session, the others end this one with the first window
+        self._forget(entry)
+        entry.managers[0]._handle_server_crash(config)
+
+    def _handle_resource_limit(self, entry: SharedSession, config: ClientConfig, reason: str) -> None:
+        # like a crash, the first window restarts the server, the others start it again with their next view
+        self._forget(entry)
+        entry.managers[0]._handle_resource_limit(config, reason)
+
+    def _handle_post_exit(self, entry: SharedSession, config_name: str) -> None:
+        self._forget(entry)
+        managers, entry.managers = list(entry.managers), []
+        for manager in managers:
+            manager._handle_post_exit(config_name)
 
 
 class WindowRegistry(object):
     def __init__(self, configs: GlobalConfigs, documents: 'Any',
-                 session_starter: 'Callable', sublime: 'Any', handler_dispatcher: LanguageHandlerListener) -> None:
+                 session_starter: 'Callable', sublime: 'Any', handler_dispatcher: LanguageHandlerListener,
+                 settings: 'Optional[Settings]' = None,
+                 start_async: 'Optional[Callable[[Callable[[], None]], None]]' = None) -> None:
         self._windows = {}  # type: Dict[int, WindowManager]
         self._configs = configs
         self._documents = documents
         self._session_starter = session_starter
         self._sublime = sublime
         self._handler_dispatcher = handler_dispatcher
+        self._shared_sessions = SharedSessions()
+        self._settings = settings
+        self._start_async = start_async
 
     def lookup(self, window: 'Any') -> WindowManager:
         state = self._windows.get(window.id())
@@ -591,7 +978,8 @@ class WindowRegistry(object):
             window_configs = self._configs.for_window(window)
             window_documents = self._documents.for_window(window, window_configs)
             state = WindowManager(window, window_configs, window_documents, WindowDiagnostics(), self._session_starter,
-                                  self._sublime, self._handler_dispatcher, lambda: self._on_closed(window))
+                                  self._sublime, self._handler_dispatcher, lambda: self._on_closed(window),
+                                  self._shared_sessions, self._settings, self._start_async)
             self._windows[window.id()] = state
         return state
 
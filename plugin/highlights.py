@@ -3,7 +3,7 @@ import sublime_plugin
 
 from .core.configurations import is_supported_syntax
 from .core.protocol import Request, Range, DocumentHighlightKind
-from .core.registry import session_for_view, client_from_session
+from .core.registry import session_for_view, client_from_session, early_session_for_view
 from .core.documents import get_document_position
 from .core.settings import settings, client_configs
 from .core.views import range_to_region
@@ -55,10 +55,9 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
                 self._queue()
 
     def _initialize(self) -> None:
-        self._initialized = True
-        session = session_for_view(self.view, "documentHighlightProvider")
-        if session:
-            self._enabled = True
+        session, starting = early_session_for_view(self.view, "documentHighlightProvider")
+        self._initialized = not starting
+        self._enabled = session is not None
 
     def _queue(self) -> None:
         current_point = self.view.sel()[0].begin()
@@ -89,7 +88,8 @@ class DocumentHighlightListener(sublime_plugin.ViewEventListener):
                 params = get_document_position(self.view, point)
                 if params:
                     request = Request.documentHighlight(params)
-                    client.send_request(request, self._handle_response)
+                    client.send_request(request, self._handle_response,
+                                        supersession_key=(request.method, self.view.id()))
 
     def _handle_response(self, response: 'Optional[List]') -> None:
         if not response:
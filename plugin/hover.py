@@ -1,4 +1,3 @@
-import mdpopups
 import sublime
 import sublime_plugin
 import webbrowser
@@ -169,11 +168,13 @@ class LspHoverCommand(LspTextCommand):
                 formatted.append(value)
 
         if formatted:
+            import mdpopups  # on first use, loading it takes a good part of plugin startup
             return mdpopups.md2html(self.view, "\n".join(formatted))
 
         return ""
 
     def show_hover(self, point: int, contents: str) -> None:
+        import mdpopups
         mdpopups.show_popup(
             self.view,
             contents,
@@ -0,0 +1,47 @@
+import os
+import time
+import sublime
+import sublime_plugin
+from .core.logging import log_buffer
+
+try:
+    from typing import List, Optional
+    assert List and Optional
+except ImportError:
+    pass
+
+
+class LspDumpLogCommand(sublime_plugin.WindowCommand):
+    """
+    Writes the log buffer of a server, or of all of them, to path (a new file in the cache directory by default) and
+    opens it. Without a server_name, asks which one when there are several.
+    """
+
+    def run(self, server_name: 'Optional[str]' = None, path: 'Optional[str]' = None) -> None:
+        if not log_buffer.capacity:
+            sublime.message_dialog('The log buffer is off, turn it on with the "log_buffer_size" setting.')
+            return
+        names = log_buffer.server_names()
+        if server_name is None and len(names) > 1:
+            self.window.show_quick_panel(["All servers"] + names,
+                                         lambda index: self._on_server_selected(names, index, path))
+            return
+        self._dump(server_name, path)
+
+    def _on_server_selected(self, names: 'List[str]', index: int, path: 'Optional[str]') -> None:
+        if index > -1:
+            self._dump(names[index - 1] if index else None, path)
+
+    def _dump(self, server_name: 'Optional[str]', path: 'Optional[str]') -> None:
+        if not path:
+            directory = os.path.join(sublime.cache_path(), "LSP")
+            os.makedirs(directory, exist_ok=True)
+            name = "".join(c if c.isalnum() else "_" for c in server_name or "servers")
+            path = os.path.join(directory, "{}-{}.log".format(name, time.strftime("%Y%m%d-%H%M%S")))
+        try:
+            count = log_buffer.dump(path, server_name)
+        except OSError as err:
+            sublime.message_dialog("Could not write the log to {}: {}".format(path, err))
+            return
+        self.window.status_message("LSP: wrote {} log records to {}".format(count, path))
+        self.window.open_file(path)
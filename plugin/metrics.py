@@ -0,0 +1,33 @@
+import sublime
+import sublime_plugin
+from .core.metrics import metrics, REPORT_COLUMNS
+from .core.settings import settings
+
+try:
+    from typing import Optional
+    assert Optional
+except ImportError:
+    pass
+
+
+class LspShowRpcMetricsCommand(sublime_plugin.WindowCommand):
+    """Shows the RPC metrics of every server in a new view, sorted on the chosen column."""
+
+    def run(self, sort_by: 'Optional[str]' = None) -> None:
+        if not settings.rpc_metrics:
+            sublime.message_dialog('RPC metrics are off, turn them on with the "rpc_metrics" setting '
+                                   'and restart the language servers.')
+            return
+        if sort_by is None:
+            self.window.show_quick_panel(["Sort by " + column for column in REPORT_COLUMNS], self._on_sort_selected)
+            return
+        view = self.window.new_file()
+        view.set_name("LSP RPC Metrics")
+        view.set_scratch(True)
+        view.settings().set("word_wrap", False)
+        view.run_command("append", {"characters": metrics.format_report(sort_by)})
+        view.set_read_only(True)
+
+    def _on_sort_selected(self, index: int) -> None:
+        if index > -1:
+            self.run(REPORT_COLUMNS[index])
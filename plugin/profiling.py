@@ -0,0 +1,14 @@
+import sublime_plugin
+from .core.profiling import startup_profile
+
+
+class LspShowStartupProfileCommand(sublime_plugin.WindowCommand):
+    """Shows how long the plugin took to load, phase by phase and for the slowest modules it imported."""
+
+    def run(self) -> None:
+        view = self.window.new_file()
+        view.set_name("LSP Startup Profile")
+        view.set_scratch(True)
+        view.settings().set("word_wrap", False)
+        view.run_command("append", {"characters": startup_profile.format_report()})
+        view.set_read_only(True)
@@ -0,0 +1,20 @@
+import sublime
+import sublime_plugin
+from .core.resources import resource_monitor
+from .core.settings import settings
+
+
+class LspShowServerResourcesCommand(sublime_plugin.WindowCommand):
+    """Shows the memory, CPU use and threads of every language server process in a new view."""
+
+    def run(self) -> None:
+        if not settings.resource_monitor_interval:
+            sublime.message_dialog('The resource monitor is off, turn it on with the "resource_monitor_interval" '
+                                   'setting and restart the language servers.')
+            return
+        view = self.window.new_file()
+        view.set_name("LSP Server Resources")
+        view.set_scratch(True)
+        view.settings().set("word_wrap", False)
+        view.run_command("append", {"characters": resource_monitor.format_report()})
+        view.set_read_only(True)
@@ -1,4 +1,3 @@
-import mdpopups
 import sublime
 import html
 import sublime_plugin
@@ -11,7 +10,7 @@ except ImportError:
     pass
 
 from .core.configurations import is_supported_syntax
-from .core.registry import session_for_view, client_from_session
+from .core.registry import session_for_view, client_from_session, early_session_for_view
 from .core.documents import get_document_position
 from .core.events import global_events
 from .core.protocol import Request
@@ -23,10 +22,10 @@ assert SignatureHelp
 
 class ColorSchemeScopeRenderer(object):
     def __init__(self, view: sublime.View) -> None:
+        # styles are looked up on first use, as every view gets a renderer when it opens (all of them when the plugin
+        # loads) and reading them from the color scheme is slow
         self._scope_styles = {}  # type: dict
         self._view = view
-        for scope in ["entity.name.function", "variable.parameter", "punctuation"]:
-            self._scope_styles[scope] = mdpopups.scope2style(view, scope)
 
     def function(self, content: str, escape: bool = True) -> str:
         return self._wrap_with_scope_style(content, "entity.name.function", escape=escape)
@@ -38,9 +37,13 @@ class ColorSchemeScopeRenderer(object):
         return self._wrap_with_scope_style(content, "variable.parameter", emphasize)
 
     def markdown(self, content: str) -> str:
+        import mdpopups
         return mdpopups.md2html(self._view, content)
 
     def _wrap_with_scope_style(self, content: str, scope: str, emphasize: bool = False, escape: bool = True) -> str:
+        if scope not in self._scope_styles:
+            import mdpopups  # not at startup, it is slow to load and only needed once a signature is shown
+            self._scope_styles[scope] = mdpopups.scope2style(self._view, scope)
         color = self._scope_styles[scope]["color"]
         additional_styles = 'font-weight: bold; text-decoration: underline;' if emphasize else ''
         content = html.escape(content, quote=False) if escape else content
@@ -69,7 +72,8 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
             return False
 
     def initialize(self) -> None:
-        session = session_for_view(self.view, 'signatureHelpProvider')
+        session, starting = early_session_for_view(self.view, 'signatureHelpProvider')
+        self._signature_help_triggers = []
         if session:
             signatureHelpProvider = session.get_capability(
                 'signatureHelpProvider')
@@ -77,7 +81,7 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
                 self._signature_help_triggers = signatureHelpProvider.get(
                     'triggerCharacters')
 
-        self._initialized = True
+        self._initialized = not starting
 
     def on_modified_async(self) -> None:
         pos = self.view.sel()[0].begin()
@@ -107,9 +111,11 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
             global_events.publish("view.on_purge_changes", self.view)
             document_position = get_document_position(self.view, point)
             if document_position:
+                request = Request.signatureHelp(document_position)
                 client.send_request(
-                    Request.signatureHelp(document_position),
-                    lambda response: self.handle_response(response, point))
+                    request,
+                    lambda response: self.handle_response(response, point),
+                    supersession_key=(request.method, self.view.id()))
 
     def handle_response(self, response: 'Optional[Dict]', point: int) -> None:
         if self.view.sel()[0].begin() == self.requested_position:
@@ -141,6 +147,7 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
         return False
 
     def _show_popup(self, content: str, point: int) -> None:
+        import mdpopups
         mdpopups.show_popup(self.view,
                             content,
                             css=popup_css,
@@ -154,6 +161,7 @@ class SignatureHelpListener(sublime_plugin.ViewEventListener):
         self._visible = True
 
     def _update_popup(self, content: str) -> None:
+        import mdpopups
         mdpopups.update_popup(self.view,
                               content,
                               css=popup_css,
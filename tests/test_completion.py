@@ -167,6 +167,23 @@ class QueryCompletionsTests(TextDocumentTestCase):
             self.assertEquals(
                 self.view.substr(sublime.Region(0, self.view.size())), 'asdf')
 
+    def test_cancelled_request_does_not_populate_completions(self):
+        yield OPEN_DOCUMENT_DELAY
+        self.client.responses['textDocument/completion'] = label_completions
+
+        handler = self.get_view_event_listener("on_query_completions")
+        self.assertIsNotNone(handler)
+        if handler:
+            handler.on_query_completions("", [1])
+            self.assertEquals(handler.state, CompletionState.REQUESTING)
+            handler.cancel_request()
+            self.assertEquals(handler.state, CompletionState.IDLE)
+
+            # the response would have arrived by now
+            yield 200
+            self.assertEquals(handler.state, CompletionState.IDLE)
+            self.assertEquals(len(handler.completions), 0)
+
     def test_simple_inserttext(self):
         yield OPEN_DOCUMENT_DELAY
         self.client.responses[